@@ -1,18 +1,20 @@
 # dawnyawn/agent/agent_scheduler.py (Simplified Text Version)
 import re
-from typing import List
+import hashlib
+import threading
+from typing import Callable, Dict, List, Optional, Tuple
 from openai import APITimeoutError
-from config import get_llm_client, LLM_MODEL_NAME, LLM_REQUEST_TIMEOUT
+from config import get_llm_client, llm_limiter, llm_request_options, LLM_REQUEST_TIMEOUT, LLM_ROLE_MODELS, \
+    PLAN_CACHE_DB, PLAN_CACHE_TTL, PLAN_CACHE_MAX_ENTRIES
 from models.task_node import TaskNode
+from agent.plan_cache import PlanCache
+from agent.stream_parsing import NumberedLineScanner, iter_stream_text
+from services.tracing import traced
 
+_DEPENDENCY_PATTERN = re.compile(r'\(\s*(?:after|depends on)\s*:?\s*([^)]*)\)\s*\.?\s*$', re.IGNORECASE)
 
-class AgentScheduler:
-    """LLM Orchestrator. Creates the high-level strategic plan for user review."""
-
-    def __init__(self):
-        self.client = get_llm_client()
-        # --- THIS IS THE NEW, SIMPLIFIED TEXT PROMPT ---
-        self.system_prompt = """
+# --- THIS IS THE NEW, SIMPLIFIED TEXT PROMPT ---
+SYSTEM_PROMPT = """
 You are a master strategist AI. Your job is to convert a user's goal into a simple, numbered list of high-level steps.
 
 **Crucial Rules for Planning:**
@@ -20,44 +22,175 @@ You are a master strategist AI. Your job is to convert a user's goal into a simp
 2.  Each item on the list should be a single, clear strategic step.
 3.  Do not include specific commands, only the description of the step.
 4.  Do not add any preamble, conversational text, or closing remarks.
+5.  End each step with its prerequisites, e.g. "(after: 1, 2)". Use "(after: none)" for steps that
+    do not depend on any earlier result, so independent steps can run at the same time.
 
 **Example of a PERFECT response:**
 User Goal: "Find the web server on example.com and see its homepage."
 Your Response:
-1. Scan example.com for open web ports to identify the web server.
-2. If a web server is found, retrieve the content of its homepage.
+1. Scan example.com for open web ports to identify the web server. (after: none)
+2. Look up the DNS records and WHOIS registration of example.com. (after: none)
+3. If a web server is found, retrieve the content of its homepage. (after: 1)
 """
 
-    def _parse_plan_from_text(self, text_plan: str) -> List[str]:
-        """Parses a numbered list from the LLM's text response."""
+_plan_cache = None
+_plan_cache_lock = threading.Lock()
+
+
+def get_plan_cache() -> PlanCache:
+    """The process-wide plan cache, opened on first use; shared by every scheduler (and batch mission)."""
+    global _plan_cache
+    with _plan_cache_lock:
+        if _plan_cache is None:
+            # A different planning model or prompt makes different plans, so each gets its own entries.
+            namespace = f"{LLM_ROLE_MODELS['plan']}\0{hashlib.sha256(SYSTEM_PROMPT.encode('utf-8')).hexdigest()}"
+            _plan_cache = PlanCache(max_entries=PLAN_CACHE_MAX_ENTRIES, ttl=PLAN_CACHE_TTL,
+                                    db_path=PLAN_CACHE_DB or None, namespace=namespace)
+        return _plan_cache
+
+
+class _PlanNumbering:
+    """
+    Assigns task IDs to plan items in order and maps the model's labels onto them. Numbering that
+    restarts (1., 2., then 1., 2. under a second header) starts a new group; "(after: N)" means item N
+    of the same group, or of the latest earlier group that has one.
+    """
+
+    def __init__(self):
+        self._groups: List[Dict[int, int]] = []
+        self._last_label: Optional[int] = None
+        self._next_id = 1
+
+    def resolve(self, label: int) -> Optional[int]:
+        for group in reversed(self._groups):
+            if label in group:
+                return group[label]
+        return None
+
+    def add(self, label: int, step: str) -> TaskNode:
+        if self._last_label is None or label <= self._last_label:
+            self._groups.append({})
+        self._last_label = label
+        task = AgentScheduler._parse_step(self._next_id, step, self)
+        self._groups[-1][label] = task.task_id
+        self._next_id += 1
+        return task
+
+
+class AgentScheduler:
+    """LLM Orchestrator. Creates the high-level strategic plan for user review."""
+
+    # The prompt never changes, so it is built once at import and shared by every scheduler.
+    system_prompt = SYSTEM_PROMPT
+
+    def __init__(self, plan_cache: Optional[PlanCache] = None):
+        self._plan_cache = plan_cache
+        # Whether the last create_plan() was served from the cache.
+        self.plan_cached = False
+
+    @property
+    def plan_cache(self) -> PlanCache:
+        if self._plan_cache is None:
+            self._plan_cache = get_plan_cache()
+        return self._plan_cache
+
+    @property
+    def client(self):
+        # The shared client is only built on the first LLM call, not when the scheduler is created.
+        return get_llm_client()
+
+    @staticmethod
+    def _parse_step(task_id: int, step: str, numbering: Optional[_PlanNumbering] = None) -> TaskNode:
+        """
+        Turns one numbered-list item, with optional "(after: ...)" prerequisites, into a TaskNode. The
+        prerequisites are the model's own labels; `numbering` maps them to task IDs.
+        """
+        match = _DEPENDENCY_PATTERN.search(step)
+        if match:
+            description = step[:match.start()].strip()
+            labels = [int(n) for n in re.findall(r'\d+', match.group(1))]
+            resolved = [numbering.resolve(label) for label in labels] if numbering else labels
+            # Only earlier steps can be prerequisites; this keeps the plan acyclic.
+            dependencies = sorted({n for n in resolved if n is not None and 0 < n < task_id})
+        else:
+            # Unannotated steps keep the old strictly sequential behaviour.
+            description = step.strip()
+            dependencies = [task_id - 1] if task_id > 1 else []
+        return TaskNode(task_id=task_id, description=description, dependencies=dependencies)
+
+    def _parse_plan_from_text(self, text_plan: str) -> List[TaskNode]:
+        """Parses a numbered list, with optional "(after: ...)" prerequisites, into a DAG of TaskNodes."""
+        numbering = _PlanNumbering()
         # Find all lines that start with a number followed by a period.
-        steps = re.findall(r'^\s*\d+\.\s*(.*)', text_plan, re.MULTILINE)
-        # Clean up any leading/trailing whitespace from the captured steps.
-        return [step.strip() for step in steps]
+        return [numbering.add(int(label), step)
+                for label, step in re.findall(r'^\s*(\d+)\.\s*(.*)', text_plan, re.MULTILINE)]
+
+    @traced("plan")
+    def create_plan(self, goal: str, on_step: Optional[Callable[[TaskNode], None]] = None,
+                    refresh: bool = False) -> List[TaskNode]:
+        """
+        Reuses the cached plan for goals of the same shape (same wording, other targets) unless `refresh`
+        is set. Otherwise streams the plan from the LLM and hands each step to `on_step` as soon as its line
+        is complete; generation is cut off once the numbered list has ended. A fresh plan is only cached
+        once it has been approved; see cache_plan().
+        """
+        self.plan_cached = False
+        if not refresh:
+            plan = self.plan_cache.get(goal)
+            if plan:
+                print(f"⚡ Reusing cached plan for goal: '{goal}'")
+                self.plan_cached = True
+                for task in plan:
+                    if on_step: on_step(task)
+                return plan
+        return self._generate_plan(goal, on_step)
+
+    def cache_plan(self, goal: str, plan: List[TaskNode], refresh: bool = False):
+        """Caches an approved plan for later goals of the same shape; a plan served from the cache is left as is."""
+        if plan and not self.plan_cached:
+            self.plan_cache.put(goal, plan, refresh=refresh)
 
-    def create_plan(self, goal: str) -> List[TaskNode]:
+    def _generate_plan(self, goal: str, on_step: Optional[Callable[[TaskNode], None]]) -> List[TaskNode]:
         print(f"🗓️  Generating strategic plan for goal: '{goal}'")
         try:
-            response = self.client.chat.completions.create(
-                model=LLM_MODEL_NAME,
-                messages=[
-                    {"role": "system", "content": self.system_prompt},
-                    {"role": "user", "content": f"Goal: {goal}"}
-                ],
-                timeout=LLM_REQUEST_TIMEOUT
-            )
-            raw_text_plan = response.choices[0].message.content.strip()
-
-            # --- PARSE THE TEXT RESPONSE ---
-            task_descriptions = self._parse_plan_from_text(raw_text_plan)
-
-            if not task_descriptions:
+            plan = []
+            received = []
+            scanner = NumberedLineScanner()
+            numbering = _PlanNumbering()
+
+            def accept(items: List[Tuple[int, str]]):
+                for label, step in items:
+                    task = numbering.add(label, step)
+                    plan.append(task)
+                    if on_step: on_step(task)
+
+            with llm_limiter:
+                stream = self.client.chat.completions.create(
+                    **llm_request_options("plan"),
+                    messages=[
+                        {"role": "system", "content": self.system_prompt},
+                        {"role": "user", "content": f"Goal: {goal}"}
+                    ],
+                    timeout=LLM_REQUEST_TIMEOUT,
+                    stream=True
+                )
+                try:
+                    for text in iter_stream_text(stream):
+                        received.append(text)
+                        accept(scanner.feed(text))
+                        if scanner.finished:
+                            break
+                    accept(scanner.flush())
+                finally:
+                    stream.close()
+            raw_text_plan = "".join(received).strip()
+
+            if not plan:
                 print("\n❌ Critical Error: The AI model failed to generate a valid, numbered plan.")
                 print(f"   Model's raw response: \"{raw_text_plan}\"")
                 return []
 
-            # Convert the list of strings into a list of TaskNode objects
-            return [TaskNode(task_id=i + 1, description=desc) for i, desc in enumerate(task_descriptions)]
+            return plan
 
         except APITimeoutError:
             print("\n❌ Critical Error: The AI model timed out while creating the plan.")
@@ -0,0 +1,126 @@
+# dawnyawn/agent/batch_runner.py
+import os
+import json
+import math
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, List, Optional
+from agent.task_manager import TaskManager
+from agent.agent_scheduler import get_plan_cache
+from services.mcp_client import McpClient
+from services.session_pool import SessionPool
+from services.mission_journal import is_valid_mission_id
+
+
+def load_goals(path: str) -> List[Dict]:
+    """
+    Reads one mission per JSONL line: {"goal": "...", "id": "optional-mission-id"}. IDs name the mission's
+    report, journal and trace files, so they must be unique and use only letters, digits, '_' and '-'.
+    """
+    missions = []
+    seen_ids = set()
+    with open(path, encoding="utf-8") as f:
+        for line_number, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            entry = json.loads(line)
+            if not entry.get("goal"):
+                raise ValueError(f"{path}:{line_number}: every line needs a 'goal'.")
+            if "id" in entry:
+                if not is_valid_mission_id(entry["id"]):
+                    raise ValueError(f"{path}:{line_number}: invalid id {entry['id']!r}; "
+                                     f"use letters, digits, '_' and '-' only.")
+                if entry["id"] in seen_ids:
+                    raise ValueError(f"{path}:{line_number}: duplicate id {entry['id']!r}.")
+                seen_ids.add(entry["id"])
+            missions.append(entry)
+    return missions
+
+
+def _percentile(values: List[float], percentile: float) -> float:
+    """Nearest-rank percentile; good enough for mission counts in the hundreds."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(percentile / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+class BatchRunner:
+    """Runs a queue of missions concurrently with auto-approval, sharing one session pool."""
+
+    def __init__(self, goals_path: str, concurrency: int, report_dir: str, max_sessions: int,
+                 use_result_cache: bool = True, speculate: bool = False, max_steps: Optional[int] = None,
+                 refresh_plan: bool = False):
+        self.missions = load_goals(goals_path)
+        self.concurrency = concurrency
+        self.report_dir = report_dir
+        self.use_result_cache = use_result_cache
+        self.speculate = speculate
+        self.max_steps = max_steps
+        self.refresh_plan = refresh_plan
+        # The LLM limiter is process-wide (config.llm_limiter); sessions are shared through this pool.
+        self.session_pool = SessionPool(McpClient(), max_sessions=max_sessions)
+
+    def _run_one(self, entry: Dict) -> Dict:
+        started = time.time()
+        task_manager = None
+        try:
+            task_manager = TaskManager(goal=entry["goal"], auto_approve=True, session_pool=self.session_pool,
+                                       show_progress=False, mission_id=entry.get("id"),
+                                       use_result_cache=self.use_result_cache, speculate=self.speculate,
+                                       max_steps=self.max_steps, refresh_plan=self.refresh_plan)
+            report = task_manager.run()
+        except Exception as e:
+            if task_manager is not None:
+                report = task_manager.build_report()
+            else:
+                # The mission never got going; report it under its own ID so the rest of the batch still runs.
+                report = {"mission_id": entry.get("id") or uuid.uuid4().hex[:12], "goal": entry["goal"],
+                          "duration_seconds": round(time.time() - started, 3), "steps": []}
+            report["outcome"] = "ERROR"
+            report["error"] = str(e)
+        self._write_json(f"{report['mission_id']}.json", report)
+        return report
+
+    def _write_json(self, filename: str, payload: Dict):
+        with open(os.path.join(self.report_dir, filename), "w", encoding="utf-8") as f:
+            json.dump(payload, f, indent=2)
+
+    def run(self) -> Dict:
+        os.makedirs(self.report_dir, exist_ok=True)
+        print(f"--- Running {len(self.missions)} missions, {self.concurrency} at a time ---")
+        started = time.time()
+        reports = []
+        try:
+            with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="mission") as executor:
+                futures = [executor.submit(self._run_one, entry) for entry in self.missions]
+                for future in as_completed(futures):
+                    report = future.result()
+                    reports.append(report)
+                    print(f"[{report['outcome']}] Mission {report['mission_id']} finished in "
+                          f"{report['duration_seconds']:.1f}s ({len(reports)}/{len(self.missions)})")
+        finally:
+            self.session_pool.close()
+
+        wall_time = time.time() - started
+        latencies = [report["duration_seconds"] for report in reports]
+        outcomes = {}
+        for report in reports:
+            outcomes[report["outcome"]] = outcomes.get(report["outcome"], 0) + 1
+        summary = {
+            "missions": len(reports),
+            "concurrency": self.concurrency,
+            "wall_time_seconds": round(wall_time, 3),
+            "missions_per_hour": round(len(reports) / wall_time * 3600, 2) if wall_time else 0.0,
+            "latency_p50_seconds": round(_percentile(latencies, 50), 3),
+            "latency_p95_seconds": round(_percentile(latencies, 95), 3),
+            "outcomes": outcomes,
+            "plan_cache": get_plan_cache().stats(),
+        }
+        self._write_json("summary.json", summary)
+        print("\n--- BATCH SUMMARY ---")
+        print(json.dumps(summary, indent=2))
+        return summary
@@ -0,0 +1,155 @@
+# dawnyawn/agent/findings.py
+import re
+import shlex
+from urllib.parse import urlsplit
+from typing import Dict, List, Optional, Set, Tuple
+
+_NMAP_REPORT = re.compile(r'^Nmap scan report for (\S+)(?: \(([0-9a-fA-F.:]+)\))?', re.MULTILINE)
+_PORT_LINE = re.compile(r'^(\d{1,5})/(tcp|udp)\s+(open|open\|filtered)\s+(\S+)[ \t]*(.*)$')
+_DISCOVERED = re.compile(r'Discovered open port (\d{1,5})/(tcp|udp) on (\S+)')
+_VULN_ID = re.compile(r'\b(CVE-\d{4}-\d{4,}|OSVDB-\d+)\b', re.IGNORECASE)
+_SERVER_HEADER = re.compile(r'^Server:\s*(.+?)\s*$', re.IGNORECASE | re.MULTILINE)
+_HOSTLIKE = re.compile(r'^(?:[a-z][a-z0-9+.-]*://)?[a-z0-9](?:[a-z0-9-]*[a-z0-9])?(?:\.[a-z0-9-]+)+(?::\d+)?(?:/\S*)?$',
+                       re.IGNORECASE)
+
+
+def command_target(command: str) -> Tuple[Optional[str], Optional[str]]:
+    """The host (and "port/tcp" if a URL names one) a command is aimed at, taken from its last host-like argument."""
+    try:
+        args = shlex.split(command)
+    except ValueError:
+        args = command.split()
+    for arg in reversed(args[1:]):
+        if arg.startswith("-") or not _HOSTLIKE.match(arg):
+            continue
+        parts = urlsplit(arg if "://" in arg else f"//{arg}")
+        if not parts.hostname:
+            continue
+        port = parts.port or {"http": 80, "https": 443}.get(parts.scheme)
+        return parts.hostname, (f"{port}/tcp" if port else None)
+    return None, None
+
+
+class FindingsStore:
+    """
+    Deduplicated facts about the target (hosts, open ports with service and version, vulnerabilities)
+    extracted from observations as they arrive. Every fact remembers the step that first produced or last
+    changed it, so callers can ask what is new since any step.
+    """
+
+    def __init__(self):
+        # host -> "port/proto" -> {"service", "version", "step"}
+        self._ports: Dict[str, Dict[str, Dict]] = {}
+        self._addresses: Dict[str, str] = {}
+        # (host, vulnerability ID) -> {"id", "host", "port", "detail", "step"}
+        self._vulns: Dict[Tuple[str, str], Dict] = {}
+        self._by_service: Dict[str, Set[Tuple[str, str]]] = {}
+        self._changes: List[Tuple[int, str]] = []
+
+    # --- Ingestion ---
+    def ingest(self, step: int, command: str, observation: Dict) -> List[str]:
+        """
+        Adds the facts in one observation; returns a description of each one that is new or changed.
+        Failed commands are skipped, except ones stopped at their deadline: their partial output counts.
+        """
+        if not isinstance(observation, dict) or (observation.get("status") != "SUCCESS"
+                                                 and not observation.get("stopped")):
+            return []
+        changes: List[str] = []
+        target, target_port = command_target(command)
+        text = f"{observation.get('full_output', '')}\n{observation.get('key_finding', '')}"
+        host = target
+        for line in text.splitlines():
+            report = _NMAP_REPORT.match(line)
+            if report:
+                host = report.group(1)
+                if report.group(2):
+                    self._addresses[host] = report.group(2)
+                continue
+            port_line = _PORT_LINE.match(line.strip())
+            if port_line and host:
+                number, proto, _, service, version = port_line.groups()
+                self._add_port(step, host, f"{number}/{proto}", service, version.strip(), changes)
+                continue
+            discovered = _DISCOVERED.search(line)
+            if discovered:
+                self._add_port(step, discovered.group(3), f"{discovered.group(1)}/{discovered.group(2)}",
+                               "", "", changes)
+                continue
+            for vuln_id in _VULN_ID.findall(line):
+                if host:
+                    self._add_vuln(step, host, target_port, vuln_id.upper(), line.strip(" |_+"), changes)
+        server = _SERVER_HEADER.search(observation.get("full_output", ""))
+        if server and target and target_port:
+            self._add_port(step, target, target_port, "http", server.group(1), changes)
+        self._changes.extend((step, change) for change in changes)
+        return changes
+
+    def _add_port(self, step: int, host: str, port: str, service: str, version: str, changes: List[str]):
+        ports = self._ports.setdefault(host, {})
+        known = ports.get(port)
+        if known is None:
+            ports[port] = {"service": service, "version": version, "step": step}
+            changes.append(f"{host} {port} open" + (f" ({service}{' ' + version if version else ''})" if service else ""))
+        else:
+            # A later, more detailed scan fills in what an earlier one left blank; nothing is ever lost.
+            updated = False
+            if service and not known["service"]:
+                known["service"], updated = service, True
+            if version and len(version) > len(known["version"]):
+                known["version"], updated = version, True
+            if not updated:
+                return
+            known["step"] = step
+            changes.append(f"{host} {port} is {known['service']} {known['version']}".rstrip())
+        if service:
+            self._by_service.setdefault(service.lower(), set()).add((host, port))
+
+    def _add_vuln(self, step: int, host: str, port: Optional[str], vuln_id: str, detail: str, changes: List[str]):
+        key = (host, vuln_id)
+        if key in self._vulns:
+            return
+        self._vulns[key] = {"id": vuln_id, "host": host, "port": port, "detail": detail[:200], "step": step}
+        changes.append(f"{host} {vuln_id}")
+
+    # --- Queries ---
+    def hosts(self) -> List[str]:
+        return sorted(set(self._ports) | {host for host, _ in self._vulns})
+
+    def open_ports(self, host: Optional[str] = None) -> Dict[str, Dict[str, Dict]]:
+        hosts = [host] if host else self.hosts()
+        return {name: dict(self._ports.get(name, {})) for name in hosts if self._ports.get(name)}
+
+    def with_service(self, service: str) -> List[Tuple[str, str]]:
+        return sorted(self._by_service.get(service.lower(), set()))
+
+    def vulnerabilities(self, host: Optional[str] = None) -> List[Dict]:
+        return [vuln for (vuln_host, _), vuln in self._vulns.items() if host is None or vuln_host == host]
+
+    def changes_since(self, step: int) -> List[str]:
+        """Facts that appeared or changed after `step`, in the order they were found."""
+        return [change for change_step, change in self._changes if change_step > step]
+
+    def __bool__(self) -> bool:
+        return bool(self._ports or self._vulns)
+
+    # --- Rendering ---
+    def render(self, max_chars: int = 2000) -> str:
+        """One compact line per host, e.g. `10.0.0.5: 22/tcp ssh OpenSSH 8.2p1; 80/tcp http | CVE-2021-41773`."""
+        lines = []
+        for host in self.hosts():
+            label = f"{host} ({self._addresses[host]})" if host in self._addresses else host
+            ports = "; ".join(f"{port} {fact['service']} {fact['version']}".rstrip()
+                              for port, fact in sorted(self._ports.get(host, {}).items(),
+                                                       key=lambda item: int(item[0].split("/")[0])))
+            vulns = ", ".join(vuln["id"] for vuln in self.vulnerabilities(host))
+            lines.append(f"{label}: {ports or 'no open ports recorded'}" + (f" | {vulns}" if vulns else ""))
+        text = "\n".join(lines)
+        if len(text) > max_chars:
+            text = text[:max_chars - 20].rsplit("\n", 1)[0] + "\n...[more hosts omitted]"
+        return text
+
+    def to_dict(self) -> Dict:
+        return {"hosts": {host: {"address": self._addresses.get(host), "ports": self._ports.get(host, {}),
+                                 "vulnerabilities": self.vulnerabilities(host)}
+                          for host in self.hosts()}}
@@ -0,0 +1,56 @@
+# dawnyawn/agent/history_index.py
+import re
+import math
+from collections import Counter
+from typing import Dict, Iterable, List, Set
+
+# Keeps hosts, IPs, ports ("80/tcp"), paths and CVE IDs as single terms.
+_TOKEN = re.compile(r'[a-z0-9][a-z0-9._:/-]*[a-z0-9]|[a-z0-9]')
+_STOPWORDS = {"the", "a", "an", "and", "or", "of", "to", "in", "on", "for", "is", "was", "with", "by", "at",
+              "be", "it", "as", "from", "that", "this", "no", "not", "are"}
+
+
+def tokenize(text: str) -> List[str]:
+    return [token for token in _TOKEN.findall(text.lower()) if token not in _STOPWORDS]
+
+
+class HistoryIndex:
+    """Incremental in-memory BM25 index over mission steps, so old observations can be recalled by relevance."""
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self._postings: Dict[str, Dict[int, int]] = {}
+        self._lengths: Dict[int, int] = {}
+        self._total_length = 0
+
+    def __len__(self) -> int:
+        return len(self._lengths)
+
+    def add(self, doc_id: int, text: str):
+        terms = Counter(tokenize(text))
+        for term, count in terms.items():
+            self._postings.setdefault(term, {})[doc_id] = count
+        length = sum(terms.values())
+        self._lengths[doc_id] = length
+        self._total_length += length
+
+    def search(self, query: str, k: int, among: Iterable[int] = None) -> List[int]:
+        """The `k` best-matching doc IDs, best first; restricted to `among` if given. Ties favour recent docs."""
+        if not self._lengths or k <= 0:
+            return []
+        allowed: Set[int] = set(among) if among is not None else None
+        average_length = self._total_length / len(self._lengths)
+        scores: Dict[int, float] = {}
+        for term in set(tokenize(query)):
+            postings = self._postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (len(self._lengths) - len(postings) + 0.5) / (len(postings) + 0.5))
+            for doc_id, count in postings.items():
+                if allowed is not None and doc_id not in allowed:
+                    continue
+                norm = self.k1 * (1 - self.b + self.b * self._lengths[doc_id] / average_length)
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * count * (self.k1 + 1) / (count + norm)
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], -item[0]))
+        return [doc_id for doc_id, _ in ranked[:k]]
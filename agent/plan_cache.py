@@ -0,0 +1,173 @@
+# dawnyawn/agent/plan_cache.py
+import re
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+from models.task_node import TaskNode
+
+# File names like robots.txt look like hostnames but are the same on every target.
+_FILE_EXTENSIONS = "txt|html?|php|aspx?|jsp|xml|json|js|css|conf|cfg|ini|ya?ml|log|bak|old|sql|sh|py|zip|gz|tar|pdf|md"
+# Targets in a goal, most specific first so a URL's host or a CIDR's address isn't matched on its own.
+_TARGET = re.compile(
+    r'(?P<URL>\b[a-z][a-z0-9+.-]*://[^\s<>"\']+)'
+    r'|(?P<CIDR>\b(?:\d{1,3}\.){3}\d{1,3}/\d{1,2}\b)'
+    r'|(?P<IP>\b(?:\d{1,3}\.){3}\d{1,3}\b)'
+    r'|(?P<HOST>\b(?:[a-z0-9](?:[a-z0-9-]{0,61}[a-z0-9])?\.)+(?!(?:' + _FILE_EXTENSIONS + r')\b)[a-z]{2,63}\b)',
+    re.IGNORECASE,
+)
+_PLACEHOLDER = re.compile(r'<(?:URL|CIDR|IP|HOST)\d+>')
+
+
+def templatize(goal: str) -> Tuple[str, Dict[str, str]]:
+    """
+    Replaces the goal's targets with numbered placeholders (`<HOST1>`, `<IP1>`, `<CIDR1>`, `<URL1>`) and
+    normalizes case and whitespace, so the same engagement against different targets gives the same template.
+    Returns the template and the placeholder -> target mapping.
+    """
+    targets: Dict[str, str] = {}
+    placeholders: Dict[str, str] = {}
+    counts: Dict[str, int] = {}
+
+    def replace(match: re.Match) -> str:
+        value = match.group(0).rstrip(".,;:)")
+        if value.lower() not in placeholders:
+            counts[match.lastgroup] = counts.get(match.lastgroup, 0) + 1
+            placeholder = f"<{match.lastgroup}{counts[match.lastgroup]}>"
+            placeholders[value.lower()] = placeholder
+            targets[placeholder] = value
+        return placeholders[value.lower()] + match.group(0)[len(value):]
+
+    template = _TARGET.sub(replace, goal)
+    template = "".join(part if _PLACEHOLDER.fullmatch(part) else part.lower()
+                       for part in re.split(r'(<(?:URL|CIDR|IP|HOST)\d+>)', template))
+    return " ".join(template.split()).rstrip(" .!"), targets
+
+
+def _whole(value: str) -> str:
+    # A target only counts where it stands on its own: "10.0.0.1" must not match inside "10.0.0.15" or
+    # "example.com" inside "dev.example.com". A trailing sentence full stop is still a boundary.
+    return r'(?<![\w.-])' + re.escape(value) + r'(?![\w-]|\.[\w-])'
+
+
+def _abstract(text: str, targets: Dict[str, str]) -> str:
+    # Longest first, so "www.example.com" isn't half-replaced by a shorter target.
+    for placeholder, value in sorted(targets.items(), key=lambda item: -len(item[1])):
+        text = re.sub(_whole(value), placeholder, text, flags=re.IGNORECASE)
+    return text
+
+
+def _names_target(text: str, targets: Dict[str, str]) -> bool:
+    """Whether an abstracted step still names a target: one of its own, or a goal target it only contains."""
+    if _TARGET.search(_PLACEHOLDER.sub("", text)):
+        return True
+    return any(value.lower() in text.lower() for value in targets.values())
+
+
+def _instantiate(text: str, targets: Dict[str, str]) -> str:
+    return _PLACEHOLDER.sub(lambda match: targets.get(match.group(0), match.group(0)), text)
+
+
+class PlanCache:
+    """
+    Plans keyed by goal template, so a repeated engagement type against a new target skips the planning
+    call. An in-memory LRU sits in front of optional SQLite, which keeps plans across runs of the CLI.
+    """
+
+    def __init__(self, max_entries: int = 256, ttl: float = 7 * 86400.0, db_path: Optional[str] = None,
+                 namespace: str = ""):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        # Plans from another model or planning prompt are never reused; see AgentScheduler.
+        self.namespace = namespace
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "stores": 0, "refreshes": 0,
+                          "uncacheable": 0}
+
+        self._db = None
+        if db_path:
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS plans ("
+                "key TEXT PRIMARY KEY, template TEXT NOT NULL, plan TEXT NOT NULL, created_at REAL NOT NULL)"
+            )
+            self._db.commit()
+
+    def _key(self, template: str) -> str:
+        return hashlib.sha256(f"{self.namespace}\0{template}".encode("utf-8")).hexdigest()
+
+    def get(self, goal: str) -> Optional[List[TaskNode]]:
+        """The cached plan for this goal's template, re-instantiated with the goal's own targets."""
+        template, targets = templatize(goal)
+        key = self._key(template)
+        now = time.time()
+        with self._lock:
+            steps = None
+            entry = self._memory.get(key)
+            if entry is not None and now - entry[0] <= self.ttl:
+                self._memory.move_to_end(key)
+                self._counters["memory_hits"] += 1
+                steps = entry[1]
+            elif self._db is not None:
+                row = self._db.execute("SELECT plan, created_at FROM plans WHERE key = ?", (key,)).fetchone()
+                if row and now - row[1] <= self.ttl:
+                    steps = json.loads(row[0])
+                    self._remember(key, row[1], steps)
+                    self._counters["disk_hits"] += 1
+            if steps is None:
+                self._memory.pop(key, None)
+                self._counters["misses"] += 1
+                return None
+        return [TaskNode(**{**step, "description": _instantiate(step["description"], targets)}) for step in steps]
+
+    def put(self, goal: str, plan: List[TaskNode], refresh: bool = False) -> bool:
+        """
+        Stores the plan with the goal's targets abstracted to placeholders. A plan that still names a
+        target of its own (say, the IP behind a URL in the goal), or one that merely contains a goal target
+        ("10.0.0.15" for "10.0.0.1"), would send other missions to hosts nobody asked for, so it is not
+        stored; returns whether the plan was cached.
+        """
+        template, targets = templatize(goal)
+        key = self._key(template)
+        steps = [{"task_id": task.task_id, "description": _abstract(task.description, targets),
+                  "dependencies": list(task.dependencies)} for task in plan]
+        if any(_names_target(step["description"], targets) for step in steps):
+            with self._lock:
+                self._counters["uncacheable"] += 1
+                # On a refresh, the plan being replaced must not outlive it.
+                self._memory.pop(key, None)
+                if self._db is not None:
+                    self._db.execute("DELETE FROM plans WHERE key = ?", (key,))
+                    self._db.commit()
+            return False
+        now = time.time()
+        with self._lock:
+            self._remember(key, now, steps)
+            self._counters["refreshes" if refresh else "stores"] += 1
+            if self._db is not None:
+                self._db.execute("INSERT OR REPLACE INTO plans (key, template, plan, created_at) VALUES (?, ?, ?, ?)",
+                                 (key, template, json.dumps(steps), now))
+                self._db.execute("DELETE FROM plans WHERE created_at < ?", (now - self.ttl,))
+                self._db.commit()
+        return True
+
+    def _remember(self, key: str, created_at: float, steps: List[Dict]):
+        self._memory[key] = (created_at, steps)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            hits = self._counters["memory_hits"] + self._counters["disk_hits"]
+            lookups = hits + self._counters["misses"]
+            return {**self._counters, "hit_rate": round(hits / lookups, 3) if lookups else 0.0,
+                    "memory_entries": len(self._memory), "disk_enabled": self._db is not None}
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
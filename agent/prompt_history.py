@@ -0,0 +1,172 @@
+# dawnyawn/agent/prompt_history.py
+import json
+from typing import Dict, List, Optional
+from models.task_node import TaskNode, plan_stages
+from agent.history_index import HistoryIndex
+from agent.findings import FindingsStore
+
+NEXT_ACTION_PROMPT = "Based on all the information above, what is your single best command for your next action? Respond with a JSON object."
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (~4 characters per token) used for budgeting before the server counts."""
+    return len(text) // 4 + 1
+
+
+def _compact_output(full_output: str, max_chars: int) -> str:
+    """Keeps the head and tail of long output; findings tend to sit at either end."""
+    if len(full_output) <= max_chars:
+        return full_output
+    half = max_chars // 2
+    omitted = len(full_output) - 2 * half
+    return f"{full_output[:half]}\n...[{omitted} characters omitted]...\n{full_output[-half:]}"
+
+
+def _clip(text: str, max_chars: int) -> str:
+    text = " ".join(str(text).split())
+    return text if len(text) <= max_chars else text[:max_chars - 3] + "..."
+
+
+def _format_plan_step(step: TaskNode) -> str:
+    after = ", ".join(str(task_id) for task_id in step.dependencies) or "none"
+    return f"  {step.task_id}. {step.description} (after: {after})"
+
+
+def _format_plan(plan: List[TaskNode]) -> str:
+    """The plan in dependency order, one stage at a time, so independent steps are visibly batchable."""
+    stages = plan_stages(plan)
+    if len(stages) == len(plan):
+        # Strictly sequential: stages would add nothing.
+        return "Strategic Plan:\n" + "\n".join(_format_plan_step(step) for step in plan)
+    lines = ["Strategic Plan (steps in the same stage do not depend on each other: run their commands "
+             "together with os_command_batch):"]
+    for number, stage in enumerate(stages, start=1):
+        lines.append(f"  Stage {number}:")
+        lines.extend(f"  {_format_plan_step(step)}" for step in stage)
+    return "\n".join(lines)
+
+
+class PromptHistory:
+    """
+    Builds the ThoughtEngine conversation incrementally. Every step is rendered exactly once and
+    appended as an assistant/user turn pair, so the message prefix stays byte-identical between steps
+    and the LLM server can reuse its KV/prefix cache. Only the most recent steps stay in full: older ones
+    are folded, in batches so the prefix changes rarely, into a one-line-per-step ledger, and the few most
+    relevant of them are recalled through a BM25 index into the latest turn, together with the aggregated
+    findings so far. Prompt size therefore stays roughly flat however long the mission runs.
+    """
+
+    def __init__(self, system_prompt: str, goal: str, plan: List[TaskNode],
+                 token_budget: int, max_output_chars: int, recent_steps: int = 4, recall_k: int = 3,
+                 findings: Optional[FindingsStore] = None):
+        self.goal = goal
+        self.findings = findings
+        self.token_budget = token_budget
+        self.max_output_chars = max_output_chars
+        self.recent_steps = max(1, recent_steps)
+        self.recall_k = recall_k
+        self.steps_recorded = 0
+        self._index = HistoryIndex()
+        # step -> (command, compacted observation), kept so folded steps can be recalled in detail.
+        self._records: Dict[int, tuple] = {}
+
+        self._system_message = {"role": "system", "content": system_prompt}
+        self._header = f"Main Goal: {goal}\n\n{_format_plan(plan)}\n\n"
+        self._summaries: List[str] = []
+        # Ledger entries are (line, shorter line). Each detailed step is (step, summary, [assistant turn, user turn]).
+        self._detailed_steps: List[tuple] = []
+        self._header_message = self._render_header()
+
+    def _render_header(self) -> Dict:
+        content = self._header
+        if self._summaries:
+            content += ("Ledger of earlier actions (details of relevant ones are recalled when needed):\n"
+                        + "\n".join(self._ledger_lines()) + "\n\n")
+        else:
+            content += "Execution History:\nEach action you take and its observation follow in this conversation.\n\n"
+        return {"role": "user", "content": content + NEXT_ACTION_PROMPT}
+
+    def _ledger_lines(self) -> List[str]:
+        """One line per folded step; the oldest lose their findings if the ledger outgrows a third of the budget."""
+        lines = [full for full, _ in self._summaries]
+        size = sum(estimate_tokens(line) for line in lines)
+        for index, (full, short) in enumerate(self._summaries):
+            if size <= self.token_budget // 3:
+                break
+            size -= estimate_tokens(full) - estimate_tokens(short)
+            lines[index] = short
+        return lines
+
+    def record_step(self, command: str, observation: Dict, tool_name: str = "os_command"):
+        self.steps_recorded += 1
+        step = self.steps_recorded
+        observation = dict(observation or {})
+        observation["full_output"] = _compact_output(str(observation.get("full_output", "")), self.max_output_chars)
+
+        action_turn = {"role": "assistant",
+                       "content": json.dumps({"tool_name": tool_name, "tool_input": command})}
+        observation_turn = {"role": "user",
+                            "content": f"Observation for action {step}:\n"
+                                       f"{json.dumps(observation, separators=(',', ':'))}\n\n{NEXT_ACTION_PROMPT}"}
+        status = observation.get('status', 'UNKNOWN')
+        summary = (f"{step}. `{_clip(command, 80)}` -> {status}: {_clip(observation.get('key_finding', ''), 100)}",
+                   f"{step}. `{_clip(command, 40)}` -> {status}")
+        self._records[step] = (command, observation)
+        self._index.add(step, f"{command}\n{observation.get('key_finding', '')}\n{observation['full_output']}")
+        self._detailed_steps.append((step, summary, [action_turn, observation_turn]))
+        self._enforce_budget()
+
+    def _fold(self, count: int):
+        self._summaries.extend(summary for _, summary, _ in self._detailed_steps[:count])
+        self._detailed_steps = self._detailed_steps[count:]
+        self._header_message = self._render_header()
+
+    def _enforce_budget(self):
+        # Only the recent window stays in full; folding waits until it has doubled, then catches up at once.
+        if len(self._detailed_steps) >= 2 * self.recent_steps:
+            self._fold(len(self._detailed_steps) - self.recent_steps)
+        # Fold the oldest half at once so compaction (and the prefix break it causes) stays rare.
+        while self.estimated_tokens() > self.token_budget and len(self._detailed_steps) > 1:
+            self._fold(max(1, len(self._detailed_steps) // 2))
+
+    def _recall(self) -> str:
+        """Folded steps most relevant to the goal and the latest steps, rendered in detail."""
+        detailed = {step for step, _, _ in self._detailed_steps}
+        folded = [step for step in self._records if step not in detailed]
+        if not folded or self.recall_k <= 0:
+            return ""
+        query = " ".join([self.goal] + [summary[0] for _, summary, _ in self._detailed_steps[-2:]])
+        recalled = self._index.search(query, self.recall_k, among=folded)
+        if not recalled:
+            return ""
+        lines = []
+        for step in sorted(recalled):
+            command, observation = self._records[step]
+            observation = {**observation, "full_output": _compact_output(observation["full_output"],
+                                                                         self.max_output_chars // 2)}
+            lines.append(f"Earlier observation {step} (`{command}`):\n{json.dumps(observation, separators=(',', ':'))}")
+        return "Relevant earlier observations:\n" + "\n".join(lines) + "\n\n"
+
+    def _known_state(self) -> str:
+        """Everything learned about the target so far, as one line per host, plus what the last step added."""
+        if not self.findings:
+            return ""
+        text = f"Known findings so far:\n{self.findings.render(self.max_output_chars)}\n"
+        new = self.findings.changes_since(self.steps_recorded - 1)
+        if new:
+            text += f"New in the last step: {_clip('; '.join(new), 300)}\n"
+        return text + "\n"
+
+    def messages(self) -> List[Dict]:
+        messages = [self._system_message, self._header_message]
+        for _, _, turns in self._detailed_steps:
+            messages.extend(turns)
+        extra = self._known_state() + self._recall()
+        if extra:
+            # Findings and recalled steps change every turn, so they go in the last message and the cached prefix survives.
+            last = messages[-1]
+            messages[-1] = {**last, "content": last["content"][:-len(NEXT_ACTION_PROMPT)] + extra + NEXT_ACTION_PROMPT}
+        return messages
+
+    def estimated_tokens(self) -> int:
+        return sum(estimate_tokens(message["content"]) for message in self.messages())
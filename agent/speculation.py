@@ -0,0 +1,235 @@
+# dawnyawn/agent/speculation.py
+import re
+import shlex
+import threading
+import contextvars
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+# Anything that could chain, redirect or substitute commands disqualifies a candidate outright.
+_SHELL_META = re.compile(r'[;&|<>`$\\\n]|\(|\)')
+# Recon tools that may run speculatively, each with the only flags it may use there (flag -> whether it
+# takes a value). Any other flag, such as an output file, a cookie jar or a random-target scan, rejects the
+# command; nothing outside these lists writes locally or reaches beyond the named target.
+_ALLOWED_FLAGS: Dict[str, Dict[str, bool]] = {
+    "dig": {"-x": True, "-t": True, "-p": True, "-q": True, "-4": False, "-6": False},
+    "host": {"-t": True, "-W": True, "-a": False, "-v": False, "-4": False, "-6": False},
+    "nslookup": {"-type": True, "-query": True, "-q": True, "-port": True, "-timeout": True, "-retry": True},
+    "whois": {"-h": True, "-p": True, "-H": False},
+    "curl": {"-I": False, "--head": False, "-s": False, "--silent": False, "-S": False, "--show-error": False,
+             "-k": False, "--insecure": False, "-L": False, "--location": False, "-v": False, "--verbose": False,
+             "-i": False, "--include": False, "-f": False, "--fail": False, "-4": False, "-6": False,
+             "--compressed": False, "-m": True, "--max-time": True, "--connect-timeout": True,
+             "--max-redirs": True, "-A": True, "--user-agent": True, "-H": True, "--header": True},
+    "nmap": {"-sn": False, "-F": False, "-Pn": False, "-n": False, "-sV": False, "-sT": False, "-sS": False,
+             "-T2": False, "-T3": False, "-T4": False, "-v": False, "-6": False, "--open": False,
+             "--reason": False, "-p": True},
+    "ping": {"-c": True, "-W": True, "-n": False, "-q": False, "-4": False, "-6": False},
+    "whatweb": {"-a": True, "--aggression": True, "-v": False, "--verbose": False, "-q": False, "--quiet": False,
+                "--no-errors": False, "--color": True, "-U": True, "--user-agent": True},
+    "traceroute": {"-n": False, "-I": False, "-T": False, "-4": False, "-6": False, "-q": True, "-w": True,
+                   "-m": True, "-p": True},
+}
+# Tools whose single-letter flags can be bundled ("-sI" is -s -I); nmap and nslookup flags are whole words.
+_BUNDLED = {"dig", "host", "whois", "curl", "ping", "whatweb", "traceroute"}
+MAX_NMAP_PORTS = 20
+MAX_PING_COUNT = 10
+
+
+def _parse_options(tool: str, args: List[str]) -> Optional[List[Tuple[str, Optional[str]]]]:
+    """
+    The (flag, value) pairs in `args`, or None if any flag is not allowed for `tool`. Flags are matched
+    the way the tool reads them, so an attached value ("-oN/tmp/x") or a bundled one ("-so FILE") can't
+    slip an unlisted option past the allow-list.
+    """
+    flags = _ALLOWED_FLAGS[tool]
+    options = []
+    index = 0
+    while index < len(args):
+        arg = args[index]
+        index += 1
+        if not arg.startswith("-") or arg == "-":
+            continue
+        if "=" in arg:
+            name, value = arg.split("=", 1)
+            if not flags.get(name):
+                return None
+            options.append((name, value))
+        elif arg in flags:
+            if flags[arg]:
+                if index >= len(args):
+                    return None
+                options.append((arg, args[index]))
+                index += 1
+            else:
+                options.append((arg, None))
+        elif arg.startswith("--"):
+            return None
+        elif tool in _BUNDLED:
+            for position in range(1, len(arg)):
+                name = "-" + arg[position]
+                if name not in flags:
+                    return None
+                if flags[name]:
+                    # A value-taking letter consumes the rest of the word, or the next argument.
+                    value = arg[position + 1:]
+                    if not value:
+                        if index >= len(args):
+                            return None
+                        value = args[index]
+                        index += 1
+                    options.append((name, value))
+                    break
+                options.append((name, None))
+        else:
+            # Whole-word flags: only a value-taking one may carry its value attached, e.g. "-p22,80".
+            name = next((flag for flag, takes_value in flags.items() if takes_value and arg.startswith(flag)), None)
+            if name is None:
+                return None
+            options.append((name, arg[len(name):]))
+    return options
+
+
+def _nmap_is_light(options: List[Tuple[str, Optional[str]]]) -> bool:
+    """A fast scan: -sn, -F, or a short explicit port list."""
+    names = {name for name, _ in options}
+    for name, ports in options:
+        if name == "-p" and ("-" in ports or len(ports.split(",")) > MAX_NMAP_PORTS):
+            return False
+    return bool(names & {"-sn", "-F", "-p"})
+
+
+def _ping_is_bounded(options: List[Tuple[str, Optional[str]]]) -> bool:
+    counts = [value for name, value in options if name == "-c"]
+    return bool(counts) and all(count.isdigit() and 0 < int(count) <= MAX_PING_COUNT for count in counts)
+
+
+def is_read_only(command: str) -> bool:
+    """True if `command` is on the read-only recon allow-list and is safe to run before it is chosen."""
+    if _SHELL_META.search(command):
+        return False
+    try:
+        args = shlex.split(command)
+    except ValueError:
+        return False
+    if not args or args[0] not in _ALLOWED_FLAGS:
+        return False
+    tool = args[0]
+    options = _parse_options(tool, args[1:])
+    if options is None:
+        return False
+    if tool == "curl":
+        return any(name in ("-I", "--head") for name, _ in options)
+    if tool == "nmap":
+        return _nmap_is_light(options)
+    if tool == "ping":
+        return _ping_is_bounded(options)
+    return True
+
+
+def _normalize(command: str) -> str:
+    return " ".join(command.split())
+
+
+class Speculator:
+    """
+    Pre-executes the model's likely next read-only commands while it is still deciding, so a matching
+    choice finds its observation waiting. Unused results are counted as waste.
+    """
+
+    def __init__(self, mcp_client, thought_engine, top_k: int = 3, use_cache: bool = True,
+                 command_timeout: Optional[float] = None):
+        self.mcp_client = mcp_client
+        self.thought_engine = thought_engine
+        self.top_k = top_k
+        self.use_cache = use_cache
+        # Kept short: a slow speculative command would hold the session the real one needs.
+        self.command_timeout = command_timeout
+        # One worker: speculative commands share the mission's session, where they run one at a time anyway.
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="speculate")
+        self._lock = threading.Lock()
+        self._round = 0
+        self._results: Dict[str, Future] = {}
+        # The session a speculative command is running in right now, so a new round or close() can stop it.
+        self._running_session: Optional[str] = None
+        self._counters = {"rounds": 0, "proposed": 0, "rejected": 0, "executed": 0, "hits": 0, "wasted": 0}
+
+    def start(self, session_id: str, messages: List[Dict]):
+        """Begins a round for the step about to be decided; leftovers from the last round are wasted."""
+        round_id = self._discard()
+        self._counters["rounds"] += 1
+        # The mission's trace context comes along, so speculative spans land in its trace file.
+        self._executor.submit(contextvars.copy_context().run, self._speculate, round_id, session_id, messages)
+
+    def _speculate(self, round_id: int, session_id: str, messages: List[Dict]):
+        for command in self.thought_engine.propose_candidates(messages, self.top_k):
+            with self._lock:
+                if round_id != self._round:
+                    return
+                self._counters["proposed"] += 1
+                key = _normalize(command)
+                if key in self._results:
+                    continue
+                if not is_read_only(command):
+                    self._counters["rejected"] += 1
+                    continue
+                future = Future()
+                self._results[key] = future
+                self._running_session = session_id
+            print(f"  > Speculatively running `{command}`")
+            try:
+                future.set_result(self.mcp_client.execute_command(session_id, command, use_cache=self.use_cache,
+                                                                  timeout=self.command_timeout))
+            except Exception as e:
+                future.set_exception(e)
+            with self._lock:
+                self._running_session = None
+                self._counters["executed"] += 1
+
+    def take(self, command: str) -> Optional[Dict]:
+        """The speculative observation for `command` if one was started, waiting for it if still running."""
+        with self._lock:
+            future = self._results.pop(_normalize(command), None)
+        if future is None:
+            return None
+        try:
+            observation = future.result()
+        except Exception:
+            return None
+        if observation.get("stopped"):
+            # Cut short by its deadline; the real step should run the command in full.
+            with self._lock:
+                self._counters["wasted"] += 1
+            return None
+        with self._lock:
+            self._counters["hits"] += 1
+        return observation
+
+    def _discard(self) -> int:
+        """Ends the current round. A speculative command still running is cancelled: nobody will use it."""
+        with self._lock:
+            self._round += 1
+            self._counters["wasted"] += len(self._results)
+            self._results = {}
+            round_id, running = self._round, self._running_session
+            self._running_session = None  # Cancelled once; its worker clears it again when it returns.
+        if running:
+            # Only speculative work runs in the session between steps, so this can't stop a real command.
+            try:
+                self.mcp_client.cancel(running)
+            except Exception as e:
+                print(f"  > Could not cancel the speculative command: {type(e).__name__}")
+        return round_id
+
+    def close(self):
+        """
+        Stops speculating without waiting: a running command is cancelled and pending work dropped. A
+        proposal still in flight finds its round over when it returns and runs nothing.
+        """
+        self._discard()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def report(self) -> Dict:
+        with self._lock:
+            executed = self._counters["executed"]
+            return {**self._counters, "hit_rate": round(self._counters["hits"] / executed, 3) if executed else 0.0}
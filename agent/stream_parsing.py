@@ -0,0 +1,106 @@
+# dawnyawn/agent/stream_parsing.py
+import re
+from typing import Iterator, List, Optional, Tuple
+
+_NUMBERED_LINE = re.compile(r'^\s*(\d+)\.\s*(.*)')
+# Markdown headings, bold lines and short "Label:" lines that group list items.
+_HEADER_LINE = re.compile(r'^\s*(?:#+\s|\*\*[^*]+\*\*:?\s*$|__[^_]+__:?\s*$|[^.!?]{1,60}:\s*$)')
+
+
+def iter_stream_text(stream) -> Iterator[str]:
+    """Yields the text deltas of a streamed chat completion, skipping role/usage-only chunks."""
+    for chunk in stream:
+        if not chunk.choices:
+            continue
+        delta = chunk.choices[0].delta.content
+        if delta:
+            yield delta
+
+
+class JsonObjectScanner:
+    """
+    Finds balanced top-level JSON objects in text that arrives in pieces. Braces inside strings are
+    ignored, so the first complete object is known the moment its closing brace streams in.
+    """
+
+    def __init__(self):
+        self._buffer: List[str] = []
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+
+    def feed(self, text: str) -> List[str]:
+        """Consumes more text and returns every object completed by it, in order."""
+        completed = []
+        for char in text:
+            if self._depth == 0:
+                if char == "{":
+                    self._depth = 1
+                    self._buffer = [char]
+                continue
+            self._buffer.append(char)
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char == "{":
+                self._depth += 1
+            elif char == "}":
+                self._depth -= 1
+                if self._depth == 0:
+                    completed.append("".join(self._buffer))
+                    self._buffer = []
+        return completed
+
+
+class NumberedLineScanner:
+    """
+    Emits the items of a numbered list ("1. ...") as (label, text) pairs as soon as each line is complete.
+    Headers between groups of items ("**Phase 2**", "## Recon", "Exploitation:") and indented continuations
+    are skipped.
+    The list has only ended (`finished`) once a blank line after an item is followed by other prose,
+    such as a closing remark.
+    """
+
+    def __init__(self):
+        self._pending = ""
+        self.items_seen = 0
+        self.finished = False
+        # A blank line has followed the last item.
+        self._gap = False
+
+    def feed(self, text: str) -> List[Tuple[int, str]]:
+        self._pending += text
+        *lines, self._pending = self._pending.split("\n")
+        return self._consume(lines)
+
+    def flush(self) -> List[Tuple[int, str]]:
+        """Returns the item on a trailing line that never received its newline."""
+        lines, self._pending = [self._pending], ""
+        return self._consume(lines)
+
+    def _consume(self, lines: List[str]) -> List[Tuple[int, str]]:
+        items = []
+        for line in lines:
+            if self.finished:
+                break
+            item = self._parse_line(line)
+            if item is not None:
+                items.append(item)
+                self.items_seen += 1
+                self._gap = False
+            elif not line.strip():
+                self._gap = bool(self.items_seen)
+            elif self._gap and not line[:1].isspace() and not _HEADER_LINE.match(line):
+                self.finished = True
+        return items
+
+    @staticmethod
+    def _parse_line(line: str) -> Optional[Tuple[int, str]]:
+        match = _NUMBERED_LINE.match(line)
+        return (int(match.group(1)), match.group(2)) if match else None
@@ -1,5 +1,7 @@
 # dawnyawn/agent/task_manager.py (Simplified Version)
-import json
+import time
+import uuid
+from typing import Dict, Optional
 from openai import APITimeoutError
 from models.task_node import TaskNode
 from agent.agent_scheduler import AgentScheduler
@@ -7,60 +9,301 @@ from agent.thought_engine import ThoughtEngine
 from tools.tool_manager import ToolManager
 from services.event_manager import EventManager
 from services.mcp_client import McpClient
+from services.session_pool import SessionPool
+from services.tracing import start_trace, span
+from services.mission_journal import MissionJournal
+from agent.speculation import Speculator
+from agent.findings import FindingsStore
+from config import SPECULATION_TOP_K, SPECULATION_COMMAND_TIMEOUT, MAX_MISSION_STEPS
 
 
 class TaskManager:
     """Orchestrates the Plan -> Approve -> Execute loop with JSON observations."""
 
-    def __init__(self, goal: str):
+    def __init__(self, goal: str, auto_approve: bool = False, session_pool: Optional[SessionPool] = None,
+                 show_progress: bool = True, mission_id: Optional[str] = None, use_result_cache: bool = True,
+                 speculate: bool = False, max_steps: Optional[int] = None, refresh_plan: bool = False):
         self.goal = goal
+        self.mission_id = mission_id or uuid.uuid4().hex[:12]
+        self.auto_approve = auto_approve
+        self.session_pool = session_pool
+        self.show_progress = show_progress
+        # When False, every command is re-run even if the server holds a fresh cached result.
+        self.use_result_cache = use_result_cache
+        # Long missions are fine: older steps reach the prompt through the history index, not in full.
+        self.max_steps = max_steps or MAX_MISSION_STEPS
+        # When True, the plan is generated afresh (and re-cached) even if a cached one fits the goal.
+        self.refresh_plan = refresh_plan
         self.mission_history = []
+        self.plan = []
+        self.outcome = "PENDING"
+        self.started_at = None
+        self.finished_at = None
         self.scheduler = AgentScheduler()
-        self.thought_engine = ThoughtEngine(ToolManager())
+        self.tool_manager = ToolManager()
+        # Hosts, ports, services and vulnerabilities aggregated across every step of the mission.
+        self.findings = FindingsStore()
+        self.thought_engine = ThoughtEngine(self.tool_manager, self.findings)
         self.event_manager = EventManager()
         self.mcp_client = McpClient()
+        self.trace = None
+        self.journal = MissionJournal(self.mission_id)
+        # Pre-runs likely read-only next commands while the model decides; off unless asked for.
+        self.speculator = Speculator(self.mcp_client, self.thought_engine, SPECULATION_TOP_K,
+                                     use_cache=use_result_cache,
+                                     command_timeout=SPECULATION_COMMAND_TIMEOUT) if speculate else None
+        self.resumed = False
+        # Whether the journalled plan was approved; a resumed mission asks again if it wasn't.
+        self.plan_approved = False
+        # Commands chosen before an interruption but never observed; they run first on resume.
+        self._pending_tool = None
+        self._pending_commands = []
 
-    def run(self):
-        self.event_manager.log_event("INFO", f"Starting mission for goal: {self.goal}")
+    @classmethod
+    def resume(cls, mission_id: str, **kwargs) -> "TaskManager":
+        """Rebuilds a mission from its journal. A plan that was approved is not asked about again."""
+        state = MissionJournal.load(mission_id)
+        manager = cls(goal=state.goal, mission_id=mission_id, **kwargs)
+        manager.plan = state.plan
+        manager.plan_approved = state.approved
+        manager.mission_history = state.history
+        for step, item in enumerate(state.history, start=1):
+            manager.findings.ingest(step, item.get("command", ""), item.get("observation", {}))
+        manager.resumed = True
+        manager._pending_tool = state.pending_tool
+        manager._pending_commands = state.pending_commands
+        if state.finished:
+            manager.outcome = state.outcome
+        return manager
+
+    def run(self) -> Dict:
+        """Runs the mission end to end and returns its report."""
+        self.started_at = time.time()
+        # Spans from the scheduler, thought engine and MCP client land in this mission's trace file.
+        self.trace = start_trace(self.mission_id)
         try:
-            plan = self.scheduler.create_plan(self.goal)
-            if not plan: print("Mission aborted: No valid plan."); return
-            print("\n📝 High-Level Plan Created:");
-            [print(f"  - {task.description}") for task in plan]
-            if input("\nProceed? (y/n): ").lower() != 'y': print("Mission aborted."); return
+            with span("mission", goal=self.goal) as attrs:
+                self._run_mission()
+                attrs["outcome"] = self.outcome
+        finally:
+            self.finished_at = time.time()
+        return self.build_report()
+
+    def _run_mission(self):
+        if self.resumed:
+            self._resume_mission()
+            return
+        self.event_manager.log_event("INFO", f"Starting mission {self.mission_id} for goal: {self.goal}")
+        self.journal.record_start(self.goal)
+        try:
+            print("\n📝 High-Level Plan:")
+            # Steps are printed as the model streams them, before the rest of the plan has arrived.
+            plan = self.scheduler.create_plan(self.goal, on_step=self._print_plan_step, refresh=self.refresh_plan)
+            self.plan = plan
+            if not plan: print("Mission aborted: No valid plan."); self._finish("NO_PLAN"); return
+            self.journal.record_plan(plan)
+            if not self._approve_plan(): return
+            # Only a plan the operator accepted (or an auto-approved one) is reused for later goals.
+            self.scheduler.cache_plan(self.goal, plan, refresh=self.refresh_plan)
         except (APITimeoutError, KeyboardInterrupt) as e:
             print(f"\nMission aborted during planning: {e}");
+            self._finish("ABORTED")
             return
+        self._execute_plan(self.plan)
 
-        session_id = self.mcp_client.start_session()
+    def _resume_mission(self):
+        if self.outcome != "PENDING":
+            print(f"Mission {self.mission_id} already finished ({self.outcome}); nothing to resume.")
+            return
+        if not self.plan:
+            # Interrupted before the plan was recorded: start over with the same mission ID.
+            self.resumed = False
+            self._run_mission()
+            return
+        self.event_manager.log_event("INFO", f"Resuming mission {self.mission_id} after "
+                                             f"{len(self.mission_history)} recorded steps: {self.goal}")
+        self.journal.record_start(self.goal, resumed=True)
+        print("\n📝 High-Level Plan (resumed):")
+        for task in self.plan:
+            self._print_plan_step(task)
+        if not self.plan_approved:
+            # Interrupted at the approval prompt: the plan was never accepted, so ask now.
+            try:
+                if not self._approve_plan(): return
+            except KeyboardInterrupt as e:
+                print(f"\nMission aborted during planning: {e}")
+                self._finish("ABORTED")
+                return
+        self._execute_plan(self.plan)
+
+    def _approve_plan(self) -> bool:
+        """Asks the operator to accept the plan (unless auto-approved) and journals the approval."""
+        if not self.auto_approve and input("\nProceed? (y/n): ").lower() != 'y':
+            print("Mission aborted."); self._finish("DECLINED"); return False
+        self.journal.record_approval()
+        self.plan_approved = True
+        return True
+
+    def _finish(self, outcome: str):
+        self.outcome = outcome
+        self.journal.record_outcome(outcome)
+
+    def _execute_plan(self, plan):
+        session_id = self.session_pool.acquire() if self.session_pool else self.mcp_client.start_session()
+        self.trace.session_id = session_id
+        on_chunk = self._print_chunk if self.show_progress else None
+        self.outcome = "INCOMPLETE"
         try:
+            pending = self._pending_commands[:max(self.max_steps - len(self.mission_history), 0)]
+            self._pending_commands = []
+            if pending:
+                print(f"  > Re-running {len(pending)} command(s) interrupted before they finished...")
+                self._run_commands(session_id, self._pending_tool, pending, on_chunk)
             while True:
+                if len(self.mission_history) >= self.max_steps:
+                    self.event_manager.log_event("WARN", "Max step limit reached.");
+                    self._finish("STEP_LIMIT")
+                    break
+                self.trace.step = len(self.mission_history) + 1
+                if self.speculator:
+                    self.speculator.start(session_id, self.thought_engine.speculation_messages(
+                        self.goal, plan, self.mission_history, self.speculator.top_k))
                 action = self.thought_engine.choose_next_action(self.goal, plan, self.mission_history)
                 if action.tool_name == "finish_mission":
                     self.event_manager.log_event("SUCCESS", "AI decided mission is complete.")
-                    self.mission_history.append(
-                        {"command": "finish_mission", "observation": {"key_finding": action.tool_input}})
+                    self.journal.record_action(action.tool_name, action.tool_input, [])
+                    self._record_step("finish_mission", {"key_finding": action.tool_input})
+                    self._finish("COMPLETED")
                     break
 
-                # The server now returns a perfect JSON observation (as a dict)
-                observation = self.mcp_client.execute_command(session_id, action.tool_input)
-                self.mission_history.append({"command": action.tool_input, "observation": observation})
-
-                if len(self.mission_history) >= 10:
-                    self.event_manager.log_event("WARN", "Max step limit reached.");
-                    break
+                # A batch never runs past the step limit: only as many commands as steps remain.
+                commands = action.commands[:self.max_steps - len(self.mission_history)]
+                if len(commands) < len(action.commands):
+                    self.event_manager.log_event(
+                        "WARN", f"Step limit: running {len(commands)} of {len(action.commands)} batched commands.")
+                self.journal.record_action(action.tool_name, action.tool_input, commands)
+                if not commands:
+                    # Nothing to run, but it still counts as a step, so the step limit can end a stuck loop.
+                    self._record_step(action.tool_name, {
+                        "status": "FAILURE", "full_output": "",
+                        "key_finding": f"`{action.tool_name}` was selected without any command to run."})
+                    continue
+                self._run_commands(session_id, action.tool_name, commands, on_chunk, action.timeout_seconds)
         except (APITimeoutError, KeyboardInterrupt) as e:
             print(f"\nMission aborted during execution: {e}")
+            if isinstance(e, KeyboardInterrupt):
+                # Don't leave a long scan running on the server, holding the container, after we've gone.
+                self.mcp_client.cancel(session_id)
+            self._finish("ABORTED")
+            print(f"  > Continue later with: python main.py --resume {self.mission_id}")
         finally:
-            self.mcp_client.end_session(session_id)
+            if self.speculator:
+                # Nothing speculative may still be running when the session changes hands.
+                self.speculator.close()
+            if self.session_pool:
+                self.session_pool.release(session_id)
+            else:
+                self.mcp_client.end_session(session_id)
             self._generate_final_report()
 
+    def _run_commands(self, session_id: str, tool_name: str, commands, on_chunk, timeout: Optional[float] = None):
+        if tool_name == "read_artifact":
+            observations = (self._read_artifact(query) for query in commands)
+        else:
+            speculated = self._take_speculated(commands)
+            remaining = [command for command in commands if command not in speculated]
+            if tool_name == "os_command_batch" and len(remaining) > 1:
+                # Independent commands run concurrently; observations are merged back in order.
+                print(f"  > Running {len(remaining)} independent commands in parallel...")
+                fresh = iter(self.mcp_client.execute_batch(session_id, remaining, use_cache=self.use_result_cache,
+                                                           timeout=timeout))
+            else:
+                # The server now returns a perfect JSON observation (as a dict)
+                fresh = (self.mcp_client.execute_command_streaming(
+                    session_id, command, on_chunk=on_chunk, use_cache=self.use_result_cache, timeout=timeout)
+                    for command in remaining)
+            observations = (speculated[command] if command in speculated else next(fresh) for command in commands)
+        for command, observation in zip(commands, observations):
+            if observation.get("cached"):
+                print(f"  > Reused cached result for `{command}` ({observation.get('cache_age_seconds', 0):.0f}s old)")
+            if observation.get("stopped"):
+                print(f"  > `{command}` was stopped ({observation['stopped']}); keeping its partial output.")
+            self._record_step(command, observation, tool_name="read_artifact" if tool_name == "read_artifact" else None)
+
+    def _take_speculated(self, commands) -> Dict[str, Dict]:
+        """Observations for the chosen commands that already ran speculatively."""
+        if not self.speculator:
+            return {}
+        speculated = {}
+        for command in commands:
+            observation = self.speculator.take(command)
+            if observation is not None:
+                print(f"  > Speculation hit: `{command}` already ran while the model was deciding.")
+                speculated[command] = observation
+        return speculated
+
+    def _read_artifact(self, query: str) -> Dict:
+        """Fetches the requested slice of a stored output; no command runs in the container."""
+        print(f"  > Reading artifact: {query}")
+        try:
+            output = self.tool_manager.get_tool("read_artifact").execute(query)
+        except (ValueError, RuntimeError) as e:
+            return {"status": "FAILURE", "key_finding": str(e), "full_output": ""}
+        return {"status": "SUCCESS", "key_finding": f"Read {len(output)} characters from the artifact.",
+                "full_output": output}
+
+    def _record_step(self, command: str, observation: Dict, tool_name: Optional[str] = None):
+        """Journals the observation before it enters the in-memory history, so a crash can't lose it."""
+        self.journal.record_observation(command, observation, tool_name)
+        step = {"command": command, "observation": observation}
+        if tool_name:
+            # Shell commands leave this out; other tools are named so the prompt replays them correctly.
+            step["tool_name"] = tool_name
+        self.mission_history.append(step)
+        changes = self.findings.ingest(len(self.mission_history), command, observation)
+        if changes:
+            print(f"  > New findings: {'; '.join(changes)}")
+
+    def build_report(self) -> Dict:
+        """A machine-readable summary of the mission, used by the batch runner."""
+        duration = (self.finished_at or time.time()) - (self.started_at or time.time())
+        return {
+            "mission_id": self.mission_id,
+            "goal": self.goal,
+            "outcome": self.outcome,
+            "duration_seconds": round(duration, 3),
+            "plan": [task.model_dump() for task in self.plan],
+            "plan_cached": self.scheduler.plan_cached,
+            "steps": self.mission_history,
+            "findings": self.findings.to_dict(),
+            "trace_file": self.trace.path if self.trace else None,
+            "journal_file": self.journal.path,
+            "speculation": self.speculator.report() if self.speculator else None,
+        }
+
+    @staticmethod
+    def _print_plan_step(task: TaskNode):
+        print(f"  {task.task_id}. {task.description}"
+              + (f" (after: {', '.join(map(str, task.dependencies))})" if task.dependencies else ""))
+
+    @staticmethod
+    def _print_chunk(stream: str, text: str):
+        print(text, end="", flush=True)
+
     def _generate_final_report(self):
         print("\n\n--- DAWNYAWN MISSION REPORT ---")
         print(f"Goal: {self.goal}\n")
+        print("Findings:")
+        print(self.findings.render(max_chars=10000) if self.findings else "  (no hosts, ports or vulnerabilities recorded)")
+        for vuln in self.findings.vulnerabilities():
+            print(f"  - {vuln['host']} {vuln['id']}: {vuln['detail']}")
+        print("\nSteps:")
         for i, item in enumerate(self.mission_history):
-            print(f"Step {i + 1}:")
-            print(f"  - Action: `{item['command']}`")
-            # Pretty-print the JSON observation for the report
-            observation_str = json.dumps(item.get('observation', {}), indent=2)
-            print(f"  - Observation:\n{observation_str}\n")
\ No newline at end of file
+            observation = item.get('observation', {})
+            print(f"  {i + 1}. `{item['command']}` -> {observation.get('status', 'UNKNOWN')}: "
+                  f"{observation.get('key_finding', '')}")
+        print()
+        if self.speculator:
+            stats = self.speculator.report()
+            print(f"Speculation: {stats['hits']} hits from {stats['executed']} pre-executed commands "
+                  f"({stats['wasted']} wasted, {stats['rejected']} candidates not read-only)")
\ No newline at end of file
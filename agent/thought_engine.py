@@ -1,17 +1,32 @@
 # dawnyawn/agent/thought_engine.py (Final, Complete Version)
 import re
-import json  # <-- Import the json library
+import json
+import functools
 from pydantic import BaseModel
 from pydantic_core import ValidationError
-from config import get_llm_client, LLM_MODEL_NAME, LLM_REQUEST_TIMEOUT
+from config import get_llm_client, llm_limiter, llm_request_options, LLM_REQUEST_TIMEOUT, PROMPT_TOKEN_BUDGET, MAX_OBSERVATION_PROMPT_CHARS, \
+    PROMPT_RECENT_STEPS, HISTORY_RECALL_K
+from agent.prompt_history import PromptHistory
+from agent.findings import FindingsStore
+from agent.stream_parsing import JsonObjectScanner, iter_stream_text
+from services.tracing import traced
 from tools.tool_manager import ToolManager
 from models.task_node import TaskNode
-from typing import List, Dict
+from typing import List, Dict, Optional, Tuple, Union
 
 
 class ToolSelection(BaseModel):
     tool_name: str
-    tool_input: str
+    tool_input: Union[str, List[str]]
+    # Deadline for each command, in seconds; None means the configured default.
+    timeout_seconds: Optional[float] = None
+
+    @property
+    def commands(self) -> List[str]:
+        """The command(s) to run; a batch selection carries several independent ones."""
+        if isinstance(self.tool_input, list):
+            return [command for command in self.tool_input if command.strip()]
+        return [self.tool_input] if self.tool_input.strip() else []
 
 
 def _clean_json_response(response_str: str) -> str:
@@ -22,14 +37,9 @@ def _clean_json_response(response_str: str) -> str:
     return response_str
 
 
-class ThoughtEngine:
-    """AI Reasoning component. Decides the single next action based on a plan and history."""
-
-    def __init__(self, tool_manager: ToolManager):
-        self.client = get_llm_client()
-        self.tool_manager = tool_manager
-        # The system prompt is now generated dynamically in choose_next_action
-        self.system_prompt_template = f"""
+@functools.lru_cache(maxsize=None)
+def _system_prompt(tool_manifest: str) -> str:
+    return f"""
 You are an expert penetration tester AI. Your job is to select the next command to execute to achieve the user's goal.
 
 **CRUCIAL ANALYSIS INSTRUCTIONS:**
@@ -38,54 +48,112 @@ You are an expert penetration tester AI. Your job is to select the next command
 3.  **Extract Valuable Data:** Even in a `FAILURE` observation (e.g., due to a timeout), the `full_output` may contain critical information like open ports or vulnerabilities. Use this partial data to inform your next step.
 4.  **Be Efficient:** Do not run the same scan twice. Use the information you already have.
 5.  **Use Real Commands:** Only generate valid, real-world shell commands. Do not invent `nmap` scripts or options.
-6.  **Goal Completion:** When you have gathered enough information to produce the final report described in the goal, you MUST use the `finish_mission` tool.
+6.  **Run Independent Work in Parallel:** When several commands do not depend on each other's results (e.g. scanning different hosts or ports, or `dig` and `whois` on the same target), select them together with the `os_command_batch` tool instead of one per step.
+7.  **Set Deadlines:** Commands are stopped after a default deadline and return whatever output they produced. For a scan you expect to be slow, or a check that should be quick, add an optional "timeout_seconds" key. An observation with `"stopped": "timeout"` holds partial output: use it, and narrow the command rather than re-running it unchanged.
+8.  **Goal Completion:** When you have gathered enough information to produce the final report described in the goal, you MUST use the `finish_mission` tool.
 
 **Your Response:**
-Your response MUST be a JSON object with EXACTLY TWO keys: "tool_name" and "tool_input".
+Your response MUST be a JSON object with the keys "tool_name" and "tool_input", and optionally "timeout_seconds".
 
 **Available Tools:**
-{self.tool_manager.get_tool_manifest()}
+{tool_manifest}
 """
 
+
+class ThoughtEngine:
+    """AI Reasoning component. Decides the single next action based on a plan and history."""
+
+    def __init__(self, tool_manager: ToolManager, findings: Optional[FindingsStore] = None):
+        self.tool_manager = tool_manager
+        # Filled by the TaskManager as observations arrive; the prompt shows it instead of raw history.
+        self.findings = findings
+        self.prompt_history = None
+        # Built once per distinct tool manifest and shared by every engine in the process.
+        self.system_prompt_template = _system_prompt(tool_manager.get_tool_manifest())
+
+    @property
+    def client(self):
+        # The shared client is only built on the first LLM call, not when the engine is created.
+        return get_llm_client()
+
+    def _sync_history(self, goal: str, plan: List[TaskNode], history: List[Dict]) -> PromptHistory:
+        """Appends only the steps that are new since the last call; a new mission starts a fresh builder."""
+        if self.prompt_history is None or self.prompt_history.goal != goal \
+                or self.prompt_history.steps_recorded > len(history):
+            self.prompt_history = PromptHistory(self.system_prompt_template, goal, plan,
+                                                PROMPT_TOKEN_BUDGET, MAX_OBSERVATION_PROMPT_CHARS,
+                                                PROMPT_RECENT_STEPS, HISTORY_RECALL_K, self.findings)
+        for item in history[self.prompt_history.steps_recorded:]:
+            # Use .get() for safety in case a key is missing
+            self.prompt_history.record_step(item.get('command', 'N/A'), item.get('observation', {}),
+                                            item.get('tool_name', 'os_command'))
+        return self.prompt_history
+
+    @staticmethod
+    def _read_selection(stream) -> Tuple[str, Optional[ToolSelection]]:
+        """Reads the stream until the first balanced JSON object that validates as a ToolSelection."""
+        scanner = JsonObjectScanner()
+        received = []
+        for text in iter_stream_text(stream):
+            received.append(text)
+            for candidate in scanner.feed(text):
+                try:
+                    return "".join(received), ToolSelection.model_validate_json(candidate)
+                except ValidationError:
+                    continue
+        return "".join(received), None
+
+    def speculation_messages(self, goal: str, plan: List[TaskNode], history: List[Dict], k: int) -> List[Dict]:
+        """The next-step prompt, asking instead for the `k` most likely next commands."""
+        messages = list(self._sync_history(goal, plan, history).messages())
+        messages.append({"role": "user", "content": (
+            f"Before deciding, list the {k} shell commands you are most likely to run next, most likely first. "
+            f"Respond ONLY with a JSON array of {k} command strings.")})
+        return messages
+
+    @traced("speculate")
+    def propose_candidates(self, messages: List[Dict], k: int) -> List[str]:
+        """Top-k candidate next commands, best first; any failure just means nothing is speculated."""
+        try:
+            with llm_limiter:
+                response = self.client.chat.completions.create(
+                    **llm_request_options("speculate"),
+                    messages=messages,
+                    timeout=LLM_REQUEST_TIMEOUT,
+                )
+            match = re.search(r'\[.*\]', response.choices[0].message.content or "", re.DOTALL)
+            candidates = json.loads(match.group(0)) if match else []
+        except Exception as e:
+            print(f"  > Speculation skipped: {type(e).__name__}")
+            return []
+        return [command.strip() for command in candidates if isinstance(command, str) and command.strip()][:k]
+
+    @traced("think")
     def choose_next_action(self, goal: str, plan: List[TaskNode], history: List[Dict]) -> ToolSelection:
         print(f"\n🤔 Thinking about the next step...")
 
-        # Format the plan and history for the prompt
-        formatted_plan = "\n".join([f"  - {step.description}" for step in plan])
-
-        formatted_history = "No actions taken yet."
-        if history:
-            # We now use json.dumps to format the observation cleanly and robustly
-            formatted_history = ""
-            for i, item in enumerate(history):
-                # Use .get() for safety in case a key is missing
-                command = item.get('command', 'N/A')
-                observation = item.get('observation', {})
-                # Pretty-print the observation JSON for the LLM
-                obs_str = json.dumps(observation, indent=2)
-                formatted_history += f"Action {i + 1}:\n  - Command: `{command}`\n  - Observation:\n{obs_str}\n"
-
-        user_prompt = (
-            f"Main Goal: {goal}\n\n"
-            f"Strategic Plan:\n{formatted_plan}\n\n"
-            f"Execution History:\n{formatted_history}\n\n"
-            "Based on all the information above, what is your single best command for your next action? Respond with a JSON object."
-        )
+        prompt_history = self._sync_history(goal, plan, history)
+        messages = prompt_history.messages()
+        estimated_tokens = prompt_history.estimated_tokens()
 
         try:
-            response = self.client.chat.completions.create(
-                model=LLM_MODEL_NAME,
-                messages=[
-                    {"role": "system", "content": self.system_prompt_template},
-                    {"role": "user", "content": user_prompt}
-                ],
-                timeout=LLM_REQUEST_TIMEOUT
-            )
-            raw_response = response.choices[0].message.content
-            cleaned_response = _clean_json_response(raw_response)
-
-            selection = ToolSelection.model_validate_json(cleaned_response)
-            print(f"  > AI's Next Action: {selection.tool_input}")
+            with llm_limiter:
+                stream = self.client.chat.completions.create(
+                    **llm_request_options("think"),
+                    messages=messages,
+                    timeout=LLM_REQUEST_TIMEOUT,
+                    stream=True
+                )
+                try:
+                    raw_response, selection = self._read_selection(stream)
+                finally:
+                    # Closing the stream early stops the server generating tokens we would discard.
+                    stream.close()
+            print(f"  > Prompt tokens: ~{estimated_tokens} (estimated, {len(messages)} messages)")
+            if selection is None:
+                # No streamed object validated; fall back to the whole response for a clear error.
+                selection = ToolSelection.model_validate_json(_clean_json_response(raw_response))
+            print(f"  > AI's Next Action: {' || '.join(selection.commands)}")
             return selection
 
         except (ValidationError) as e:
@@ -0,0 +1,166 @@
+# dawnyawn/benchmarks/fake_kali.py
+"""
+Stand-in for kali_driver.driver with the same KaliManager/KaliContainer interface, but no Docker or SSH.
+The benchmark runner installs it as `kali_driver.driver` before importing the execution server.
+Placement across Docker hosts is the real HostScheduler, driven by fake Docker clients.
+"""
+import time
+import threading
+from typing import Iterator, List, Optional, Tuple
+
+from kali_driver.hosts import DockerHost, HostScheduler
+
+
+class FakeKaliSettings:
+    """Knobs the benchmark runner sets before the server creates any container."""
+    startup_seconds: float = 1.0
+    command_seconds: float = 0.05
+    output_bytes: int = 2048
+    chunk_bytes: int = 4096
+    hosts: int = 1
+    host_cpus: int = 8
+    host_memory_bytes: int = 32 * 1024 ** 3
+
+
+class FakeDockerClient:
+    """Answers the health and capacity queries HostScheduler makes; `down` simulates an unreachable daemon."""
+
+    def __init__(self):
+        self.running = 0
+        self.down = False
+
+    def info(self) -> dict:
+        if self.down:
+            raise ConnectionError("fake Docker daemon is down")
+        return {"ContainersRunning": self.running, "NCPU": settings.host_cpus, "MemTotal": settings.host_memory_bytes}
+
+    def ping(self) -> bool:
+        return not self.down
+
+
+settings = FakeKaliSettings()
+
+
+def _fake_output(command: str, size: int) -> str:
+    """Deterministic output of roughly `size` bytes that still differs per command."""
+    line = f"{command} :: 80/tcp open http nginx 1.18.0 (Ubuntu)\n"
+    repeats = max(1, size // len(line))
+    return "".join(f"{i:06d} {line}" for i in range(repeats))[:max(size, 1)]
+
+
+class KaliContainer:
+    _ids = 0
+    _ids_lock = threading.Lock()
+
+    def __init__(self, owner, host: Optional[DockerHost] = None):
+        self._owner = owner
+        self.host = host
+        with KaliContainer._ids_lock:
+            KaliContainer._ids += 1
+            self.short_id = f"fake{KaliContainer._ids:04d}"
+        time.sleep(settings.startup_seconds)
+        self._connected = False
+        self._alive = True
+        self._cancelled = threading.Event()
+        self._running = 0
+        if host is not None:
+            host.client.running += 1
+        self.last_used = time.monotonic()
+
+    def warm_up(self):
+        self._connected = True
+        self.last_used = time.monotonic()
+
+    def is_healthy(self) -> bool:
+        return self._alive and self._connected
+
+    def reset(self):
+        self.last_used = time.monotonic()
+
+    def stream_command(self, command: str, chunk_size: Optional[int] = None,
+                       timeout: Optional[float] = None) -> Iterator[Tuple[str, object]]:
+        self._connected = True
+        chunk_size = chunk_size or settings.chunk_bytes
+        output = _fake_output(command, settings.output_bytes)
+        chunks = [output[i:i + chunk_size] for i in range(0, len(output), chunk_size)]
+        delay = settings.command_seconds / max(1, len(chunks))
+        deadline = time.monotonic() + timeout if timeout else None
+        self._running += 1
+        try:
+            for chunk in chunks:
+                if self._cancelled.wait(delay):
+                    yield "stopped", "cancelled"
+                    yield "exit", None
+                    return
+                if deadline and time.monotonic() > deadline:
+                    yield "stopped", "timeout"
+                    yield "exit", None
+                    return
+                yield "stdout", chunk
+            yield "exit", 0
+        finally:
+            self._running -= 1
+            if not self._running:
+                self._cancelled.clear()
+            self.last_used = time.monotonic()
+
+    def cancel(self) -> int:
+        running = self._running
+        if running:
+            self._cancelled.set()
+        return running
+
+    def run_command(self, command: str, timeout: Optional[float] = None) -> Tuple[str, Optional[int], Optional[str]]:
+        parts, exit_code, stopped = [], None, None
+        for stream, data in self.stream_command(command, timeout=timeout):
+            if stream == "exit":
+                exit_code = data
+            elif stream == "stopped":
+                stopped = data
+            else:
+                parts.append(data)
+        return "".join(parts).strip(), exit_code, stopped
+
+    def send_command_and_get_output(self, command: str) -> str:
+        return self.run_command(command)[0]
+
+    def destroy(self):
+        if self._alive and self.host is not None:
+            self.host.client.running -= 1
+        self._alive = False
+
+
+def docker_hosts_from_spec(spec: str, max_containers: int = 0) -> List[DockerHost]:
+    """`settings.hosts` fake daemons, whatever the spec says."""
+    return [DockerHost(f"fake-host{i + 1}", FakeDockerClient(), "localhost", max_containers)
+            for i in range(settings.hosts)]
+
+
+class KaliManager:
+    def __init__(self, backend: str = "fake", hosts: Optional[List[DockerHost]] = None, check_interval: float = 15.0):
+        self.backend = backend
+        self.scheduler = HostScheduler(hosts or docker_hosts_from_spec(""), check_interval=check_interval)
+        self.scheduler.check(force=True)
+
+    def create_container(self) -> "KaliContainer":
+        host = self.scheduler.pick()
+        try:
+            return KaliContainer(owner=self, host=host)
+        except Exception:
+            self.scheduler.release(host)
+            raise
+
+    def destroy_container(self, container: "KaliContainer"):
+        try:
+            container.destroy()
+        finally:
+            self.scheduler.release(container.host)
+
+    def check_hosts(self):
+        self.scheduler.check()
+
+    def drain_host(self, name: str, drained: bool = True):
+        return self.scheduler.drain(name, drained)
+
+    def host_stats(self) -> dict:
+        return self.scheduler.stats()
@@ -0,0 +1,166 @@
+# dawnyawn/benchmarks/fake_llm.py
+"""
+OpenAI-compatible stub for /v1/chat/completions with configurable latency and canned responses.
+It recognises the three prompts DawnYawn sends (planner, thought engine, server formatter) and
+answers each with a valid response, followed by chatter the streaming parsers should cut off.
+"""
+import re
+import json
+import time
+import uuid
+import hashlib
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Tuple
+
+PLAN_RESPONSE = (
+    "1. Enumerate open ports on the target. (after: none)\n"
+    "2. Look up DNS records for the target. (after: none)\n"
+    "3. Fetch the homepage of any web server found. (after: 1)\n"
+    "\nLet me know if you would like me to refine this plan."
+)
+TRAILING_CHATTER = "\n\nI chose this action because it is the most informative next step given the history so far."
+
+
+class FakeLlmSettings:
+    first_token_seconds: float = 0.2
+    token_seconds: float = 0.002
+    mission_steps: int = 3
+
+
+class FakeLlmServer:
+    """Runs the stub on a background thread; `base_url` is what OLLAMA_BASE_URL should point at."""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, settings: FakeLlmSettings = None):
+        self.settings = settings or FakeLlmSettings()
+        self.requests_served = 0
+        self._lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer((host, port), self._make_handler())
+        self._httpd.daemon_threads = True
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="fake-llm", daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self) -> "FakeLlmServer":
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def respond(self, messages: List[Dict]) -> str:
+        """Picks the canned answer for whichever DawnYawn component sent `messages`."""
+        system = messages[0]["content"] if messages else ""
+        if "master strategist" in system:
+            return PLAN_RESPONSE
+        if "JSON formatting assistant" in system:
+            prompt = messages[-1]["content"]
+            command = re.search(r'command `([^`]*)`', prompt)
+            finding = f"Fake finding for `{command.group(1) if command else 'command'}`."
+            return json.dumps({"status": "SUCCESS", "key_finding": finding, "full_output": "(elided by fake LLM)"})
+        # Older steps are folded out of the conversation, so count from the latest observation's number.
+        numbers = [re.search(r'Observation for action (\d+)', message["content"]) for message in messages[2:]]
+        steps_taken = max((int(match.group(1)) for match in numbers if match), default=0)
+        # Distinct per mission goal and step, but the same for the candidate list and the actual choice.
+        goal = messages[1]["content"] if len(messages) > 1 else ""
+        command = f"dig +short step{steps_taken + 1}-{hashlib.sha1(goal.encode()).hexdigest()[:8]}.bench.example"
+        if "most likely to run next" in messages[-1]["content"]:
+            return json.dumps([command, "whois bench.example", "curl -I http://bench.example"])
+        if steps_taken >= self.settings.mission_steps:
+            selection = {"tool_name": "finish_mission", "tool_input": "Benchmark mission complete."}
+        else:
+            selection = {"tool_name": "os_command", "tool_input": command}
+        return "```json\n" + json.dumps(selection) + "\n```" + TRAILING_CHATTER
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                if not self.path.rstrip("/").endswith("/chat/completions"):
+                    self.send_error(404)
+                    return
+                with server._lock:
+                    server.requests_served += 1
+                content = server.respond(body.get("messages", []))
+                time.sleep(server.settings.first_token_seconds)
+                if body.get("stream"):
+                    self._stream(body.get("model", "fake"), content)
+                else:
+                    self._complete(body.get("model", "fake"), content)
+
+            def _complete(self, model: str, content: str):
+                time.sleep(server.settings.token_seconds * len(_tokens(content)))
+                payload = json.dumps({
+                    "id": f"chatcmpl-{uuid.uuid4().hex}", "object": "chat.completion",
+                    "created": int(time.time()), "model": model,
+                    "choices": [{"index": 0, "message": {"role": "assistant", "content": content},
+                                 "finish_reason": "stop"}],
+                    "usage": {"prompt_tokens": 0, "completion_tokens": len(_tokens(content)), "total_tokens": 0},
+                }).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def _stream(self, model: str, content: str):
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Connection", "close")
+                self.end_headers()
+                self.close_connection = True
+                completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+                try:
+                    for token, finish in _tokens_with_finish(content):
+                        if token:
+                            time.sleep(server.settings.token_seconds)
+                        chunk = {"id": completion_id, "object": "chat.completion.chunk",
+                                 "created": int(time.time()), "model": model,
+                                 "choices": [{"index": 0, "delta": {"content": token} if token else {},
+                                              "finish_reason": finish}]}
+                        self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+                        self.wfile.flush()
+                    self.wfile.write(b"data: [DONE]\n\n")
+                except (BrokenPipeError, ConnectionResetError):
+                    # The client stopped reading early, which is exactly what early stop should do.
+                    pass
+
+        return Handler
+
+
+def _tokens(content: str) -> List[str]:
+    """Splits text into word-ish pieces that concatenate back to the original."""
+    return re.findall(r'\s*\S+|\s+', content)
+
+
+def _tokens_with_finish(content: str) -> List[Tuple[str, object]]:
+    return [(token, None) for token in _tokens(content)] + [("", "stop")]
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="OpenAI-compatible stub LLM for DawnYawn benchmarks")
+    parser.add_argument("--port", type=int, default=11435)
+    parser.add_argument("--first-token-seconds", type=float, default=FakeLlmSettings.first_token_seconds)
+    parser.add_argument("--token-seconds", type=float, default=FakeLlmSettings.token_seconds)
+    args = parser.parse_args()
+    fake_settings = FakeLlmSettings()
+    fake_settings.first_token_seconds = args.first_token_seconds
+    fake_settings.token_seconds = args.token_seconds
+    stub = FakeLlmServer(port=args.port, settings=fake_settings).start()
+    print(f"Fake LLM listening at {stub.base_url}")
+    try:
+        stub._thread.join()
+    except KeyboardInterrupt:
+        stub.stop()
@@ -0,0 +1,340 @@
+# dawnyawn/benchmarks/run_benchmarks.py
+"""
+Offline performance suite: runs the real execution server and agent against a stub LLM and a fake
+Kali backend, so no Ollama, Docker or sshd is needed. Results are written as JSON; pass --compare
+with an earlier results file to see per-metric deltas between commits.
+
+    python -m benchmarks.run_benchmarks --output bench.json
+    python -m benchmarks.run_benchmarks --output new.json --compare bench.json
+"""
+import os
+import sys
+import json
+import time
+import socket
+import tempfile
+import asyncio
+import argparse
+import platform
+import statistics
+import subprocess
+import threading
+import contextlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SERVER_DIR = os.path.join(ROOT, "kali_execution_server")
+ALL_BENCHMARKS = ("session_start", "execute_throughput", "formatter", "mission", "cold_start")
+# Each cold-start case is timed in a fresh interpreter: the CLI's argument handling, and the import a mission needs.
+COLD_START_CASES = {
+    "cli_help": [sys.executable, "main.py", "--help"],
+    "import_task_manager": [sys.executable, "-c", "import agent.task_manager"],
+}
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _summarize(samples: List[float]) -> Dict:
+    """Latency summary in milliseconds."""
+    ordered = sorted(samples)
+    if not ordered:
+        return {"count": 0}
+
+    def pct(p: float) -> float:
+        return ordered[min(len(ordered) - 1, max(0, int(round(p / 100 * len(ordered))) - 1))]
+
+    return {"count": len(ordered), "mean_ms": round(statistics.mean(ordered) * 1000, 3),
+            "p50_ms": round(pct(50) * 1000, 3), "p95_ms": round(pct(95) * 1000, 3),
+            "max_ms": round(ordered[-1] * 1000, 3)}
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+class BenchmarkHarness:
+    """Boots the stub LLM and the execution server (on the fake or the local backend) in-process."""
+
+    def __init__(self, args):
+        self.args = args
+        from benchmarks.fake_llm import FakeLlmServer, FakeLlmSettings
+        llm_settings = FakeLlmSettings()
+        llm_settings.first_token_seconds = args.llm_first_token
+        llm_settings.token_seconds = args.llm_token
+        llm_settings.mission_steps = args.mission_steps
+        self.llm = FakeLlmServer(settings=llm_settings).start()
+
+        # Must be set before config.py / kali_server.py read them at import time.
+        os.environ.update({
+            "OLLAMA_BASE_URL": self.llm.base_url, "OLLAMA_API_KEY": "benchmark", "LLM_MODEL": "fake-model",
+            "TRACE_DIR": "", "FORMAT_CACHE_DB": "", "PLAN_CACHE_DB": "",
+            # Journals stay on so their fsync cost is part of the mission timings.
+            "JOURNAL_DIR": tempfile.mkdtemp(prefix="dawnyawn-bench-journals-"),
+            "ARTIFACT_DIR": tempfile.mkdtemp(prefix="dawnyawn-bench-artifacts-"),
+            "KALI_POOL_MIN_WARM": str(args.pool_min_warm), "KALI_POOL_MAX_WARM": str(args.pool_max_warm),
+            "KALI_BACKEND": args.backend, "KALI_HOST_MAX_CONTAINERS": str(args.host_capacity),
+        })
+        for path in (SERVER_DIR, ROOT):
+            if path not in sys.path:
+                sys.path.insert(0, path)
+
+        if args.backend == "fake":
+            from benchmarks import fake_kali
+            fake_kali.settings.startup_seconds = args.kali_startup
+            fake_kali.settings.command_seconds = args.command_seconds
+            fake_kali.settings.output_bytes = args.output_bytes
+            fake_kali.settings.hosts = args.docker_hosts
+            sys.modules["kali_driver.driver"] = fake_kali
+
+        import uvicorn
+        import kali_server
+        from config import service_config
+        self.server_module = kali_server
+        port = _free_port()
+        self.loop = asyncio.new_event_loop()
+        self.server = uvicorn.Server(uvicorn.Config(kali_server.app, host="127.0.0.1", port=port,
+                                                    log_level="warning", loop="asyncio"))
+        self._thread = threading.Thread(target=self.loop.run_until_complete, args=(self.server.serve(),),
+                                        name="bench-server", daemon=True)
+        self._thread.start()
+        while not self.server.started:
+            time.sleep(0.05)
+        service_config.KALI_DRIVER_URL = f"http://127.0.0.1:{port}"
+        if args.via_gateway:
+            # Read when the shared LLM client is first built, so it can still be changed here.
+            import config
+            config.LLM_GATEWAY_URL = f"http://127.0.0.1:{port}/llm/v1"
+
+    def wait_for_warm_pool(self, timeout: float = 60.0):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.server_module.container_pool.stats()["idle"] >= self.args.pool_min_warm:
+                return
+            time.sleep(0.05)
+
+    def close(self):
+        self.server.should_exit = True
+        self._thread.join(timeout=30)
+        self.llm.stop()
+
+    # --- Benchmarks ---
+    def bench_session_start(self) -> Dict:
+        """Sequential starts against a full warm pool, then a burst of concurrent starts that drains it."""
+        from services.mcp_client import McpClient
+        client = McpClient()
+        warm = []
+        for _ in range(self.args.session_starts):
+            self.wait_for_warm_pool()
+            started = time.perf_counter()
+            session_id = client.start_session()
+            warm.append(time.perf_counter() - started)
+            client.end_session(session_id)
+
+        self.wait_for_warm_pool()
+
+        def timed_start(_):
+            started = time.perf_counter()
+            return client.start_session(), time.perf_counter() - started
+
+        with ThreadPoolExecutor(max_workers=self.args.sessions) as executor:
+            burst = list(executor.map(timed_start, range(self.args.sessions)))
+        # Where the burst landed, while its sessions are still open.
+        per_host = {}
+        for session in self.server_module.active_sessions.values():
+            per_host[session.host] = per_host.get(session.host, 0) + 1
+        for session_id, _ in burst:
+            client.end_session(session_id)
+        return {"warm": _summarize(warm), "burst": _summarize([elapsed for _, elapsed in burst]),
+                "burst_sessions": self.args.sessions, "burst_sessions_per_host": per_host}
+
+    def bench_execute_throughput(self) -> Dict:
+        """N sessions each executing M distinct commands back to back, all sessions at once."""
+        from services.mcp_client import McpClient
+        client = McpClient()
+        self.wait_for_warm_pool()
+        sessions = [client.start_session() for _ in range(self.args.sessions)]
+        latencies: List[float] = []
+        lock = threading.Lock()
+
+        def drive(index: int):
+            for i in range(self.args.commands_per_session):
+                started = time.perf_counter()
+                client.execute_command(sessions[index], f"echo throughput {index} {i} {time.time_ns()}")
+                with lock:
+                    latencies.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.args.sessions) as executor:
+            list(executor.map(drive, range(self.args.sessions)))
+        wall = time.perf_counter() - started
+        for session_id in sessions:
+            client.end_session(session_id)
+        return {"sessions": self.args.sessions, "commands": len(latencies), "wall_seconds": round(wall, 3),
+                "commands_per_second": round(len(latencies) / wall, 3) if wall else 0.0,
+                "latency": _summarize(latencies)}
+
+    def bench_formatter(self) -> Dict:
+        """Formatter cost per output size: LLM path on fresh output, then the cache path on a repeat."""
+        from benchmarks.fake_kali import _fake_output
+        results = {}
+        for size in self.args.output_sizes:
+            llm, cached = [], []
+            for i in range(self.args.formatter_repeats):
+                command = f"echo formatter {size} {i} {time.time_ns()}"
+                raw_output = _fake_output(command, size)
+                for samples in (llm, cached):
+                    started = time.perf_counter()
+                    asyncio.run_coroutine_threadsafe(
+                        self.server_module._format_output_as_json(command, raw_output, 0), self.loop).result()
+                    samples.append(time.perf_counter() - started)
+            results[str(size)] = {"llm": _summarize(llm), "cache": _summarize(cached)}
+        return {"fake_llm_first_token_ms": self.args.llm_first_token * 1000, "by_output_bytes": results}
+
+    def bench_mission(self) -> Dict:
+        """End-to-end TaskManager missions with auto-approval."""
+        from agent.task_manager import TaskManager
+        durations, steps, speculation, plans_cached = [], [], [], 0
+        for i in range(self.args.missions):
+            self.wait_for_warm_pool()
+            # With --plan-cache every mission is the same engagement against another host, so all but the first reuse its plan.
+            goal = f"Benchmark mission against target{i}.bench.example" if self.args.plan_cache else f"Benchmark mission {i}"
+            report = TaskManager(goal=goal, auto_approve=True, show_progress=False,
+                                 speculate=self.args.speculate).run()
+            plans_cached += report["plan_cached"]
+            durations.append(report["duration_seconds"])
+            if report["speculation"]:
+                speculation.append(report["speculation"])
+            steps.append(len(report["steps"]))
+        result = {"missions": len(durations), "steps_per_mission": round(statistics.mean(steps), 2) if steps else 0,
+                  "plans_cached": plans_cached, "duration": _summarize(durations)}
+        if speculation:
+            executed = sum(report["executed"] for report in speculation)
+            result["speculation"] = {"hits": sum(report["hits"] for report in speculation), "executed": executed,
+                                     "wasted": sum(report["wasted"] for report in speculation)}
+        return result
+
+    def bench_cold_start(self) -> Dict:
+        """Wall time of fresh interpreter launches, as a batch wrapper calling the CLI would see them."""
+        results = {}
+        for name, argv in COLD_START_CASES.items():
+            samples = []
+            for _ in range(self.args.cold_start_runs):
+                started = time.perf_counter()
+                subprocess.run(argv, cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+                samples.append(time.perf_counter() - started)
+            results[name] = _summarize(samples)
+        return results
+
+
+def _flatten(results: Dict, prefix: str = "") -> Dict[str, float]:
+    flat = {}
+    for key, value in results.items():
+        name = f"{prefix}.{key}" if prefix else key
+        if isinstance(value, dict):
+            flat.update(_flatten(value, name))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[name] = value
+    return flat
+
+
+def compare(baseline: Dict, current: Dict, threshold: float) -> List[str]:
+    """Prints per-metric deltas; returns the metrics that regressed by more than `threshold` (a fraction)."""
+    old, new = _flatten(baseline["results"]), _flatten(current["results"])
+    regressions = []
+    print(f"\n--- Compared with {baseline['meta'].get('commit', '?')} ---")
+    for name in sorted(old.keys() & new.keys()):
+        if not (name.endswith("_ms") or name.endswith("_seconds") or name.endswith("_per_second")):
+            continue
+        before, after = old[name], new[name]
+        if not before:
+            continue
+        change = (after - before) / before
+        # Throughput is better when it goes up; every other timed metric is better when it goes down.
+        worse = -change if name.endswith("_per_second") else change
+        marker = "  REGRESSION" if worse > threshold else ""
+        if worse > threshold:
+            regressions.append(name)
+        print(f"{name:60s} {before:>12.3f} -> {after:>12.3f} ({change:+.1%}){marker}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="DawnYawn offline benchmark suite")
+    parser.add_argument("--only", nargs="+", choices=ALL_BENCHMARKS, default=list(ALL_BENCHMARKS))
+    parser.add_argument("--output", default="benchmark_results.json", help="Where to write the JSON results.")
+    parser.add_argument("--compare", metavar="BASELINE_JSON", help="Earlier results to diff against.")
+    parser.add_argument("--regression-threshold", type=float, default=0.10,
+                        help="Relative slowdown that counts as a regression (default 0.10 = 10%%).")
+    parser.add_argument("--fail-on-regression", action="store_true", help="Exit non-zero if anything regressed.")
+    parser.add_argument("--verbose", action="store_true", help="Show agent and server output while running.")
+    # Workload
+    parser.add_argument("--sessions", type=int, default=4, help="Concurrent sessions for burst/throughput.")
+    parser.add_argument("--session-starts", type=int, default=5)
+    parser.add_argument("--commands-per-session", type=int, default=10)
+    parser.add_argument("--output-sizes", type=int, nargs="+", default=[1024, 16384, 262144])
+    parser.add_argument("--formatter-repeats", type=int, default=5)
+    parser.add_argument("--cold-start-runs", type=int, default=10, help="Fresh interpreters per cold-start case.")
+    parser.add_argument("--missions", type=int, default=3)
+    parser.add_argument("--mission-steps", type=int, default=3, help="Commands the fake LLM runs before finishing.")
+    # Fake backends
+    parser.add_argument("--llm-first-token", type=float, default=0.2, help="Stub LLM time to first token (s).")
+    parser.add_argument("--llm-token", type=float, default=0.002, help="Stub LLM delay per streamed token (s).")
+    parser.add_argument("--backend", choices=["fake", "local"], default="fake",
+                        help="Fake container backend, or the real driver's local subprocess backend.")
+    parser.add_argument("--via-gateway", action="store_true",
+                        help="Send agent LLM calls through the execution server's LLM gateway.")
+    parser.add_argument("--speculate", action="store_true", help="Run missions in speculative mode.")
+    parser.add_argument("--plan-cache", action="store_true",
+                        help="Give missions goals that differ only in their target, so later ones reuse the cached plan.")
+    parser.add_argument("--kali-startup", type=float, default=1.0, help="Fake container boot time (s).")
+    parser.add_argument("--command-seconds", type=float, default=0.05, help="Fake command run time (s).")
+    parser.add_argument("--output-bytes", type=int, default=2048, help="Fake command output size.")
+    parser.add_argument("--docker-hosts", type=int, default=1, help="Fake Docker hosts sessions are spread over.")
+    parser.add_argument("--host-capacity", type=int, default=0,
+                        help="Containers each Docker host may run (0 derives it from the host's CPUs and memory).")
+    parser.add_argument("--pool-min-warm", type=int, default=2)
+    parser.add_argument("--pool-max-warm", type=int, default=5)
+    args = parser.parse_args()
+
+    quiet = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(open(os.devnull, "w"))
+    results = {}
+    with quiet:
+        harness = BenchmarkHarness(args)
+        try:
+            for name in args.only:
+                bench: Callable[[], Dict] = getattr(harness, f"bench_{name}")
+                sys.stderr.write(f"Running {name}...\n")
+                results[name] = bench()
+        finally:
+            harness.close()
+
+    payload = {
+        "meta": {"commit": _git_commit(), "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+                 "python": platform.python_version(), "platform": platform.platform(),
+                 "settings": {key: value for key, value in vars(args).items()
+                              if key not in ("output", "compare", "verbose", "fail_on_regression")}},
+        "results": results,
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(payload, f, indent=2)
+    print(json.dumps(results, indent=2))
+    print(f"\nResults written to {args.output}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            regressions = compare(json.load(f), payload, args.regression_threshold)
+        if regressions and args.fail_on_regression:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,22 +1,66 @@
 # dawnyawn/config.py
 import os
-from openai import OpenAI
+import threading
+from typing import TYPE_CHECKING
 from dotenv import load_dotenv
 
+if TYPE_CHECKING:
+    from openai import OpenAI
+
 load_dotenv()
 
+# --- Connection Pools ---
+# Keep-alive connections held open to the LLM endpoint and to the execution server.
+LLM_POOL_MAXSIZE = int(os.getenv("LLM_POOL_MAXSIZE", "8"))
+MCP_POOL_MAXSIZE = int(os.getenv("MCP_POOL_MAXSIZE", "16"))
+
 # --- Centralized LLM Client Configuration ---
-def get_llm_client() -> OpenAI:
+_llm_client = None
+_llm_client_lock = threading.Lock()
+
+
+def get_llm_client() -> "OpenAI":
     """
-    Initializes and returns an OpenAI client configured for a local LLM server.
+    Returns the process-wide OpenAI client for the local LLM server. Every component shares it,
+    so planning and reasoning calls reuse the same keep-alive connection pool.
+    It is built, and openai/httpx imported, on the first call rather than at startup.
     """
-    return OpenAI(
-        base_url=os.getenv("OLLAMA_BASE_URL"),
-        api_key=os.getenv("OLLAMA_API_KEY"),
-    )
+    global _llm_client
+    with _llm_client_lock:
+        if _llm_client is None:
+            import httpx
+            from openai import OpenAI, DefaultHttpxClient
+            _llm_client = OpenAI(
+                # Through the execution server's gateway if configured, so its queue sees every mission.
+                base_url=LLM_GATEWAY_URL or os.getenv("OLLAMA_BASE_URL"),
+                api_key=os.getenv("OLLAMA_API_KEY"),
+                http_client=DefaultHttpxClient(
+                    limits=httpx.Limits(max_connections=LLM_POOL_MAXSIZE,
+                                        max_keepalive_connections=LLM_POOL_MAXSIZE,
+                                        keepalive_expiry=120.0),
+                ),
+            )
+        return _llm_client
 
 LLM_MODEL_NAME = os.getenv("LLM_MODEL")
 
+# Optional OpenAI-compatible gateway (the execution server's /llm/v1) that routes, queues and coalesces calls
+LLM_GATEWAY_URL = os.getenv("LLM_GATEWAY_URL", "")
+
+# Per-role models; planning can use a larger model than step reasoning. Both default to LLM_MODEL.
+LLM_ROLE_MODELS = {role: os.getenv(f"LLM_{role.upper()}_MODEL") or LLM_MODEL_NAME
+                   for role in ("plan", "think", "speculate")}
+
+
+def llm_request_options(role: str) -> dict:
+    """Model and headers for a chat completion made on behalf of `role` ("plan", "think" or "speculate")."""
+    # The gateway picks the model from the role header; talking to the LLM directly, the model decides.
+    return {"model": LLM_ROLE_MODELS[role], "extra_headers": {"X-LLM-Role": role}}
+
+# Shared across every mission in the process so concurrent missions can't flood the LLM server.
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "4"))
+llm_limiter = threading.BoundedSemaphore(LLM_MAX_CONCURRENCY)
+
 # --- NEW PERFORMANCE SETTINGS ---
 # Timeout for all LLM requests in seconds
 LLM_REQUEST_TIMEOUT = 600.0
@@ -24,6 +68,41 @@ LLM_REQUEST_TIMEOUT = 600.0
 # Maximum summary
 MAX_SUMMARY_INPUT_LENGTH = 5000
 
+# Token budget for the ThoughtEngine conversation; older steps are summarised beyond it
+PROMPT_TOKEN_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET", "6000"))
+
+# Characters of each observation's full_output kept in the prompt (head + tail)
+MAX_OBSERVATION_PROMPT_CHARS = 1500
+
+# Steps kept in full in the prompt; older ones go to a one-line ledger, and the HISTORY_RECALL_K most
+# relevant of those are recalled in detail each step
+PROMPT_RECENT_STEPS = int(os.getenv("PROMPT_RECENT_STEPS", "4"))
+HISTORY_RECALL_K = int(os.getenv("HISTORY_RECALL_K", "3"))
+
+# Default deadline for one command, in seconds; the model may ask for a different one per action.
+# A command that hits it is killed and its partial output comes back as the observation.
+COMMAND_TIMEOUT_SECONDS = float(os.getenv("COMMAND_TIMEOUT_SECONDS", "900"))
+
+# Steps a mission may take before it stops
+MAX_MISSION_STEPS = int(os.getenv("MAX_MISSION_STEPS", "10"))
+
+# Candidate next commands proposed per step in speculative mode (--speculate)
+SPECULATION_TOP_K = int(os.getenv("SPECULATION_TOP_K", "3"))
+# Speculative commands are meant to be quick; one that takes longer is stopped rather than delay the real step
+SPECULATION_COMMAND_TIMEOUT = float(os.getenv("SPECULATION_COMMAND_TIMEOUT", "60"))
+
+# Directory for per-mission trace files (<mission_id>.jsonl); empty disables tracing to disk
+TRACE_DIR = os.getenv("TRACE_DIR", "traces")
+
+# Plans reused across goals that differ only in their targets: SQLite file (empty keeps them in memory only),
+# how long a cached plan stays valid (seconds), and how many are held in memory
+PLAN_CACHE_DB = os.getenv("PLAN_CACHE_DB", "plan_cache.db")
+PLAN_CACHE_TTL = float(os.getenv("PLAN_CACHE_TTL", str(7 * 86400)))
+PLAN_CACHE_MAX_ENTRIES = int(os.getenv("PLAN_CACHE_MAX_ENTRIES", "256"))
+
+# Directory for crash-safe mission journals (<mission_id>.jsonl) used by --resume; empty disables them
+JOURNAL_DIR = os.getenv("JOURNAL_DIR", "journals")
+
 # --- Service Configuration ---
 class ServiceConfig:
     KALI_DRIVER_URL: str = "http://127.0.0.1:1611"
@@ -0,0 +1,55 @@
+# kali_execution_server/artifacts/grep.py
+"""
+Line search over a memory-mapped artifact. Run as a script, it is the child process the store uses for
+regex greps: it reads a JSON request on stdin and writes one JSON line per match, then `null`.
+"""
+import re
+import sys
+import json
+import mmap
+from typing import Dict, Iterator
+
+
+def scan_lines(mm, compiled: "re.Pattern") -> Iterator[Dict]:
+    """Matching lines, once each, with 1-based line numbers and the byte range of the line."""
+    line_number, counted_to, last_line_start = 1, 0, -1
+    for match in compiled.finditer(mm):
+        line_start = mm.rfind(b"\n", 0, match.start()) + 1
+        if line_start == last_line_start:
+            continue  # Several hits on one line are reported once.
+        line_number += mm[counted_to:line_start].count(b"\n")
+        counted_to = line_start
+        last_line_start = line_start
+        end = mm.find(b"\n", match.end())
+        yield {"line": line_number, "offset": line_start, "end": len(mm) if end == -1 else end}
+
+
+def with_context(mm, found: Dict, context: int) -> Dict:
+    """The reported match: the line plus up to `context` lines either side."""
+    start, end = found["offset"], found["end"]
+    for _ in range(context):
+        if start == 0:
+            break
+        start = mm.rfind(b"\n", 0, start - 1) + 1
+    for _ in range(context):
+        if end >= len(mm):
+            break
+        next_end = mm.find(b"\n", end + 1)
+        end = len(mm) if next_end == -1 else next_end
+    return {"line": found["line"], "offset": found["offset"], "text": mm[start:end].decode("utf-8", errors="replace")}
+
+
+def main():
+    request = json.load(sys.stdin)
+    compiled = re.compile(request["pattern"].encode("utf-8"), re.IGNORECASE if request["ignore_case"] else 0)
+    with open(request["path"], "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        for count, found in enumerate(scan_lines(mm, compiled)):
+            if count >= request["limit"]:
+                break
+            sys.stdout.write(json.dumps(with_context(mm, found, request["context"])) + "\n")
+            sys.stdout.flush()
+    sys.stdout.write("null\n")
+
+
+if __name__ == "__main__":
+    main()
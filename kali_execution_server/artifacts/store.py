@@ -0,0 +1,339 @@
+# kali_execution_server/artifacts/store.py
+import os
+import re
+import sys
+import gzip
+import json
+import mmap
+import time
+import select
+import subprocess
+import shutil
+import hashlib
+import tempfile
+import threading
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+from artifacts.grep import scan_lines, with_context
+
+_ARTIFACT_ID = re.compile(r'^[0-9a-f]{64}$')
+# Client-supplied grep patterns run on a blocking worker, so they are kept small and time-boxed.
+MAX_GREP_PATTERN_CHARS = 256
+GREP_TIME_BUDGET_SECONDS = 5.0
+# Python's re can't be interrupted mid-match, and a client-supplied regex can backtrack for ever on a
+# single line. Regex greps therefore run in a child process that is killed when the time budget runs out;
+# literal greps are linear and run in place.
+_GREP_WORKER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "grep.py")
+
+
+class ArtifactNotFound(KeyError):
+    pass
+
+
+def excerpt(head: str, tail: str, omitted: int, artifact_id: str) -> str:
+    """Head and tail of a spilled output, with a marker telling the agent where the rest lives."""
+    if omitted <= 0:
+        return head + tail
+    return (f"{head}\n...[{omitted} characters stored in artifact {artifact_id}; "
+            f"use read_artifact to grep or page through it]...\n{tail}")
+
+
+class ArtifactWriter:
+    """
+    Accepts output in chunks. Small outputs stay in memory; once the spill threshold is crossed the
+    chunks go to a temporary file while being hashed, and `close()` files them in the store.
+    """
+
+    def __init__(self, store: "ArtifactStore"):
+        self._store = store
+        self._hash = hashlib.sha256()
+        self._parts: List[str] = []
+        self._file = None
+        self._closed = False
+        self.size = 0
+        self.lines = 0
+        self._chars = 0
+        self._head = ""
+        self._tail = ""
+
+    @property
+    def spilled(self) -> bool:
+        return self._file is not None
+
+    def write(self, text: str):
+        if not text:
+            return
+        data = text.encode("utf-8")
+        self._hash.update(data)
+        self.size += len(data)
+        self.lines += text.count("\n")
+        self._chars += len(text)
+        half = self._store.excerpt_chars // 2
+        if len(self._head) < half:
+            self._head += text[:half - len(self._head)]
+        self._tail = (self._tail + text)[-half:]
+        if self._file is not None:
+            self._file.write(data)
+            return
+        self._parts.append(text)
+        if self._chars > self._store.spill_chars:
+            self._file = tempfile.NamedTemporaryFile(dir=self._store.tmp_dir, delete=False)
+            for part in self._parts:
+                self._file.write(part.encode("utf-8"))
+            self._parts = []
+
+    def text(self) -> Optional[str]:
+        """The whole output, if it never spilled."""
+        return None if self.spilled else "".join(self._parts)
+
+    def close(self) -> Optional[Dict]:
+        """Files a spilled output in the store and returns its metadata (None if it stayed in memory)."""
+        if self._file is None:
+            return None
+        self._closed = True
+        self._file.close()
+        artifact_id = self._hash.hexdigest()
+        meta = {"id": artifact_id, "size_bytes": self.size, "lines": self.lines + 1, "created_at": time.time()}
+        meta["excerpt"] = excerpt(self._head, self._tail, self._chars - len(self._head) - len(self._tail), artifact_id)
+        self._store._commit(self._file.name, meta)
+        return meta
+
+    def discard(self):
+        """Removes the spill file of an output that was never closed (a failed or abandoned command)."""
+        if self._file is None or self._closed:
+            return
+        self._closed = True
+        self._file.close()
+        try:
+            os.unlink(self._file.name)
+        except FileNotFoundError:
+            pass
+
+
+class ArtifactStore:
+    """
+    Content-addressed store for large raw outputs. Artifacts are kept gzip-compressed at rest; reads go
+    through an uncompressed copy that is memory-mapped, so a range or grep never loads the whole output.
+    Uncompressed copies are an LRU bounded by `materialized_budget_bytes`; compressed blobs expire after `ttl`,
+    checked at most every `prune_interval` seconds.
+    """
+
+    def __init__(self, root: str, spill_chars: int = 8000, excerpt_chars: int = 1200,
+                 materialized_budget_bytes: int = 512 * 1024 * 1024, ttl: float = 7 * 86400,
+                 prune_interval: float = 300.0):
+        self.root = root
+        self.spill_chars = spill_chars
+        self.excerpt_chars = excerpt_chars
+        self.materialized_budget_bytes = materialized_budget_bytes
+        self.ttl = ttl
+        self.prune_interval = prune_interval
+        self._last_prune = 0.0
+        self.blob_dir = os.path.join(root, "blobs")
+        self.raw_dir = os.path.join(root, "raw")
+        self.tmp_dir = os.path.join(root, "tmp")
+        for path in (self.blob_dir, self.raw_dir, self.tmp_dir):
+            os.makedirs(path, exist_ok=True)
+        self._lock = threading.Lock()
+        self._counters = {"spilled": 0, "deduplicated": 0, "range_reads": 0, "greps": 0, "expired": 0}
+
+    # --- Writing ---
+    def writer(self) -> ArtifactWriter:
+        return ArtifactWriter(self)
+
+    def spill(self, text: str) -> Optional[Dict]:
+        """Stores `text` if it is over the spill threshold and returns its metadata, else None."""
+        if len(text) <= self.spill_chars:
+            return None
+        writer = self.writer()
+        writer.write(text)
+        return writer.close()
+
+    def _paths(self, artifact_id: str):
+        if not _ARTIFACT_ID.match(artifact_id):
+            raise ArtifactNotFound(artifact_id)
+        return (os.path.join(self.blob_dir, f"{artifact_id}.gz"), os.path.join(self.blob_dir, f"{artifact_id}.json"),
+                os.path.join(self.raw_dir, artifact_id))
+
+    def _commit(self, tmp_path: str, meta: Dict):
+        blob_path, meta_path, raw_path = self._paths(meta["id"])
+        with self._lock:
+            if os.path.exists(blob_path):
+                self._counters["deduplicated"] += 1
+                os.unlink(tmp_path)
+                os.utime(meta_path)
+                return
+            gz_tmp = f"{tmp_path}.gz"
+            with open(tmp_path, "rb") as src, gzip.open(gz_tmp, "wb", compresslevel=6) as dst:
+                shutil.copyfileobj(src, dst)
+            with open(f"{meta_path}.tmp", "w", encoding="utf-8") as f:
+                json.dump(meta, f)
+            # Blob first, metadata last: an artifact is visible only once both are complete.
+            os.replace(gz_tmp, blob_path)
+            os.replace(f"{meta_path}.tmp", meta_path)
+            # The uncompressed temp file becomes the memory-mapped copy for reads.
+            os.replace(tmp_path, raw_path)
+            self._counters["spilled"] += 1
+            # Expiry rescans every blob, so it runs on an interval rather than on every spill.
+            prune_due = time.monotonic() - self._last_prune >= self.prune_interval
+            if prune_due:
+                self._last_prune = time.monotonic()
+        if prune_due:
+            self.prune()
+        else:
+            self._trim_materialized()
+
+    # --- Reading ---
+    def info(self, artifact_id: str) -> Dict:
+        _, meta_path, _ = self._paths(artifact_id)
+        try:
+            with open(meta_path, encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            raise ArtifactNotFound(artifact_id)
+
+    def _materialize(self, artifact_id: str) -> str:
+        blob_path, _, raw_path = self._paths(artifact_id)
+        with self._lock:
+            if os.path.exists(raw_path):
+                os.utime(raw_path)
+                return raw_path
+            if not os.path.exists(blob_path):
+                raise ArtifactNotFound(artifact_id)
+            tmp = tempfile.NamedTemporaryFile(dir=self.tmp_dir, delete=False)
+            with gzip.open(blob_path, "rb") as src, tmp:
+                shutil.copyfileobj(src, tmp)
+            os.replace(tmp.name, raw_path)
+        self._trim_materialized(keep=raw_path)
+        return raw_path
+
+    @contextmanager
+    def _mapped(self, artifact_id: str):
+        try:
+            f = open(self._materialize(artifact_id), "rb")
+        except FileNotFoundError:
+            # The uncompressed copy was trimmed between materialising and opening it; rebuild it once.
+            f = open(self._materialize(artifact_id), "rb")
+        with f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            yield mm
+
+    def read_range(self, artifact_id: str, offset: int, length: int) -> bytes:
+        with self._mapped(artifact_id) as mm:
+            offset = max(0, min(offset, len(mm)))
+            with self._lock:
+                self._counters["range_reads"] += 1
+            return mm[offset:offset + max(0, length)]
+
+    def grep(self, artifact_id: str, pattern: str, max_matches: int = 50, context: int = 0,
+             ignore_case: bool = False, regex: bool = False) -> Dict:
+        """
+        Lines containing `pattern` (a regex if `regex` is set), with 1-based line numbers and byte offsets,
+        plus optional context lines. The scan stops (truncated) after GREP_TIME_BUDGET_SECONDS; a regex scan
+        is killed then, however far into a line it is. Raises ValueError (or re.error) for a rejected pattern.
+        """
+        if not pattern or len(pattern) > MAX_GREP_PATTERN_CHARS:
+            raise ValueError(f"Pattern must be 1-{MAX_GREP_PATTERN_CHARS} characters.")
+        flags = re.IGNORECASE if ignore_case else 0
+        compiled = re.compile(pattern.encode("utf-8") if regex else re.escape(pattern.encode("utf-8")), flags)
+        # One more than asked for tells whether the result is truncated.
+        limit = max_matches + 1
+        deadline = time.monotonic() + GREP_TIME_BUDGET_SECONDS
+        if regex:
+            matches, finished = self._grep_in_child(artifact_id, pattern, ignore_case, limit, context, deadline)
+        else:
+            matches, finished = [], True
+            with self._mapped(artifact_id) as mm:
+                for found in scan_lines(mm, compiled):
+                    if len(matches) >= limit:
+                        break
+                    if time.monotonic() > deadline:
+                        finished = False
+                        break
+                    matches.append(with_context(mm, found, context))
+        with self._lock:
+            self._counters["greps"] += 1
+        return {"artifact": artifact_id, "pattern": pattern, "matches": matches[:max_matches],
+                "truncated": len(matches) > max_matches or not finished}
+
+    def _grep_in_child(self, artifact_id: str, pattern: str, ignore_case: bool, limit: int, context: int,
+                       deadline: float):
+        """Runs a regex scan in a child process; returns the matches received and whether it finished in time."""
+        request = {"path": self._materialize(artifact_id), "pattern": pattern, "ignore_case": ignore_case,
+                   "limit": limit, "context": context}
+        worker = subprocess.Popen([sys.executable, "-I", _GREP_WORKER], stdin=subprocess.PIPE,
+                                  stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+        matches, finished, pending = [], False, b""
+        try:
+            try:
+                worker.stdin.write(json.dumps(request).encode("utf-8"))
+                worker.stdin.close()
+            except BrokenPipeError:
+                pass  # The worker exited early; the read below sees end of file.
+            while not finished:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or not select.select([worker.stdout], [], [], remaining)[0]:
+                    break
+                chunk = os.read(worker.stdout.fileno(), 65536)
+                if not chunk:
+                    break  # The worker died, e.g. its copy of the output was trimmed; report what arrived.
+                *lines, pending = (pending + chunk).split(b"\n")
+                for line in lines:
+                    item = json.loads(line)
+                    if item is None:
+                        finished = True
+                    else:
+                        matches.append(item)
+        finally:
+            if worker.poll() is None:
+                worker.kill()
+            worker.wait()
+            worker.stdout.close()
+        return matches, finished
+
+    # --- Housekeeping ---
+    def _trim_materialized(self, keep: Optional[str] = None):
+        entries = []
+        for name in os.listdir(self.raw_dir):
+            path = os.path.join(self.raw_dir, name)
+            if path == keep:
+                continue
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.materialized_budget_bytes:
+                break
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def prune(self):
+        """Drops artifacts older than the TTL and keeps uncompressed copies within budget."""
+        cutoff = time.time() - self.ttl
+        for name in os.listdir(self.blob_dir):
+            if not name.endswith(".json"):
+                continue
+            meta_path = os.path.join(self.blob_dir, name)
+            try:
+                if os.stat(meta_path).st_mtime >= cutoff:
+                    continue
+            except FileNotFoundError:
+                continue
+            artifact_id = name[:-len(".json")]
+            for path in self._paths(artifact_id):
+                try:
+                    os.unlink(path)
+                except FileNotFoundError:
+                    pass
+            with self._lock:
+                self._counters["expired"] += 1
+        self._trim_materialized()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self._counters)
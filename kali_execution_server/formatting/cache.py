@@ -0,0 +1,128 @@
+# kali_execution_server/formatting/cache.py
+import re
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+# Parts of command output that change between otherwise identical runs.
+_VOLATILE_PATTERNS = [
+    re.compile(r'\d{4}-\d{2}-\d{2}[ T]\d{2}:\d{2}(?::\d{2}(?:\.\d+)?)?(?:\s*(?:Z|[+-]\d{2}:?\d{2}|[A-Z]{2,5}))?'),
+    re.compile(r'\b(?:Mon|Tue|Wed|Thu|Fri|Sat|Sun),? [A-Z][a-z]{2} +\d{1,2} \d{2}:\d{2}:\d{2}(?: [A-Z]{2,5})?(?: \d{4})?'),
+    re.compile(r'\b\d{2}:\d{2}:\d{2}(?:\.\d+)?\b'),
+    re.compile(r'\b\d+(?:\.\d+)?\s*(?:ms|msec|s|sec|seconds?)\b'),
+    re.compile(r'time[=<]\s*[\d.]+'),
+    re.compile(r'\(\d+(?:\.\d+)?s latency\)'),
+    re.compile(r'rtt min/avg/max/mdev = \S+'),
+    re.compile(r'\bid: \d+\b'),
+    re.compile(r'\bicmp_seq=\d+'),
+]
+
+
+def normalize_output(raw_output: str) -> str:
+    """Strips timestamps, durations and similar run-to-run noise so equal results hash equally."""
+    normalized = raw_output
+    for pattern in _VOLATILE_PATTERNS:
+        normalized = pattern.sub("#", normalized)
+    return "\n".join(line.rstrip() for line in normalized.strip().splitlines())
+
+
+def cache_key(command: str, raw_output: str) -> str:
+    digest = hashlib.sha256()
+    digest.update(" ".join(command.split()).encode("utf-8"))
+    digest.update(b"\0")
+    digest.update(normalize_output(raw_output).encode("utf-8"))
+    return digest.hexdigest()
+
+
+class ObservationCache:
+    """Content-addressed cache of formatted observations: an in-memory LRU in front of optional SQLite."""
+
+    def __init__(self, max_entries: int = 1024, ttl: float = 86400.0,
+                 db_path: Optional[str] = None, db_max_entries: int = 10000):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.db_max_entries = db_max_entries
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+
+        self._db = None
+        if db_path:
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS observations ("
+                "key TEXT PRIMARY KEY, observation TEXT NOT NULL, created_at REAL NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS observations_created ON observations (created_at)")
+            self._db.commit()
+
+    def get(self, command: str, raw_output: str) -> Optional[dict]:
+        key = cache_key(command, raw_output)
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                created_at, observation = entry
+                if now - created_at <= self.ttl:
+                    self._memory.move_to_end(key)
+                    self._counters["memory_hits"] += 1
+                    return dict(observation)
+                del self._memory[key]
+
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT observation, created_at FROM observations WHERE key = ?", (key,)
+                ).fetchone()
+                if row and now - row[1] <= self.ttl:
+                    observation = json.loads(row[0])
+                    self._remember(key, row[1], observation)
+                    self._counters["disk_hits"] += 1
+                    return dict(observation)
+
+            self._counters["misses"] += 1
+            return None
+
+    def put(self, command: str, raw_output: str, observation: dict):
+        key = cache_key(command, raw_output)
+        now = time.time()
+        with self._lock:
+            self._remember(key, now, dict(observation))
+            self._counters["stores"] += 1
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO observations (key, observation, created_at) VALUES (?, ?, ?)",
+                    (key, json.dumps(observation), now),
+                )
+                self._db.execute("DELETE FROM observations WHERE created_at < ?", (now - self.ttl,))
+                self._db.execute(
+                    "DELETE FROM observations WHERE key IN ("
+                    "SELECT key FROM observations ORDER BY created_at DESC LIMIT -1 OFFSET ?)",
+                    (self.db_max_entries,),
+                )
+                self._db.commit()
+
+    def _remember(self, key: str, created_at: float, observation: dict):
+        self._memory[key] = (created_at, observation)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self._counters["evictions"] += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            hits = self._counters["memory_hits"] + self._counters["disk_hits"]
+            lookups = hits + self._counters["misses"]
+            return {
+                **self._counters,
+                "hit_rate": hits / lookups if lookups else 0.0,
+                "memory_entries": len(self._memory),
+                "disk_enabled": self._db is not None,
+            }
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
@@ -0,0 +1,9 @@
+# kali_execution_server/formatting/observation.py
+from pydantic import BaseModel
+
+
+# --- Pydantic Model for Structured Output ---
+class Observation(BaseModel):
+    status: str
+    key_finding: str
+    full_output: str
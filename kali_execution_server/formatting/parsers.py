@@ -0,0 +1,440 @@
+# kali_execution_server/formatting/parsers.py
+import os
+import re
+import shlex
+import threading
+import xml.etree.ElementTree as ET
+from abc import ABC, abstractmethod
+from typing import Dict, List, Optional
+
+from formatting.observation import Observation
+
+STDERR_MARKER = "--- STDERR ---"
+MAX_LISTED_ITEMS = 10
+# Prefixes that wrap the real program, e.g. `sudo timeout 60 nmap ...`.
+_WRAPPERS = {"sudo", "env", "nohup", "time", "stdbuf"}
+_COMPOUND_TOKENS = {"|", "||", "&&", ";", "&"}
+# `timeout` options that take a value (`-s KILL`, `-k 5`), so they aren't mistaken for the duration.
+_TIMEOUT_VALUE_OPTIONS = {"-s", "--signal", "-k", "--kill-after"}
+# Exit codes that report a result rather than an error, per tool, with what they mean.
+_NO_MATCH = {1: "no match"}
+NON_ERROR_EXIT_CODES: Dict[str, Dict[int, str]] = {
+    "grep": _NO_MATCH, "egrep": _NO_MATCH, "fgrep": _NO_MATCH, "zgrep": _NO_MATCH, "rg": _NO_MATCH,
+    "diff": {1: "files differ"}, "cmp": {1: "files differ"},
+}
+
+
+class CommandInvocation:
+    """The command as the parsers see it: the program actually run and its arguments."""
+
+    def __init__(self, command: str):
+        self.command = command
+        self.program: Optional[str] = None
+        self.args: List[str] = []
+        self.is_compound = False
+        # Whether output is redirected to (or input read from) a file, e.g. `nmap ... > scan.txt`.
+        # Duplicating a descriptor (`2>&1`) or discarding output (`2>/dev/null`) doesn't count.
+        self.has_redirect = False
+
+        try:
+            lexer = shlex.shlex(command, posix=True, punctuation_chars=True)
+            lexer.whitespace_split = True
+            tokens = list(lexer)
+        except ValueError:
+            return
+        if any(token in _COMPOUND_TOKENS for token in tokens):
+            # Pipelines and chains produce output we can't attribute to a single program.
+            self.is_compound = True
+            return
+        for index, token in enumerate(tokens):
+            if re.fullmatch(r'&?[<>]+&?', token):
+                target = tokens[index + 1] if index + 1 < len(tokens) else ""
+                if target != "/dev/null" and not (token.endswith("&") and target.isdigit()):
+                    self.has_redirect = True
+
+        while tokens:
+            head = tokens[0]
+            if os.path.basename(head) in _WRAPPERS or re.match(r'^\w+=', head):
+                tokens.pop(0)
+            elif head == "timeout" and len(tokens) > 1:
+                tokens = _skip_timeout_args(tokens[1:])
+            else:
+                break
+        if tokens:
+            self.program = os.path.basename(tokens[0])
+            self.args = tokens[1:]
+
+    @property
+    def non_error_exit_codes(self) -> Dict[int, str]:
+        return NON_ERROR_EXIT_CODES.get(self.program, {})
+
+    def has_short_flag(self, flag: str) -> bool:
+        """True if a single-letter flag is present on its own (`-I`) or combined (`-sI`)."""
+        return any(re.match(rf'^-[A-Za-z]*{flag}[A-Za-z]*$', arg) for arg in self.args)
+
+
+def _skip_timeout_args(tokens: List[str]) -> List[str]:
+    """Drops `timeout`'s own options and its duration, leaving the wrapped command."""
+    while tokens and tokens[0].startswith("-"):
+        option = tokens.pop(0)
+        if option == "--":
+            break
+        if option in _TIMEOUT_VALUE_OPTIONS and tokens:
+            tokens.pop(0)
+    return tokens[1:]
+
+
+def _split_streams(raw_output: str):
+    """Splits the server's combined output back into (stdout, stderr)."""
+    stdout, _, stderr = raw_output.partition(STDERR_MARKER)
+    return stdout.strip(), stderr.strip()
+
+
+def _summarize_list(items: List[str]) -> str:
+    shown = ", ".join(items[:MAX_LISTED_ITEMS])
+    if len(items) > MAX_LISTED_ITEMS:
+        shown += f" and {len(items) - MAX_LISTED_ITEMS} more"
+    return shown
+
+
+class OutputParser(ABC):
+    """Turns the raw output of a known command into an Observation without asking the LLM."""
+
+    @property
+    @abstractmethod
+    def name(self) -> str:
+        """A short identifier used in the hit-rate statistics."""
+        pass
+
+    @abstractmethod
+    def matches(self, invocation: CommandInvocation) -> bool:
+        """Cheap check on the command alone; decides whether `parse` is attempted."""
+        pass
+
+    @abstractmethod
+    def parse(self, invocation: CommandInvocation, raw_output: str,
+              exit_code: Optional[int]) -> Optional[Observation]:
+        """Returns an Observation, or None if the output isn't recognised and the LLM should handle it."""
+        pass
+
+
+class ExitStatusParser(OutputParser):
+    """Catches missing tools, failed commands with no output, and silent successes for any command."""
+    name = "exit_status"
+    _NOT_FOUND = re.compile(r'(?:^|\n)(?:\S+: (?:line \d+: |\d+: )?)?(\S+): (?:command )?not found')
+
+    def matches(self, invocation: CommandInvocation) -> bool:
+        return True
+
+    def parse(self, invocation, raw_output, exit_code):
+        stdout, stderr = _split_streams(raw_output)
+        not_found = self._NOT_FOUND.search(stderr or stdout)
+        if exit_code == 127 or (not_found and not stdout):
+            tool = not_found.group(1) if not_found else invocation.program or "command"
+            return Observation(status="FAILURE",
+                               key_finding=f"`{tool}` is not installed in the Kali environment.",
+                               full_output=raw_output)
+        if stdout:
+            return None
+        if exit_code in invocation.non_error_exit_codes:
+            meaning = invocation.non_error_exit_codes[exit_code]
+            return Observation(status="SUCCESS",
+                               key_finding=f"`{invocation.program}` exited with code {exit_code} ({meaning}).",
+                               full_output=raw_output)
+        if exit_code not in (None, 0):
+            last_line = stderr.splitlines()[-1] if stderr else "no output"
+            return Observation(status="FAILURE",
+                               key_finding=f"Command exited with code {exit_code}: {last_line}",
+                               full_output=raw_output)
+        if not stderr and exit_code == 0:
+            return Observation(status="SUCCESS", key_finding="Command completed with no output.",
+                               full_output=raw_output)
+        return None
+
+
+class NmapParser(OutputParser):
+    """Handles nmap normal (`-oN`/default), XML (`-oX -`) and grepable (`-oG -`) output."""
+    name = "nmap"
+    _PORT_LINE = re.compile(r'^(\d+)/(tcp|udp|sctp)\s+(open(?:\|filtered)?|filtered|closed)\s+(\S+)(?:\s+(.*))?$',
+                            re.MULTILINE)
+    _REPORT_FOR = re.compile(r'^Nmap scan report for (.+)$', re.MULTILINE)
+    _GREP_PORTS = re.compile(r'^Host: (\S+).*?Ports: (.*?)(?:\t|$)', re.MULTILINE)
+
+    def matches(self, invocation):
+        return invocation.program == "nmap"
+
+    def parse(self, invocation, raw_output, exit_code):
+        stdout, stderr = _split_streams(raw_output)
+        if "Failed to resolve" in raw_output:
+            return Observation(status="FAILURE", key_finding="nmap could not resolve the target hostname.",
+                               full_output=raw_output)
+        if "<nmaprun" in stdout:
+            return self._parse_xml(stdout, raw_output)
+        if "Ports: " in stdout and stdout.lstrip().startswith("# Nmap"):
+            return self._parse_grepable(stdout, raw_output)
+        return self._parse_normal(stdout, raw_output)
+
+    def _finding(self, open_ports: Dict[str, List[str]], hosts_up: int, raw_output: str) -> Observation:
+        if open_ports:
+            summary = "; ".join(f"{host}: {_summarize_list(ports)}" for host, ports in open_ports.items())
+            return Observation(status="SUCCESS", key_finding=f"Open ports found - {summary}.",
+                               full_output=raw_output)
+        if hosts_up:
+            return Observation(status="SUCCESS", key_finding="Host is up but no open ports were found in the scanned range.",
+                               full_output=raw_output)
+        return Observation(status="SUCCESS", key_finding="Target appears to be down or is blocking probes.",
+                           full_output=raw_output)
+
+    def _parse_normal(self, stdout: str, raw_output: str) -> Optional[Observation]:
+        if not self._REPORT_FOR.search(stdout) and "hosts up" not in stdout and "Host seems down" not in stdout:
+            return None
+        open_ports: Dict[str, List[str]] = {}
+        # Walk host sections so ports are attributed to the right host.
+        sections = self._REPORT_FOR.split(stdout)[1:]
+        for host, body in zip(sections[0::2], sections[1::2]):
+            for port, proto, state, service, version in self._PORT_LINE.findall(body):
+                if state.startswith("open"):
+                    label = f"{port}/{proto} {service}" + (f" ({version.strip()})" if version.strip() else "")
+                    open_ports.setdefault(host.strip(), []).append(label)
+        hosts_up = stdout.count("Host is up")
+        return self._finding(open_ports, hosts_up, raw_output)
+
+    def _parse_xml(self, stdout: str, raw_output: str) -> Optional[Observation]:
+        start, end = stdout.find("<nmaprun"), stdout.rfind("</nmaprun>")
+        if end == -1:
+            return None  # Truncated or interrupted XML; let the LLM make sense of it.
+        try:
+            root = ET.fromstring(stdout[start:end + len("</nmaprun>")])
+        except ET.ParseError:
+            return None
+        open_ports: Dict[str, List[str]] = {}
+        hosts_up = 0
+        for host in root.iter("host"):
+            status = host.find("status")
+            if status is not None and status.get("state") == "up":
+                hosts_up += 1
+            address = host.find("address")
+            name = address.get("addr") if address is not None else "unknown"
+            for port in host.iter("port"):
+                state = port.find("state")
+                if state is None or not state.get("state", "").startswith("open"):
+                    continue
+                service = port.find("service")
+                label = f"{port.get('portid')}/{port.get('protocol')}"
+                if service is not None:
+                    label += f" {service.get('name', '')}"
+                    version = " ".join(filter(None, [service.get("product"), service.get("version")]))
+                    if version:
+                        label += f" ({version})"
+                open_ports.setdefault(name, []).append(label)
+        return self._finding(open_ports, hosts_up, raw_output)
+
+    def _parse_grepable(self, stdout: str, raw_output: str) -> Optional[Observation]:
+        open_ports: Dict[str, List[str]] = {}
+        for host, ports in self._GREP_PORTS.findall(stdout):
+            for entry in ports.split(", "):
+                fields = entry.split("/")
+                if len(fields) >= 5 and fields[1].startswith("open"):
+                    label = f"{fields[0]}/{fields[2]} {fields[4]}".strip()
+                    if len(fields) >= 7 and fields[6]:
+                        label += f" ({fields[6]})"
+                    open_ports.setdefault(host, []).append(label)
+        hosts_up = stdout.count("Status: Up")
+        return self._finding(open_ports, hosts_up, raw_output)
+
+
+class DigParser(OutputParser):
+    name = "dig"
+    _STATUS = re.compile(r'status: (\w+)')
+    _ANSWER_SECTION = re.compile(r';; ANSWER SECTION:\n(.*?)(?:\n\n|\Z)', re.DOTALL)
+
+    def matches(self, invocation):
+        return invocation.program == "dig"
+
+    def parse(self, invocation, raw_output, exit_code):
+        stdout, _ = _split_streams(raw_output)
+        if "connection timed out" in stdout or "no servers could be reached" in stdout:
+            return Observation(status="FAILURE", key_finding="DNS query timed out; no servers could be reached.",
+                               full_output=raw_output)
+
+        if "+short" in invocation.args:
+            answers = [line.strip() for line in stdout.splitlines() if line.strip() and not line.startswith(";")]
+            if not answers:
+                return Observation(status="SUCCESS", key_finding="DNS query returned no records.", full_output=raw_output)
+            return Observation(status="SUCCESS", key_finding=f"DNS records: {_summarize_list(answers)}.",
+                               full_output=raw_output)
+
+        status = self._STATUS.search(stdout)
+        if not status:
+            return None
+        if status.group(1) != "NOERROR":
+            return Observation(status="FAILURE", key_finding=f"DNS query failed with status {status.group(1)}.",
+                               full_output=raw_output)
+        section = self._ANSWER_SECTION.search(stdout)
+        if not section:
+            return Observation(status="SUCCESS", key_finding="DNS query succeeded but returned no answer records.",
+                               full_output=raw_output)
+        records = []
+        for line in section.group(1).splitlines():
+            fields = line.split(None, 4)
+            if len(fields) == 5:
+                records.append(f"{fields[3]} {fields[4]}")
+        return Observation(status="SUCCESS", key_finding=f"DNS records: {_summarize_list(records)}.",
+                           full_output=raw_output)
+
+
+class WhoisParser(OutputParser):
+    name = "whois"
+    _NO_MATCH = re.compile(r'^(?:No match for|NOT FOUND|No Data Found|No entries found)', re.MULTILINE | re.IGNORECASE)
+    _FIELDS = {
+        "registrar": re.compile(r'^\s*Registrar:\s*(.+)$', re.MULTILINE),
+        "created": re.compile(r'^\s*Creation Date:\s*(.+)$', re.MULTILINE),
+        "expires": re.compile(r'^\s*(?:Registry Expiry Date|Registrar Registration Expiration Date|Expiration Date):\s*(.+)$',
+                              re.MULTILINE),
+    }
+    _NAME_SERVER = re.compile(r'^\s*Name Server:\s*(\S+)', re.MULTILINE | re.IGNORECASE)
+
+    def matches(self, invocation):
+        return invocation.program == "whois"
+
+    def parse(self, invocation, raw_output, exit_code):
+        stdout, _ = _split_streams(raw_output)
+        if self._NO_MATCH.search(stdout):
+            return Observation(status="FAILURE", key_finding="WHOIS returned no registration record for the domain.",
+                               full_output=raw_output)
+        found = {key: pattern.search(stdout) for key, pattern in self._FIELDS.items()}
+        name_servers = sorted({ns.lower() for ns in self._NAME_SERVER.findall(stdout)})
+        if not any(found.values()) and not name_servers:
+            return None
+        parts = []
+        if found["registrar"]: parts.append(f"registrar {found['registrar'].group(1).strip()}")
+        if found["created"]: parts.append(f"created {found['created'].group(1).strip()}")
+        if found["expires"]: parts.append(f"expires {found['expires'].group(1).strip()}")
+        if name_servers: parts.append(f"name servers {_summarize_list(name_servers)}")
+        return Observation(status="SUCCESS", key_finding=f"Domain registration: {'; '.join(parts)}.",
+                           full_output=raw_output)
+
+
+class CurlHeadParser(OutputParser):
+    """Handles `curl -I` / `curl --head` header dumps."""
+    name = "curl_head"
+    _STATUS_LINE = re.compile(r'^HTTP/[\d.]+\s+(\d{3})(?:[ \t]+([^\r\n]*))?', re.MULTILINE)
+    _CURL_ERROR = re.compile(r'curl: \((\d+)\) (.+)')
+
+    def matches(self, invocation):
+        return invocation.program == "curl" and ("--head" in invocation.args or invocation.has_short_flag("I"))
+
+    def parse(self, invocation, raw_output, exit_code):
+        stdout, stderr = _split_streams(raw_output)
+        error = self._CURL_ERROR.search(stderr or stdout)
+        statuses = list(self._STATUS_LINE.finditer(stdout))
+        if not statuses:
+            if error:
+                return Observation(status="FAILURE", key_finding=f"curl error {error.group(1)}: {error.group(2).strip()}",
+                                   full_output=raw_output)
+            return None
+
+        # With -L there is one header block per hop; the last one is the final response.
+        final = statuses[-1]
+        headers = {}
+        for line in stdout[final.end():].splitlines():
+            name, sep, value = line.partition(":")
+            if sep and name.strip():
+                headers[name.strip().lower()] = value.strip()
+        finding = f"HTTP {final.group(1)}"
+        if final.group(2):
+            finding += f" {final.group(2).strip()}"
+        if "server" in headers: finding += f", server: {headers['server']}"
+        if "x-powered-by" in headers: finding += f", powered by: {headers['x-powered-by']}"
+        if "location" in headers: finding += f", redirects to {headers['location']}"
+        return Observation(status="SUCCESS", key_finding=finding + ".", full_output=raw_output)
+
+
+class PingParser(OutputParser):
+    name = "ping"
+    _STATS = re.compile(r'(\d+) packets transmitted, (\d+) (?:packets )?received.*?([\d.]+)% packet loss')
+    _RTT = re.compile(r'= [\d.]+/([\d.]+)/')
+    _RESOLVE_ERRORS = ("unknown host", "Name or service not known", "Temporary failure in name resolution")
+
+    def matches(self, invocation):
+        return invocation.program in ("ping", "ping6")
+
+    def parse(self, invocation, raw_output, exit_code):
+        if any(message in raw_output for message in self._RESOLVE_ERRORS):
+            return Observation(status="FAILURE", key_finding="ping could not resolve the target hostname.",
+                               full_output=raw_output)
+        stats = self._STATS.search(raw_output)
+        if not stats:
+            return None
+        sent, received, loss = stats.groups()
+        if received == "0":
+            return Observation(status="FAILURE",
+                               key_finding=f"No replies to {sent} ICMP echo requests (100% packet loss); host may be down or filtering ICMP.",
+                               full_output=raw_output)
+        finding = f"Host is reachable: {received}/{sent} replies, {loss}% packet loss"
+        rtt = self._RTT.search(raw_output)
+        if rtt: finding += f", average RTT {rtt.group(1)} ms"
+        return Observation(status="SUCCESS", key_finding=finding + ".", full_output=raw_output)
+
+
+class ParserRegistry:
+    """Ordered set of parsers tried before the LLM formatter, with per-parser hit statistics."""
+
+    def __init__(self):
+        self._parsers: List[OutputParser] = []
+        self._stats: Dict[str, Dict[str, int]] = {}
+        self._total = 0
+        self._fallbacks = 0
+        self._lock = threading.Lock()
+
+    def register(self, parser: OutputParser):
+        self._parsers.append(parser)
+        self._stats[parser.name] = {"matched": 0, "hits": 0}
+
+    def parse(self, command: str, raw_output: str, exit_code: Optional[int] = None) -> Optional[Observation]:
+        invocation = CommandInvocation(command)
+        observation = None
+        with self._lock:
+            self._total += 1
+        for parser in self._parsers:
+            if invocation.is_compound and not isinstance(parser, ExitStatusParser):
+                continue
+            if not parser.matches(invocation):
+                continue
+            try:
+                observation = parser.parse(invocation, raw_output, exit_code)
+            except Exception as e:
+                print(f"   > ⚠️ Parser '{parser.name}' crashed, skipping it: {e}")
+                observation = None
+            with self._lock:
+                self._stats[parser.name]["matched"] += 1
+                if observation is not None:
+                    self._stats[parser.name]["hits"] += 1
+            if observation is not None:
+                return observation
+        with self._lock:
+            self._fallbacks += 1
+        return None
+
+    def stats(self) -> dict:
+        with self._lock:
+            parsers = {
+                name: {**counts, "hit_rate": counts["hits"] / counts["matched"] if counts["matched"] else 0.0}
+                for name, counts in self._stats.items()
+            }
+            handled = self._total - self._fallbacks
+            return {
+                "total": self._total,
+                "parsed": handled,
+                "llm_fallbacks": self._fallbacks,
+                "hit_rate": handled / self._total if self._total else 0.0,
+                "parsers": parsers,
+            }
+
+
+def build_default_registry() -> ParserRegistry:
+    registry = ParserRegistry()
+    # Exit-status detection runs first so a missing tool never reaches a tool-specific parser.
+    for parser in (ExitStatusParser(), NmapParser(), DigParser(), WhoisParser(), CurlHeadParser(), PingParser()):
+        registry.register(parser)
+    return registry
@@ -0,0 +1,167 @@
+# kali_execution_server/formatting/reduction.py
+import re
+from collections import deque
+from typing import Deque, Dict, List, Tuple
+
+_ANSI = re.compile(r'\x1b\[[0-9;?]*[A-Za-z]')
+# Lines that only report progress; they carry no findings and repeat endlessly.
+_PROGRESS = re.compile(
+    r'^\s*(?:Progress:|Stats:|Timing:|.*\bETC:|.*\bETA\b|.*\d{1,3}(?:\.\d+)?%\s*(?:done|complete)?\s*$|'
+    r'.*\[[=#>.\- ]{5,}\]|[|/\\-]\s*$)',
+    re.IGNORECASE,
+)
+# Digits and hex runs vary between otherwise identical lines (counters, offsets, timings).
+_VOLATILE = re.compile(r'0x[0-9a-f]+|\d+', re.IGNORECASE)
+
+# (pattern, weight): the higher the weight, the more a line is worth keeping.
+SALIENT_PATTERNS: List[Tuple[re.Pattern, int]] = [
+    (re.compile(r'\b\d{1,5}/(?:tcp|udp)\s+open\b', re.IGNORECASE), 5),
+    (re.compile(r'\bCVE-\d{4}-\d{4,}\b', re.IGNORECASE), 5),
+    (re.compile(r'\b(?:VULNERABLE|vulnerab\w*|exploit\w*|backdoor|injection|XSS|RCE)\b', re.IGNORECASE), 4),
+    (re.compile(r'\bOSVDB-\d+\b|^\+ ', re.IGNORECASE), 3),
+    (re.compile(r'\(Status:\s*[1-5]\d\d\)|\bHTTP/\d(?:\.\d)?\s+[1-5]\d\d\b|\bstatus(?: code)?[:=]\s*[1-5]\d\d\b',
+                re.IGNORECASE), 3),
+    (re.compile(r'\b(?:error|failed|failure|denied|refused|timed? ?out|unreachable|forbidden|unauthori[sz]ed|'
+                r'not found|invalid)\b', re.IGNORECASE), 2),
+    (re.compile(r'\b[A-Za-z][\w.+-]*[ /_-]v?\d+\.\d+(?:\.\d+)*[a-z]?\b'), 2),
+    (re.compile(r'\b(?:password|credential|token|secret|admin|login|root)\b', re.IGNORECASE), 2),
+    (re.compile(r'\b(?:\d{1,3}\.){3}\d{1,3}\b'), 1),
+]
+
+
+def _clean(line: str) -> str:
+    line = _ANSI.sub("", line)
+    # A carriage return means the terminal redrew the line; only the last frame was ever visible.
+    return line.rsplit("\r", 1)[-1].rstrip()
+
+
+def salience(line: str) -> int:
+    return sum(weight for pattern, weight in SALIENT_PATTERNS if pattern.search(line))
+
+
+class OutputReducer:
+    """
+    Line-level reduction of command output to a character budget, fed incrementally so streamed output of
+    any size is reduced in bounded memory. Progress lines and repeats are dropped; the head, the highest-value
+    lines (open ports, CVEs, versions, errors, HTTP statuses) and the tail are kept, in their original order.
+    """
+
+    def __init__(self, budget_chars: int = 2000, head_lines: int = 8, tail_lines: int = 15,
+                 max_salient_lines: int = 200):
+        self.budget_chars = budget_chars
+        self.head_lines = head_lines
+        self.max_salient_lines = max_salient_lines
+        self._pending = ""
+        self._line_no = 0
+        self._head: List[Tuple[int, str]] = []
+        self._tail: Deque[Tuple[int, str]] = deque(maxlen=tail_lines)
+        # line number -> (score, text); trimmed to the best `max_salient_lines` as it grows.
+        self._salient: Dict[int, Tuple[int, str]] = {}
+        self._seen: Dict[str, int] = {}  # Bounded by the number of distinct lines; cleared if it grows too large.
+        self.lines_total = 0
+        self.lines_dropped = 0
+
+    def feed(self, text: str):
+        self._pending += text
+        *lines, self._pending = self._pending.split("\n")
+        for line in lines:
+            self._consume(line)
+
+    def _consume(self, raw_line: str):
+        self.lines_total += 1
+        line = _clean(raw_line)
+        if not line.strip() or _PROGRESS.match(line):
+            self.lines_dropped += 1
+            return
+        # Low-value lines that differ only in numbers are repeats; salient ones (ports, CVEs) must stay distinct.
+        signature = line.strip() if salience(line) else _VOLATILE.sub("#", line.strip())
+        if signature in self._seen:
+            self._seen[signature] += 1
+            self.lines_dropped += 1
+            return
+        if len(self._seen) > 100000:
+            self._seen.clear()
+        self._seen[signature] = 1
+        self._line_no += 1
+        entry = (self._line_no, line)
+        if len(self._head) < self.head_lines:
+            self._head.append(entry)
+            return
+        if len(self._tail) == self._tail.maxlen:
+            # The line leaving the tail window is kept only if it is worth something.
+            evicted_no, evicted = self._tail[0]
+            score = salience(evicted)
+            if score:
+                self._salient[evicted_no] = (score, evicted)
+                if len(self._salient) > self.max_salient_lines * 2:
+                    self._trim_salient(self.max_salient_lines)
+        self._tail.append(entry)
+
+    def _trim_salient(self, keep: int):
+        best = sorted(self._salient.items(), key=lambda item: (-item[1][0], item[0]))[:keep]
+        self._salient = dict(best)
+
+    @staticmethod
+    def _fit(entries: List[Tuple[int, str]], budget: int, from_end: bool) -> List[Tuple[int, str]]:
+        """Keeps whole lines within `budget` characters, counted from the start or the end; always keeps one."""
+        ordered = list(reversed(entries)) if from_end else entries
+        kept, size = [], 0
+        for entry in ordered:
+            if kept and size + len(entry[1]) + 1 > budget:
+                break
+            kept.append(entry)
+            size += len(entry[1]) + 1
+        return list(reversed(kept)) if from_end else kept
+
+    def result(self) -> str:
+        if self._pending:
+            self._consume(self._pending)
+            self._pending = ""
+        head = self._fit(list(self._head), self.budget_chars // 5, from_end=False)
+        # Head lines over the head budget join the tail window, so short outputs still end with their last lines.
+        rest = self._head[len(head):] + list(self._tail)
+        tail = self._fit(rest, self.budget_chars // 4, from_end=True)
+        salient = dict(self._salient)
+        for number, text in rest[:len(rest) - len(tail)]:
+            if salience(text):
+                salient[number] = (salience(text), text)
+        ranked = sorted(salient.items(), key=lambda item: (-item[1][0], item[0]))
+
+        def render(middle: List[Tuple[int, str]]) -> str:
+            rows, previous = [], 0
+            for number, text in head + sorted(middle) + tail:
+                if number > previous + 1:
+                    rows.append(f"...[{number - previous - 1} lines omitted]...")
+                rows.append(text)
+                previous = number
+            return "\n".join(rows)
+
+        # Keep as many of the most salient middle lines as fit next to the head and tail.
+        chosen: List[Tuple[int, str]] = []
+        size = sum(len(text) + 1 for _, text in head + tail)
+        for number, (_, text) in ranked:
+            if size + len(text) + 1 > self.budget_chars:
+                continue
+            chosen.append((number, text))
+            size += len(text) + 1
+        reduced = render(chosen)
+        # "lines omitted" markers take room too; drop the least salient picks until it all fits.
+        while len(reduced) > self.budget_chars and chosen:
+            chosen.pop()
+            reduced = render(chosen)
+        if len(reduced) <= self.budget_chars:
+            return reduced
+        # Head and tail alone are over budget: favour the tail, where results and summaries usually sit.
+        marker = "\n...[truncated]...\n"
+        head_chars = self.budget_chars // 3
+        tail_chars = max(self.budget_chars - head_chars - len(marker), 0)
+        return reduced[:head_chars] + marker + (reduced[-tail_chars:] if tail_chars else "")
+
+
+def reduce_output(raw_output: str, budget_chars: int) -> str:
+    """Reduces `raw_output` to at most about `budget_chars`; output already within budget is returned as is."""
+    if len(raw_output) <= budget_chars:
+        return raw_output
+    reducer = OutputReducer(budget_chars)
+    reducer.feed(raw_output)
+    return reducer.result()
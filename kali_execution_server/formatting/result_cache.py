@@ -0,0 +1,124 @@
+# kali_execution_server/formatting/result_cache.py
+import re
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional
+
+from formatting.parsers import CommandInvocation
+
+# Read-only reconnaissance tools whose results stay valid for a while (seconds). Tools not listed here
+# use the default TTL, which is 0 (never cached), so anything with side effects is re-run.
+DEFAULT_TOOL_TTLS: Dict[str, float] = {
+    "whois": 86400,
+    "dig": 3600,
+    "host": 3600,
+    "nslookup": 3600,
+    "nmap": 3600,
+    "whatweb": 3600,
+    "sslscan": 3600,
+    "curl": 300,
+    "ping": 60,
+    "traceroute": 600,
+}
+
+
+# Flags that make a command write files: -o/-oN/-oX/-oA (also bundled, e.g. curl -so), --output, --log-*.
+# A cache hit would skip the write, and a later command reading the file in the new container would fail.
+_OUTPUT_FLAG = re.compile(r'^(-[A-Za-z]*[oO][^=]*$|--(output|log|remote-name))')
+_CURL_OUTPUT_FLAG = re.compile(r'^(-[A-Za-z]*[cD][A-Za-z]*$|--(cookie-jar|dump-header|create-dirs))')
+
+
+def writes_files(invocation: CommandInvocation) -> bool:
+    """True if the command redirects its output or saves files, so its effect can't be served from a cache."""
+    if invocation.has_redirect:
+        return True
+    args = invocation.args
+    for index, arg in enumerate(args):
+        if _OUTPUT_FLAG.match(arg) or (invocation.program == "curl" and _CURL_OUTPUT_FLAG.match(arg)):
+            # `-oX -` and `-o -` write to stdout, which is what the cache holds.
+            if index + 1 < len(args) and args[index + 1] == "-" and re.fullmatch(r'-o[A-Z]?', arg):
+                continue
+            return True
+    return False
+
+
+def parse_tool_ttls(spec: str) -> Dict[str, float]:
+    """Parses "whois=86400,nmap=1800" overrides; a TTL of 0 disables caching for that tool."""
+    ttls = {}
+    for item in spec.split(","):
+        tool, _, ttl = item.partition("=")
+        if tool.strip() and ttl.strip():
+            ttls[tool.strip()] = float(ttl)
+    return ttls
+
+
+class ResultCache:
+    """
+    Cross-session cache of command results, keyed on the normalised invocation (program and arguments,
+    wrappers like `sudo` stripped), with a TTL per tool. A hit skips the container round trip entirely.
+    """
+
+    def __init__(self, tool_ttls: Optional[Dict[str, float]] = None, default_ttl: float = 0.0,
+                 max_entries: int = 2048):
+        self.tool_ttls = {**DEFAULT_TOOL_TTLS, **(tool_ttls or {})}
+        self.default_ttl = default_ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters = {"hits": 0, "misses": 0, "stores": 0, "bypassed": 0, "uncacheable": 0, "evictions": 0}
+
+    def _key_and_ttl(self, command: str):
+        invocation = CommandInvocation(command)
+        if invocation.is_compound or not invocation.program or writes_files(invocation):
+            return None, 0.0
+        ttl = self.tool_ttls.get(invocation.program, self.default_ttl)
+        normalized = "\0".join([invocation.program, *invocation.args])
+        return hashlib.sha256(normalized.encode("utf-8")).hexdigest(), ttl
+
+    def get(self, command: str, bypass: bool = False) -> Optional[dict]:
+        """Returns a copy of the stored observation marked `cached`, or None on a miss."""
+        if bypass:
+            with self._lock:
+                self._counters["bypassed"] += 1
+            return None
+        key, ttl = self._key_and_ttl(command)
+        if key is None or ttl <= 0:
+            with self._lock:
+                self._counters["uncacheable"] += 1
+            return None
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                stored_at, expires_at, observation = entry
+                if now < expires_at:
+                    self._entries.move_to_end(key)
+                    self._counters["hits"] += 1
+                    return {**observation, "cached": True, "cache_age_seconds": round(now - stored_at, 1)}
+                del self._entries[key]
+            self._counters["misses"] += 1
+            return None
+
+    def put(self, command: str, observation: dict):
+        """Stores a successful observation; failures are never cached so they are retried next time."""
+        if observation.get("status") != "SUCCESS":
+            return
+        key, ttl = self._key_and_ttl(command)
+        if key is None or ttl <= 0:
+            return
+        now = time.time()
+        with self._lock:
+            self._entries[key] = (now, now + ttl, dict(observation))
+            self._entries.move_to_end(key)
+            self._counters["stores"] += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._counters["evictions"] += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self._counters["hits"] + self._counters["misses"]
+            return {**self._counters, "hit_rate": self._counters["hits"] / lookups if lookups else 0.0,
+                    "entries": len(self._entries), "tool_ttls": dict(self.tool_ttls)}
@@ -0,0 +1,178 @@
+# kali_execution_server/kali_driver/backend.py
+import time
+import uuid
+import shlex
+import threading
+from abc import ABC, abstractmethod
+from typing import Dict, Iterator, Optional, Tuple
+
+# Wipes anything a previous session left behind so a pooled container can be reused.
+# Only PID 1, sshd and the reset itself (its shell and that shell's pipeline) are spared, so leftover
+# shells, background loops and command wrappers all go; dotfiles in /root (incl. .ssh) survive.
+RESET_COMMAND = (
+    "ps -eo pid=,ppid=,comm= | awk -v self=$$ "
+    "'$1 != 1 && $1 != self && $2 != self && $3 != \"sshd\" {print $1}' "
+    "| xargs -r kill -9 2>/dev/null; "
+    "rm -rf /tmp/* /var/tmp/* /root/* 2>/dev/null; true"
+)
+
+# Longest a single command may run before the backend gives up on it; callers may ask for less.
+COMMAND_TIMEOUT_SECONDS = 1800
+
+
+def _pidfile(command_id: str) -> str:
+    return f"/tmp/.dawnyawn-{command_id}.pid"
+
+
+def killable(command: str, command_id: str) -> str:
+    """
+    Wraps a remote command so it runs in its own process group, whose ID is written to a pidfile.
+    kill_script() can then stop the command and every child it spawned from another connection.
+    The command itself runs under bash: /bin/sh is dash on Kali, which has no brace expansion, [[ ]] or <(...).
+    """
+    pidfile = _pidfile(command_id)
+    script = f"echo $$ > {pidfile}; {command}"
+    return f"setsid -w bash -c {shlex.quote(script)}; status=$?; rm -f {pidfile}; exit $status"
+
+
+def kill_script(command_id: str) -> str:
+    """Kills the process group of a command started through killable(), waiting briefly for its pidfile."""
+    pidfile = _pidfile(command_id)
+    return (f"for i in 1 2 3 4 5 6 7 8 9 10; do [ -s {pidfile} ] && break; sleep 0.1; done; "
+            f"kill -9 -$(cat {pidfile}) 2>/dev/null; rm -f {pidfile}; true")
+
+
+class RunningCommand:
+    """A command in flight: why it was stopped (if it was) and whatever its backend needs to kill it."""
+
+    def __init__(self, command: str, timeout: float):
+        self.id = uuid.uuid4().hex[:12]
+        self.command = command
+        self.timeout = timeout
+        self.stop_reason: Optional[str] = None
+        self.exited = False
+        # Backend-specific handle (a Popen, an SSH channel, ...).
+        self.process = None
+        self.timer: Optional[threading.Timer] = None
+
+
+class ExecutionBackend(ABC):
+    """
+    Where a session's commands run. The pool, the server and the sessions only use this interface,
+    so a deployment can pick whichever backend starts fastest for it (see KaliManager).
+    """
+
+    name = "base"
+    # The DockerHost the backend runs on; None for backends that don't use Docker.
+    host = None
+
+    def __init__(self):
+        self.last_used = time.monotonic()
+        self._running: Dict[str, RunningCommand] = {}
+        self._running_lock = threading.Lock()
+
+    def warm_up(self):
+        """Does any per-session connection work ahead of time so the first command does not pay for it."""
+        self.last_used = time.monotonic()
+
+    @abstractmethod
+    def is_healthy(self) -> bool:
+        pass
+
+    @abstractmethod
+    def reset(self):
+        """Cleans up after a session so the backend can go back into the warm pool."""
+        pass
+
+    @abstractmethod
+    def _stream(self, handle: RunningCommand, chunk_size: int) -> Iterator[Tuple[str, object]]:
+        """Runs `handle.command`, yielding output chunks and then ("exit", exit_code)."""
+        pass
+
+    @abstractmethod
+    def _kill_command(self, handle: RunningCommand):
+        """Kills a running command and its children; its stream then ends with the output so far."""
+        pass
+
+    @abstractmethod
+    def destroy(self):
+        pass
+
+    def stream_command(self, command: str, chunk_size: int = 4096,
+                       timeout: Optional[float] = None) -> Iterator[Tuple[str, object]]:
+        """
+        Runs a command and yields ("stdout" | "stderr", text) chunks as soon as they arrive,
+        followed by a single ("exit", exit_code) item once the command has finished. A command that hit
+        its deadline or was cancelled yields ("stopped", "timeout" | "cancelled") just before its exit.
+        """
+        timeout = min(timeout or COMMAND_TIMEOUT_SECONDS, COMMAND_TIMEOUT_SECONDS)
+        handle = RunningCommand(command, timeout)
+        handle.timer = threading.Timer(timeout, self._stop, (handle, "timeout"))
+        handle.timer.daemon = True
+        with self._running_lock:
+            self._running[handle.id] = handle
+        handle.timer.start()
+        try:
+            for stream, data in self._stream(handle, chunk_size):
+                if stream == "exit":
+                    handle.exited = True
+                    if handle.stop_reason:
+                        yield "stopped", handle.stop_reason
+                yield stream, data
+            if not handle.exited and handle.stop_reason:
+                # The connection went down with the command; what was read so far is all there is.
+                handle.exited = True
+                yield "stopped", handle.stop_reason
+                yield "exit", None
+        finally:
+            handle.timer.cancel()
+            if not handle.exited:
+                # A consumer that stops early abandons the command; don't leave it running.
+                self._stop(handle, "cancelled")
+            with self._running_lock:
+                self._running.pop(handle.id, None)
+            self.last_used = time.monotonic()
+
+    def _stop(self, handle: RunningCommand, reason: str):
+        with self._running_lock:
+            if handle.stop_reason is not None or handle.exited:
+                return
+            handle.stop_reason = reason
+        print(f"  [!] Stopping command ({reason}): '{handle.command}'")
+        try:
+            self._kill_command(handle)
+        except Exception as e:
+            print(f"  [!] Could not kill command '{handle.command}': {e}")
+
+    def cancel(self) -> int:
+        """Kills every command running in this backend; each returns the output it had produced."""
+        with self._running_lock:
+            handles = list(self._running.values())
+        for handle in handles:
+            self._stop(handle, "cancelled")
+        return len(handles)
+
+    def run_command(self, command: str, timeout: Optional[float] = None) -> Tuple[str, Optional[int], Optional[str]]:
+        """
+        Runs a command to completion and returns its combined output, exit code, and why it was
+        stopped early ("timeout" or "cancelled"; None if it finished on its own).
+        """
+        stdout_parts, stderr_parts = [], []
+        exit_code = stopped = None
+        for stream, data in self.stream_command(command, timeout=timeout):
+            if stream == "exit":
+                exit_code = data
+            elif stream == "stopped":
+                stopped = data
+            else:
+                (stdout_parts if stream == "stdout" else stderr_parts).append(data)
+        output = "".join(stdout_parts).strip()
+        error_output = "".join(stderr_parts).strip()
+        if error_output:
+            output += "\n--- STDERR ---\n" + error_output
+        if not output:
+            print("\n--- ⚠️ EXECUTION WARNING: EMPTY RESULT ---")
+        return output, exit_code, stopped
+
+    def send_command_and_get_output(self, command: str) -> str:
+        return self.run_command(command)[0]
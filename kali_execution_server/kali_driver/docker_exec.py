@@ -0,0 +1,88 @@
+# kali_execution_server/kali_driver/docker_exec.py
+import time
+import codecs
+from typing import Iterator, Tuple
+import docker
+
+from kali_driver.backend import ExecutionBackend, RunningCommand, RESET_COMMAND, killable, kill_script
+
+
+class DockerExecContainer(ExecutionBackend):
+    """
+    Runs commands through the Docker exec API. The container needs no sshd, keys or port mapping,
+    and is ready as soon as Docker reports it running.
+    """
+
+    name = "docker_exec"
+
+    def __init__(self, owner, host):
+        super().__init__()
+        self._owner = owner
+        self.host = host
+        self._api = host.client.api
+
+        print(f"  [+] Creating Kali container (docker exec) on '{host.name}' from 'dawnyawn-kali-agent' image...")
+        self._container = host.client.containers.create(
+            image="dawnyawn-kali-agent",
+            # Keeps the container alive without sshd; commands arrive as execs.
+            command=["sleep", "infinity"],
+            detach=True
+        )
+        try:
+            # start() returns once the container's process is running, so there is nothing to wait for.
+            self._container.start()
+            self._container.reload()
+            if self._container.status != "running":
+                raise Exception(f"Container {self._container.short_id} failed to start ({self._container.status}).")
+        except Exception:
+            # Never leave a container that didn't come up behind on the Docker host.
+            try:
+                self._container.remove(force=True)
+            except Exception as e:
+                print(f"  [!] Failed to remove container '{self._container.short_id}' after a failed start: {e}")
+            raise
+        self.short_id = self._container.short_id
+        print(f"  [+] Container '{self.short_id}' created and running.")
+
+    def is_healthy(self) -> bool:
+        try:
+            self._container.reload()
+        except docker.errors.NotFound:
+            return False
+        return self._container.status == "running"
+
+    def reset(self):
+        exec_id = self._api.exec_create(self._container.id, ["/bin/sh", "-c", RESET_COMMAND])["Id"]
+        self._api.exec_start(exec_id)
+        self.last_used = time.monotonic()
+
+    def _stream(self, handle: RunningCommand, chunk_size: int) -> Iterator[Tuple[str, object]]:
+        print(f"  [+] Streaming command (docker exec): '{handle.command}'")
+        exec_id = self._api.exec_create(self._container.id,
+                                        ["/bin/sh", "-c", killable(handle.command, handle.id)])["Id"]
+        decoders = {"stdout": codecs.getincrementaldecoder('utf-8')(errors='ignore'),
+                    "stderr": codecs.getincrementaldecoder('utf-8')(errors='ignore')}
+        frames = self._api.exec_start(exec_id, stream=True, demux=True)
+        try:
+            for stdout, stderr in frames:
+                for stream, data in (("stdout", stdout), ("stderr", stderr)):
+                    text = decoders[stream].decode(data) if data else ""
+                    if text:
+                        yield stream, text
+            yield "exit", self._api.exec_inspect(exec_id).get("ExitCode")
+        finally:
+            frames.close()
+
+    def _kill_command(self, handle: RunningCommand):
+        # A second exec kills the command's process group; its stream then ends on its own.
+        exec_id = self._api.exec_create(self._container.id, ["/bin/sh", "-c", kill_script(handle.id)])["Id"]
+        self._api.exec_start(exec_id)
+
+    def destroy(self):
+        try:
+            self._container.reload()
+            print(f"\n  [+] Cleaning up container '{self._container.short_id}'...")
+            self._container.remove(force=True)
+            print("  [+] Cleanup complete.")
+        except docker.errors.NotFound:
+            pass
@@ -1,44 +1,114 @@
 # kali_execution_server/kali_driver/driver.py
 import os
 import time
+import codecs
+import select
+import socket
+import threading
+from typing import Dict, Iterator, List, Optional, Tuple, Type
+from urllib.parse import urlsplit
 import docker
 import paramiko
 
+from kali_driver.backend import ExecutionBackend, RunningCommand, RESET_COMMAND, COMMAND_TIMEOUT_SECONDS, \
+    killable, kill_script
+from kali_driver.docker_exec import DockerExecContainer
+from kali_driver.local import LocalProcess
+from kali_driver.hosts import DockerHost, HostScheduler, NoHostAvailable
 
-# This file is now self-contained and does not import from itself or other project files.
+SSH_READY_TIMEOUT = 30.0
 
-class KaliContainer:
-    def __init__(self, owner):
+
+def wait_for_ssh_banner(port: int, timeout: float = SSH_READY_TIMEOUT, address: str = "localhost"):
+    """
+    Blocks until sshd on `address`:`port` sends its banner. Docker's port proxy accepts connections
+    before sshd listens, so an open port alone doesn't mean ready; the banner does.
+    """
+    deadline = time.monotonic() + timeout
+    backoff = 0.02
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise TimeoutError(f"sshd on port {port} did not become ready within {timeout}s.")
+        try:
+            with socket.create_connection((address, port), timeout=remaining) as sock:
+                banner = b""
+                # recv() may return the banner a few bytes at a time.
+                while len(banner) < 4 and time.monotonic() < deadline:
+                    sock.settimeout(max(deadline - time.monotonic(), 0.001))
+                    data = sock.recv(4 - len(banner))
+                    if not data:
+                        break
+                    banner += data
+                if banner == b"SSH-":
+                    return
+        except OSError:
+            pass
+        # Refused or closed by the proxy: sshd isn't listening yet.
+        time.sleep(min(backoff, max(deadline - time.monotonic(), 0)))
+        backoff = min(backoff * 2, 0.5)
+
+
+class KaliContainer(ExecutionBackend):
+    """Runs commands over SSH into a container running sshd (the original backend)."""
+
+    name = "ssh"
+
+    def __init__(self, owner, host: DockerHost):
+        super().__init__()
         self._owner = owner
+        self.host = host
         self._ssh_client = None
+        # Several channels may run at once (batches); only one thread may (re)connect.
+        self._connect_lock = threading.Lock()
+        self._port = None
 
-        print("  [+] Creating Kali container from 'dawnyawn-kali-agent' image...")
-        self._container = owner._docker_client.containers.create(
+        print(f"  [+] Creating Kali container on '{host.name}' from 'dawnyawn-kali-agent' image...")
+        self._container = host.client.containers.create(
             image="dawnyawn-kali-agent",
             command="/usr/sbin/sshd -D",
             ports={"22/tcp": None},
             detach=True
         )
-        self._ensure_started()
+        try:
+            self._ensure_started()
+        except Exception:
+            # Never leave a container that didn't come up behind on the Docker host.
+            try:
+                self._container.remove(force=True)
+            except Exception as e:
+                print(f"  [!] Failed to remove container '{self._container.short_id}' after a failed start: {e}")
+            raise
+        self.short_id = self._container.short_id
         print(f"  [+] Container '{self._container.short_id}' created and running.")
 
     def _ensure_started(self):
         self._container.reload()
         if self._container.status != "running":
             self._container.start()
-            time.sleep(2)
-        self._container.reload()
-
-    def _ensure_connected(self):
-        if self._ssh_client and self._ssh_client.get_transport().is_active():
-            return
+            self._container.reload()
+        self._port = self._mapped_port()
+        # Ready when sshd answers, rather than after a fixed sleep.
+        wait_for_ssh_banner(self._port, address=self.host.address)
 
-        self._container.reload()
+    def _mapped_port(self) -> int:
         port_data = self._container.ports.get('22/tcp')
         if not port_data or 'HostPort' not in port_data[0]:
             raise Exception(f"Failed to find mapped SSH port for container {self._container.id}")
+        return int(port_data[0]['HostPort'])
+
+    def _ensure_connected(self):
+        with self._connect_lock:
+            self._connect()
+
+    def _connect(self):
+        if self._ssh_client and self._ssh_client.get_transport().is_active():
+            return
+        if self._ssh_client is not None:
+            # Reconnecting: the container may have been restarted onto a new port.
+            self._container.reload()
+            self._port = self._mapped_port()
 
-        public_port = int(port_data[0]['HostPort'])
         key_path = os.path.expanduser('~/.ssh/id_ecdsa')
         if not os.path.exists(key_path):
             raise FileNotFoundError(f"SSH private key not found at {key_path}.")
@@ -46,21 +116,82 @@ class KaliContainer:
         self._ssh_client = paramiko.SSHClient()
         self._ssh_client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
         self._ssh_client.connect(
-            hostname='localhost', port=public_port, username='root',
+            hostname=self.host.address, port=self._port, username='root',
             key_filename=key_path, timeout=30
         )
 
-    def send_command_and_get_output(self, command: str) -> str:
+    def warm_up(self):
+        """Opens the SSH connection ahead of time so the first command does not pay for it."""
+        self._ensure_connected()
+        super().warm_up()
+
+    def is_healthy(self) -> bool:
+        try:
+            self._container.reload()
+        except docker.errors.NotFound:
+            return False
+        if self._container.status != "running":
+            return False
+        transport = self._ssh_client.get_transport() if self._ssh_client else None
+        return transport is not None and transport.is_active()
+
+    def reset(self):
+        """Cleans the container between sessions so it can go back into the warm pool."""
+        self._ensure_connected()
+        _, stdout, _ = self._ssh_client.exec_command(RESET_COMMAND, timeout=30)
+        stdout.channel.recv_exit_status()
+        self.last_used = time.monotonic()
+
+    def _stream(self, handle: RunningCommand, chunk_size: int) -> Iterator[Tuple[str, object]]:
         self._ensure_connected()
-        print(f"  [+] Sending command: '{command}'")
-        stdin, stdout, stderr = self._ssh_client.exec_command(command, timeout=1800)
-        output = stdout.read().decode('utf-8', errors='ignore').strip()
-        error_output = stderr.read().decode('utf-8', errors='ignore').strip()
-        if error_output:
-            output += "\n--- STDERR ---\n" + error_output
-        if not output:
-            print("\n--- ⚠️ EXECUTION WARNING: EMPTY RESULT ---")
-        return output
+        print(f"  [+] Streaming command: '{handle.command}'")
+        channel = self._ssh_client.get_transport().open_session(timeout=30)
+        channel.settimeout(COMMAND_TIMEOUT_SECONDS)
+        handle.process = channel
+        # Closing the channel would not stop the remote process, so it runs in a group we can kill.
+        channel.exec_command(killable(handle.command, handle.id))
+        decoders = {"stdout": codecs.getincrementaldecoder('utf-8')(errors='ignore'),
+                    "stderr": codecs.getincrementaldecoder('utf-8')(errors='ignore')}
+        try:
+            while True:
+                received = False
+                if channel.recv_ready():
+                    text = decoders["stdout"].decode(channel.recv(chunk_size))
+                    received = True
+                    if text:
+                        yield "stdout", text
+                if channel.recv_stderr_ready():
+                    text = decoders["stderr"].decode(channel.recv_stderr(chunk_size))
+                    received = True
+                    if text:
+                        yield "stderr", text
+                if received:
+                    continue
+                if channel.exit_status_ready() and not channel.recv_ready() and not channel.recv_stderr_ready():
+                    yield "exit", channel.recv_exit_status()
+                    break
+                if channel.closed:
+                    break
+                select.select([channel], [], [], 0.5)
+        finally:
+            channel.close()
+
+    def _kill_command(self, handle: RunningCommand):
+        try:
+            self._ensure_connected()
+            _, stdout, _ = self._ssh_client.exec_command(kill_script(handle.id), timeout=30)
+            stdout.channel.recv_exit_status()
+        except Exception as e:
+            print(f"  [!] Remote kill failed, closing the channel instead: {e}")
+        channel = handle.process
+        if channel is None:
+            return
+        # Give the killed command a moment to report its exit; close its channel if it doesn't.
+        deadline = time.monotonic() + 5
+        while not channel.exit_status_ready() and time.monotonic() < deadline:
+            time.sleep(0.1)
+        if not channel.exit_status_ready():
+            channel.close()
 
     def destroy(self):
         if self._ssh_client:
@@ -76,14 +207,86 @@ class KaliContainer:
             pass
 
 
+BACKENDS: Dict[str, Type[ExecutionBackend]] = {
+    KaliContainer.name: KaliContainer,
+    DockerExecContainer.name: DockerExecContainer,
+    LocalProcess.name: LocalProcess,
+}
+
+
+def docker_hosts_from_spec(spec: str, max_containers: int = 0) -> List[DockerHost]:
+    """
+    Parses KALI_DOCKER_HOSTS: comma-separated Docker endpoints, each optionally named, e.g.
+    "local=unix:///var/run/docker.sock, edge1=ssh://root@10.0.0.7". Mapped container ports are reached
+    at the endpoint's hostname (localhost for sockets). An empty spec means the daemon from the environment.
+    """
+    hosts = []
+    for entry in filter(None, (part.strip() for part in spec.split(","))):
+        name, _, url = entry.partition("=") if "=" in entry.split("://")[0] else ("", "", entry)
+        address = urlsplit(url).hostname if url.startswith(("tcp://", "ssh://", "http://", "https://")) else None
+        # Exec streams are read through this client, so its timeout has to cover a whole command.
+        client = docker.DockerClient(base_url=url, timeout=COMMAND_TIMEOUT_SECONDS)
+        hosts.append(DockerHost(name or address or f"host{len(hosts) + 1}", client, address or "localhost",
+                                max_containers))
+    if not hosts:
+        hosts.append(DockerHost("local", docker.from_env(timeout=COMMAND_TIMEOUT_SECONDS), "localhost", max_containers))
+    return hosts
+
+
 class KaliManager:
-    def __init__(self):
+    """
+    Creates execution backends. Docker-based ones are spread across one or more Docker hosts: each new
+    container goes to the healthy host with the most headroom, and hosts that stop answering are drained.
+    """
+
+    def __init__(self, backend: str = "ssh", hosts: Optional[List[DockerHost]] = None, check_interval: float = 15.0):
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown execution backend '{backend}'. Choose from: {', '.join(BACKENDS)}.")
+        self.backend = backend
+        self.scheduler = None
+        if backend == LocalProcess.name:
+            print("  [!] Local backend: commands run directly on this host. Development and tests only.")
+            return
         try:
-            self._docker_client = docker.from_env()
-            self._docker_client.ping()
+            self.scheduler = HostScheduler(hosts if hosts is not None else docker_hosts_from_spec(""),
+                                           check_interval=check_interval)
         except Exception as e:
             print("FATAL ERROR: Could not connect to Docker. Is it running?")
             raise e
+        self.scheduler.check(force=True)
+        healthy = [name for name, host in self.scheduler.hosts.items() if host.failures == 0]
+        if not healthy:
+            print("FATAL ERROR: Could not connect to Docker. Is it running?")
+            raise NoHostAvailable(f"None of the Docker hosts answered: {', '.join(self.scheduler.hosts)}")
+        print(f"  [+] Docker hosts: {', '.join(f'{name} ({host.capacity} containers)' for name, host in self.scheduler.hosts.items())}")
+
+    def create_container(self) -> ExecutionBackend:
+        if self.scheduler is None:
+            return BACKENDS[self.backend](owner=self)
+        host = self.scheduler.pick()
+        try:
+            return BACKENDS[self.backend](owner=self, host=host)
+        except Exception:
+            self.scheduler.release(host)
+            raise
+
+    def destroy_container(self, container: ExecutionBackend):
+        """Destroys a backend and frees its place on its Docker host."""
+        try:
+            container.destroy()
+        finally:
+            if container.host is not None and self.scheduler is not None:
+                self.scheduler.release(container.host)
+
+    def check_hosts(self):
+        """Refreshes host load and health; called periodically by the pool."""
+        if self.scheduler is not None:
+            self.scheduler.check()
+
+    def drain_host(self, name: str, drained: bool = True):
+        if self.scheduler is None:
+            raise KeyError(name)
+        return self.scheduler.drain(name, drained)
 
-    def create_container(self) -> "KaliContainer":  # Use string hint for self-reference
-        return KaliContainer(owner=self)
\ No newline at end of file
+    def host_stats(self) -> dict:
+        return self.scheduler.stats() if self.scheduler is not None else {}
@@ -0,0 +1,127 @@
+# kali_execution_server/kali_driver/hosts.py
+import time
+import threading
+from typing import Dict, List, Optional
+
+# Rough footprint of one Kali container, used to turn a host's CPUs and memory into a container capacity.
+CONTAINERS_PER_CPU = 4
+CONTAINER_MEMORY_BYTES = 512 * 1024 * 1024
+# Consecutive failed health checks before a host stops receiving new sessions.
+MAX_HEALTH_FAILURES = 3
+
+
+class NoHostAvailable(Exception):
+    """Every Docker host is full, unhealthy or drained."""
+
+
+class DockerHost:
+    """
+    One Docker daemon sessions can be placed on. `client` only needs ping(), info() and whatever the
+    execution backend uses (containers, api), so tests and benchmarks can pass a fake one.
+    """
+
+    def __init__(self, name: str, client, address: str = "localhost", max_containers: int = 0):
+        self.name = name
+        self.client = client
+        # Where container ports mapped by this daemon are reachable from the server.
+        self.address = address
+        # 0 derives the capacity from the host's CPUs and memory.
+        self.max_containers = max_containers
+        self.capacity = max_containers or 1
+        # Containers this server has on the host, and the daemon's own count of running ones (anyone's).
+        self.placed = 0
+        self.running = 0
+        # Placed since the last refresh, so not yet in `running`.
+        self._unseen = 0
+        self.healthy = True
+        # Set by an operator; health checks never undo it.
+        self.drained = False
+        self.failures = 0
+        self.last_error: Optional[str] = None
+
+    @property
+    def schedulable(self) -> bool:
+        return self.healthy and not self.drained
+
+    def load(self) -> float:
+        return (self.running + self._unseen) / self.capacity
+
+    def refresh(self):
+        """Re-reads the daemon's running containers and resources; repeated failures mark the host unhealthy."""
+        try:
+            info = self.client.info()
+        except Exception as e:
+            self.failures += 1
+            self.last_error = f"{type(e).__name__}: {e}"
+            if self.healthy and self.failures >= MAX_HEALTH_FAILURES:
+                self.healthy = False
+                print(f"  [!] Docker host '{self.name}' failed {self.failures} health checks; draining it. ({e})")
+            return
+        if not self.healthy:
+            print(f"  [+] Docker host '{self.name}' is healthy again.")
+        self.healthy = True
+        self.failures = 0
+        self.last_error = None
+        self.running = int(info.get("ContainersRunning", 0))
+        self._unseen = 0
+        by_cpu = int(info.get("NCPU", 1)) * CONTAINERS_PER_CPU
+        by_memory = int(info.get("MemTotal", 0)) // CONTAINER_MEMORY_BYTES
+        self.capacity = self.max_containers or max(1, min(by_cpu, by_memory) if by_memory else by_cpu)
+
+    def stats(self) -> dict:
+        return {"address": self.address, "healthy": self.healthy, "drained": self.drained,
+                "placed": self.placed, "running": self.running, "capacity": self.capacity,
+                "load": round(self.load(), 3), "last_error": self.last_error}
+
+
+class HostScheduler:
+    """Places containers on the least-loaded schedulable host and keeps host health current."""
+
+    def __init__(self, hosts: List[DockerHost], check_interval: float = 15.0):
+        if not hosts:
+            raise ValueError("At least one Docker host is required.")
+        self.hosts: Dict[str, DockerHost] = {host.name: host for host in hosts}
+        self.check_interval = check_interval
+        self._last_check = 0.0
+        self._lock = threading.Lock()
+
+    def check(self, force: bool = False):
+        """Refreshes every host, at most once per check interval unless forced."""
+        now = time.monotonic()
+        if not force and now - self._last_check < self.check_interval:
+            return
+        self._last_check = now
+        for host in list(self.hosts.values()):
+            # Health checks talk to the daemons, so they run outside the placement lock.
+            host.refresh()
+
+    def pick(self) -> DockerHost:
+        """Reserves room on the host with the most headroom; release() gives it back."""
+        with self._lock:
+            candidates = [host for host in self.hosts.values() if host.schedulable and host.load() < 1.0]
+            if not candidates:
+                raise NoHostAvailable("No Docker host has room for another container.")
+            host = min(candidates, key=lambda candidate: (candidate.load(), candidate.placed))
+            host.placed += 1
+            host._unseen += 1
+            return host
+
+    def release(self, host: DockerHost):
+        with self._lock:
+            host.placed = max(0, host.placed - 1)
+            # Until the next refresh, take the container off whichever count it was in.
+            if host._unseen:
+                host._unseen -= 1
+            else:
+                host.running = max(0, host.running - 1)
+
+    def drain(self, name: str, drained: bool = True) -> DockerHost:
+        if name not in self.hosts:
+            raise KeyError(name)
+        host = self.hosts[name]
+        host.drained = drained
+        print(f"  [{'!' if drained else '+'}] Docker host '{name}' {'drained' if drained else 'back in rotation'}.")
+        return host
+
+    def stats(self) -> dict:
+        return {name: host.stats() for name, host in self.hosts.items()}
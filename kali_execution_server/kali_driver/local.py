@@ -0,0 +1,106 @@
+# kali_execution_server/kali_driver/local.py
+import os
+import time
+import shutil
+import signal
+import codecs
+import tempfile
+import threading
+import selectors
+import subprocess
+from typing import Iterator, Set, Tuple
+
+from kali_driver.backend import ExecutionBackend, RunningCommand
+
+
+class LocalProcess(ExecutionBackend):
+    """
+    Runs commands as subprocesses on this host, each session in its own scratch directory.
+    There is no isolation at all: for development and tests only, never for real targets.
+    """
+
+    name = "local"
+
+    def __init__(self, owner, host=None):
+        super().__init__()
+        self._owner = owner
+        self.workdir = tempfile.mkdtemp(prefix="dawnyawn-local-")
+        self.short_id = os.path.basename(self.workdir)
+        self._processes: Set[subprocess.Popen] = set()
+        self._lock = threading.Lock()
+        self._alive = True
+        print(f"  [+] Local backend ready in '{self.workdir}'.")
+
+    def is_healthy(self) -> bool:
+        return self._alive and os.path.isdir(self.workdir)
+
+    def _kill_all(self):
+        with self._lock:
+            processes = list(self._processes)
+        for process in processes:
+            self._kill(process)
+
+    @staticmethod
+    def _kill(process: subprocess.Popen):
+        if process.poll() is not None:
+            return
+        try:
+            # Each command runs in its own process group, so children die with it.
+            os.killpg(process.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+        process.wait()
+
+    def reset(self):
+        self._kill_all()
+        for entry in os.listdir(self.workdir):
+            path = os.path.join(self.workdir, entry)
+            if os.path.isdir(path) and not os.path.islink(path):
+                shutil.rmtree(path, ignore_errors=True)
+            else:
+                os.remove(path)
+        self.last_used = time.monotonic()
+
+    def _stream(self, handle: RunningCommand, chunk_size: int) -> Iterator[Tuple[str, object]]:
+        print(f"  [+] Streaming command (local): '{handle.command}'")
+        process = subprocess.Popen(handle.command, shell=True, cwd=self.workdir, stdin=subprocess.DEVNULL,
+                                   stdout=subprocess.PIPE, stderr=subprocess.PIPE, start_new_session=True)
+        handle.process = process
+        with self._lock:
+            self._processes.add(process)
+        if handle.stop_reason:
+            # Stopped before the process existed to be killed.
+            self._kill(process)
+        decoders = {"stdout": codecs.getincrementaldecoder('utf-8')(errors='ignore'),
+                    "stderr": codecs.getincrementaldecoder('utf-8')(errors='ignore')}
+        selector = selectors.DefaultSelector()
+        selector.register(process.stdout, selectors.EVENT_READ, "stdout")
+        selector.register(process.stderr, selectors.EVENT_READ, "stderr")
+        try:
+            # Deadlines and cancellation kill the process group, which closes both pipes and ends this loop.
+            while selector.get_map():
+                for key, _ in selector.select():
+                    data = os.read(key.fileobj.fileno(), chunk_size)
+                    if not data:
+                        selector.unregister(key.fileobj)
+                        continue
+                    text = decoders[key.data].decode(data)
+                    if text:
+                        yield key.data, text
+            yield "exit", process.wait()
+        finally:
+            selector.close()
+            self._kill(process)
+            process.stdout.close()
+            process.stderr.close()
+            with self._lock:
+                self._processes.discard(process)
+
+    def _kill_command(self, handle: RunningCommand):
+        if handle.process is not None:
+            self._kill(handle.process)
+
+    def destroy(self):
+        self._alive = False
+        self._kill_all()
+        shutil.rmtree(self.workdir, ignore_errors=True)
@@ -0,0 +1,166 @@
+# kali_execution_server/kali_driver/pool.py
+import time
+import threading
+from collections import deque
+from typing import Deque
+
+from kali_driver.backend import ExecutionBackend
+from kali_driver.driver import KaliManager
+
+
+class ContainerPool:
+    """Keeps pre-started, connected execution backends ready so a new session never waits for a boot."""
+
+    def __init__(self, manager: KaliManager, min_warm: int = 2, max_warm: int = 5,
+                 idle_ttl: float = 600.0, refill_interval: float = 5.0):
+        if min_warm < 0 or max_warm < min_warm:
+            raise ValueError("Pool sizes must satisfy 0 <= min_warm <= max_warm.")
+        self._manager = manager
+        self.min_warm = min_warm
+        self.max_warm = max_warm
+        self.idle_ttl = idle_ttl
+        self.refill_interval = refill_interval
+
+        self._idle: Deque[ExecutionBackend] = deque()
+        self._booting = 0
+        # Recent boot-to-ready times, to compare how fast each backend starts.
+        self._boot_seconds: Deque[float] = deque(maxlen=50)
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._maintain, name="kali-pool", daemon=True)
+
+    # --- Lifecycle ---
+    def start(self):
+        print(f"  [+] Starting warm pool (min={self.min_warm}, max={self.max_warm}, ttl={self.idle_ttl}s)...")
+        self._thread.start()
+
+    def shutdown(self):
+        self._stop.set()
+        self._wake.set()
+        if self._thread.is_alive():
+            self._thread.join(timeout=30)
+        with self._lock:
+            leftovers = list(self._idle)
+            self._idle.clear()
+        for container in leftovers:
+            self._manager.destroy_container(container)
+
+    def wake(self):
+        """Runs a maintenance pass now instead of at the next interval."""
+        self._wake.set()
+
+    @staticmethod
+    def _usable(container: ExecutionBackend) -> bool:
+        return container.host is None or container.host.schedulable
+
+    # --- Session-facing API ---
+    def acquire(self) -> ExecutionBackend:
+        """
+        Hands out a warm container from the least-loaded healthy host, or boots one if there is none.
+        A pooled container that died while idle is destroyed and the next one tried.
+        """
+        while True:
+            with self._lock:
+                usable = [container for container in self._idle if self._usable(container)]
+                container = min(usable, key=lambda c: c.host.load() if c.host else 0.0) if usable else None
+                if container is not None:
+                    self._idle.remove(container)
+            self._wake.set()
+            if container is None:
+                break
+            try:
+                healthy = container.is_healthy()
+            except Exception as e:
+                print(f"  [!] Health check of a pooled container failed: {e}")
+                healthy = False
+            if healthy:
+                return container
+            print("  [!] Pooled container is no longer healthy, discarding it.")
+            try:
+                self._manager.destroy_container(container)
+            except Exception as e:
+                print(f"  [!] Failed to destroy an unhealthy container: {e}")
+        print("  [!] Warm pool empty, booting a container on demand.")
+        return self._boot()
+
+    def _boot(self) -> ExecutionBackend:
+        started = time.monotonic()
+        container = self._manager.create_container()
+        try:
+            container.warm_up()
+        except Exception:
+            self._manager.destroy_container(container)
+            raise
+        with self._lock:
+            self._boot_seconds.append(time.monotonic() - started)
+        return container
+
+    def release(self, container: ExecutionBackend):
+        """Cleans a container and returns it to the pool, or destroys it if it can't be reused."""
+        try:
+            container.reset()
+            reusable = container.is_healthy()
+        except Exception as e:
+            print(f"  [!] Container reset failed, discarding it: {e}")
+            reusable = False
+
+        with self._lock:
+            # Containers on a drained or unhealthy host are not handed out again.
+            if reusable and self._usable(container) and len(self._idle) < self.max_warm:
+                self._idle.append(container)
+                return
+        self._manager.destroy_container(container)
+
+    def stats(self) -> dict:
+        with self._lock:
+            boots = list(self._boot_seconds)
+            return {"idle": len(self._idle), "booting": self._booting,
+                    "min_warm": self.min_warm, "max_warm": self.max_warm,
+                    "boot_seconds_avg": sum(boots) / len(boots) if boots else 0.0}
+
+    # --- Background maintenance ---
+    def _maintain(self):
+        while not self._stop.is_set():
+            try:
+                self._manager.check_hosts()
+                self._reap_idle()
+                self._refill()
+            except Exception as e:
+                print(f"  [!] Warm pool maintenance error: {e}")
+            self._wake.wait(timeout=self.refill_interval)
+            self._wake.clear()
+
+    def _reap_idle(self):
+        """Destroys surplus containers idle longer than the TTL, and any on a host being drained."""
+        now = time.monotonic()
+        with self._lock:
+            expired = [container for container in self._idle if not self._usable(container)]
+            for container in expired:
+                self._idle.remove(container)
+            # `acquire` picks by host load, so the deque isn't ordered by age; reap the longest-idle first
+            # and keep at least min_warm.
+            stale = sorted((container for container in self._idle if now - container.last_used > self.idle_ttl),
+                           key=lambda container: container.last_used)
+            for container in stale[:max(len(self._idle) - self.min_warm, 0)]:
+                self._idle.remove(container)
+                expired.append(container)
+        for container in expired:
+            self._manager.destroy_container(container)
+
+    def _refill(self):
+        while not self._stop.is_set():
+            with self._lock:
+                if len(self._idle) + self._booting >= self.min_warm:
+                    return
+                self._booting += 1
+            try:
+                container = self._boot()
+            except Exception as e:
+                print(f"  [!] Failed to boot a warm container: {e}")
+                with self._lock:
+                    self._booting -= 1
+                return
+            with self._lock:
+                self._booting -= 1
+                self._idle.append(container)
@@ -1,47 +1,205 @@
 # kali_execution_server/kali_server.py (Smart Service Version)
 import uvicorn
 import traceback
+import time
 import uuid
 import os
 import re
 import json
-from fastapi import FastAPI, HTTPException
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import PlainTextResponse, Response, StreamingResponse
 from pydantic import BaseModel, ValidationError
-from typing import Dict
+from typing import Dict, List, Optional
 from dotenv import load_dotenv
 
 # --- LLM Integration ---
-from openai import OpenAI, APITimeoutError
+from openai import APITimeoutError, APIStatusError
 
 # Load server-specific environment variables
 load_dotenv()
 
 # --- Local Imports ---
-from kali_driver.driver import KaliManager, KaliContainer
-
-
-# --- Pydantic Model for Structured Output ---
-class Observation(BaseModel):
-    status: str
-    key_finding: str
-    full_output: str
+from kali_driver.backend import ExecutionBackend, COMMAND_TIMEOUT_SECONDS
+from kali_driver.driver import KaliManager, docker_hosts_from_spec
+from kali_driver.hosts import NoHostAvailable
+from kali_driver.pool import ContainerPool
+from formatting.observation import Observation
+from formatting.parsers import build_default_registry
+from formatting.cache import ObservationCache
+from formatting.result_cache import ResultCache, parse_tool_ttls
+from formatting.reduction import OutputReducer, reduce_output
+from transport.encoding import ResponseEncoder
+from telemetry.metrics import MetricsRegistry
+from artifacts.store import ArtifactStore, ArtifactNotFound
+from llm.gateway import LlmGateway, routes_from_env, ROLES
 
 
 # --- LLM Client Setup ---
 LLM_MODEL_NAME = os.getenv("LLM_MODEL")
 LLM_REQUEST_TIMEOUT = 120.0
 MAX_SUMMARY_INPUT_LENGTH = 2000
-formatter_client = OpenAI(
-    base_url=os.getenv("OLLAMA_BASE_URL"),
+# Every LLM call (the formatter's, and the agents' when they point at /llm/v1) goes through one gateway:
+# per-role models (LLM_FORMAT_MODEL, LLM_PLAN_MODEL, ...), a priority queue per backend, and coalescing.
+llm_gateway = LlmGateway(
+    routes=routes_from_env(os.environ, LLM_MODEL_NAME, os.getenv("OLLAMA_BASE_URL")),
     api_key=os.getenv("OLLAMA_API_KEY"),
+    concurrency=int(os.getenv("LLM_BACKEND_CONCURRENCY", "2")),
+)
+# Deterministic parsers tried before the LLM; only unrecognised output costs a model call.
+parser_registry = build_default_registry()
+# Formatted observations keyed by command + normalised output, so repeats skip the LLM.
+observation_cache = ObservationCache(
+    max_entries=int(os.getenv("FORMAT_CACHE_MAX_ENTRIES", "1024")),
+    ttl=float(os.getenv("FORMAT_CACHE_TTL", "86400")),
+    db_path=os.getenv("FORMAT_CACHE_DB") or None,
+    db_max_entries=int(os.getenv("FORMAT_CACHE_DB_MAX_ENTRIES", "10000")),
+)
+# Command results shared across sessions and missions, with per-tool TTLs; a hit never touches a container.
+result_cache = ResultCache(
+    tool_ttls=parse_tool_ttls(os.getenv("RESULT_CACHE_TTLS", "")),
+    default_ttl=float(os.getenv("RESULT_CACHE_DEFAULT_TTL", "0")),
+    max_entries=int(os.getenv("RESULT_CACHE_MAX_ENTRIES", "2048")),
+)
+# Raw output over the spill threshold goes to disk; observations carry an excerpt plus an artifact handle.
+artifact_store = ArtifactStore(
+    root=os.getenv("ARTIFACT_DIR", "artifacts"),
+    spill_chars=int(os.getenv("ARTIFACT_SPILL_CHARS", "8000")),
+    excerpt_chars=int(os.getenv("ARTIFACT_EXCERPT_CHARS", "1200")),
+    materialized_budget_bytes=int(os.getenv("ARTIFACT_CACHE_BYTES", str(512 * 1024 * 1024))),
+    ttl=float(os.getenv("ARTIFACT_TTL", str(7 * 86400))),
+    prune_interval=float(os.getenv("ARTIFACT_PRUNE_INTERVAL", "300")),
+)
+# Largest slice /artifact/{id}/range will return in one response.
+MAX_ARTIFACT_SLICE_BYTES = int(os.getenv("MAX_ARTIFACT_SLICE_BYTES", "65536"))
+# Compresses (and optionally msgpack-encodes) observation responses the client can decode.
+response_encoder = ResponseEncoder(
+    min_compress_bytes=int(os.getenv("COMPRESS_MIN_BYTES", "1024")),
+    msgpack_min_bytes=int(os.getenv("MSGPACK_MIN_BYTES", "4096")),
+)
+
+# --- Concurrency Settings ---
+# Upper bound on commands/session starts in flight across all sessions; beyond it the server answers 429.
+MAX_CONCURRENT_REQUESTS = int(os.getenv("MAX_CONCURRENT_REQUESTS", "32"))
+# Largest number of independent commands a single batch may run concurrently in one session.
+MAX_BATCH_SIZE = int(os.getenv("MAX_BATCH_SIZE", "8"))
+# Threads reserved for blocking Docker and SSH work, so it never starves the event loop.
+BLOCKING_WORKERS = int(os.getenv("BLOCKING_WORKERS", "64"))
+
+blocking_executor = ThreadPoolExecutor(max_workers=BLOCKING_WORKERS, thread_name_prefix="kali-io")
+
+# Where commands run: "ssh" (sshd in the container), "docker_exec" (Docker exec API, no sshd) or "local" (dev only)
+KALI_BACKEND = os.getenv("KALI_BACKEND", "ssh")
+
+# Docker endpoints sessions are spread over, e.g. "local=unix:///var/run/docker.sock,edge1=ssh://root@10.0.0.7";
+# empty uses the daemon from the environment. Per-host capacity is derived from CPUs and memory unless capped.
+KALI_DOCKER_HOSTS = os.getenv("KALI_DOCKER_HOSTS", "")
+
+print(f"Initializing Kali Docker Manager ({KALI_BACKEND} backend)...")
+kali_manager = KaliManager(
+    backend=KALI_BACKEND,
+    hosts=None if KALI_BACKEND == "local" else docker_hosts_from_spec(
+        KALI_DOCKER_HOSTS, max_containers=int(os.getenv("KALI_HOST_MAX_CONTAINERS", "0"))),
+    check_interval=float(os.getenv("KALI_HOST_CHECK_INTERVAL", "15")),
 )
+container_pool = ContainerPool(
+    kali_manager,
+    min_warm=int(os.getenv("KALI_POOL_MIN_WARM", "2")),
+    max_warm=int(os.getenv("KALI_POOL_MAX_WARM", "5")),
+    idle_ttl=float(os.getenv("KALI_POOL_IDLE_TTL", "600")),
+)
+
+
+class Session:
+    """A container bound to a session, plus a lock so its commands run one at a time."""
 
-app = FastAPI(title="DawnYawn Smart Execution Server")
-print("Initializing Kali Docker Manager...")
-kali_manager = KaliManager()
-active_sessions: Dict[str, KaliContainer] = {}
+    def __init__(self, container: ExecutionBackend):
+        self.container = container
+        # Every command of the session runs on the Docker host its container was placed on.
+        self.host = container.host.name if container.host else None
+        self.lock = asyncio.Lock()
+
+
+active_sessions: Dict[str, Session] = {}
+_in_flight = 0
 print("Kali Docker Manager initialized.")
 
+# Per-stage latency histograms and live gauges, scraped from /metrics.
+metrics = MetricsRegistry()
+metrics.gauge("active_sessions", "Sessions currently bound to a container.", lambda: len(active_sessions))
+metrics.gauge("requests_in_flight", "Admitted commands and session starts in progress.", lambda: _in_flight)
+metrics.gauge("pool_idle_containers", "Warm containers waiting in the pool.", lambda: container_pool.stats()["idle"])
+metrics.gauge("pool_booting_containers", "Containers the pool is currently booting.",
+              lambda: container_pool.stats()["booting"])
+metrics.gauge("llm_queued_requests", "LLM requests waiting for a backend slot.", lambda: llm_gateway.queued())
+metrics.gauge("llm_requests_in_flight", "LLM requests holding a backend slot.", lambda: llm_gateway.in_flight())
+metrics.gauge("pool_boot_seconds_avg", "Average time to boot and connect a container, recent boots.",
+              lambda: container_pool.stats()["boot_seconds_avg"])
+metrics.gauge("docker_hosts_schedulable", "Docker hosts healthy and not drained.",
+              lambda: sum(1 for host in kali_manager.host_stats().values() if host["healthy"] and not host["drained"]))
+
+
+async def _run_blocking(fn, *args, **kwargs):
+    """Runs a blocking Docker/SSH call on the bounded executor."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(blocking_executor, functools.partial(fn, *args, **kwargs))
+
+
+def _check_capacity():
+    if _in_flight >= MAX_CONCURRENT_REQUESTS:
+        raise HTTPException(status_code=429, detail="Server is at capacity, retry later.",
+                            headers={"Retry-After": "5"})
+
+
+@asynccontextmanager
+async def _admit():
+    """Global backpressure: rejects work with 429 instead of queueing it without bound."""
+    global _in_flight
+    _check_capacity()
+    _in_flight += 1
+    try:
+        yield
+    finally:
+        _in_flight -= 1
+
+
+def _trace_tag(http_request: Request) -> str:
+    """The agent's mission/step IDs from the request headers, for correlating log lines with its trace."""
+    mission_id = http_request.headers.get("x-mission-id")
+    step = http_request.headers.get("x-step-id")
+    if not mission_id:
+        return ""
+    return f" [mission {mission_id}" + (f" step {step}]" if step else "]")
+
+
+def _get_session(session_id: str) -> Session:
+    session = active_sessions.get(session_id)
+    if not session: raise HTTPException(status_code=404, detail="Session not found.")
+    return session
+
+
+def _is_active(session_id: str, session: Session) -> bool:
+    """Checked again once a session's lock is held: the session may have ended while we waited for it."""
+    return active_sessions.get(session_id) is session
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    container_pool.start()
+    yield
+    for session_id in list(active_sessions):
+        session = active_sessions.pop(session_id)
+        await _run_blocking(kali_manager.destroy_container, session.container)
+    await _run_blocking(container_pool.shutdown)
+    observation_cache.close()
+    blocking_executor.shutdown(wait=False)
+
+
+app = FastAPI(title="DawnYawn Smart Execution Server", lifespan=lifespan)
+
 
 # --- Helper Functions ---
 def _clean_json_response(response_str: str) -> str:
@@ -50,84 +208,446 @@ def _clean_json_response(response_str: str) -> str:
     return response_str
 
 
-def _format_output_as_json(command: str, raw_output: str) -> dict:
-    """Uses an LLM to format raw text into a structured JSON Observation."""
-    print("   ✍️  Server is formatting output into structured JSON...")
-    if len(raw_output) > MAX_SUMMARY_INPUT_LENGTH:
-        truncated_output = raw_output[:MAX_SUMMARY_INPUT_LENGTH]
-    else:
-        truncated_output = raw_output
-
-    json_schema = Observation.model_json_schema()
-    prompt = (
-        f"You are a data formatting expert. Convert the raw output from the command `{command}` into a structured JSON object. "
-        f"The `key_finding` should be a very brief, one-sentence summary.\n\n"
-        f"RAW OUTPUT:\n---\n{truncated_output}\n---\n\n"
-        f"Your response MUST BE ONLY the single, valid JSON object conforming to this schema:\n{json.dumps(json_schema, indent=2)}"
-    )
-    try:
-        response = formatter_client.chat.completions.create(
-            model=LLM_MODEL_NAME,
-            messages=[{"role": "system", "content": "You are a JSON formatting assistant."},
-                      {"role": "user", "content": prompt}],
-            timeout=LLM_REQUEST_TIMEOUT
+async def _format_output_as_json(command: str, raw_output: str, exit_code: Optional[int] = None,
+                                 reduced_output: Optional[str] = None) -> dict:
+    """
+    Formats raw text into a structured JSON Observation, via a parser if one matches, else the LLM.
+    Parsers and the cache always see the output as the tool wrote it; `reduced_output`, if the caller
+    already reduced it while streaming, is only what the LLM gets.
+    """
+    with metrics.span("format", path="llm") as span:
+        parsed = parser_registry.parse(command, raw_output, exit_code)
+        if parsed is not None:
+            span["path"] = "parser"
+            print("   ⚡ Output parsed deterministically, skipping LLM formatting.")
+            return parsed.model_dump()
+
+        # The cache hashes the whole output and may hit SQLite, so it runs off the event loop.
+        cached = await _run_blocking(observation_cache.get, command, raw_output)
+        if cached is not None:
+            span["path"] = "cache"
+            print("   ⚡ Reusing cached observation for identical output.")
+            return cached
+
+        print("   ✍️  Server is formatting output into structured JSON...")
+        # Keep the lines that matter (ports, CVEs, errors, the summary) rather than just the first N characters.
+        truncated_output = reduced_output if reduced_output is not None else reduce_output(raw_output,
+                                                                                            MAX_SUMMARY_INPUT_LENGTH)
+        if len(truncated_output) < len(raw_output):
+            print(f"   ✂️  Reduced output from {len(raw_output)} to {len(truncated_output)} characters for the formatter.")
+
+        json_schema = Observation.model_json_schema()
+        prompt = (
+            f"You are a data formatting expert. Convert the raw output from the command `{command}` into a structured JSON object. "
+            f"The `key_finding` should be a very brief, one-sentence summary.\n\n"
+            f"RAW OUTPUT:\n---\n{truncated_output}\n---\n\n"
+            f"Your response MUST BE ONLY the single, valid JSON object conforming to this schema:\n{json.dumps(json_schema, indent=2)}"
         )
-        json_string = _clean_json_response(response.choices[0].message.content)
-        # Validate the JSON before returning
-        return Observation.model_validate_json(json_string).model_dump()
-    except (APITimeoutError, ValidationError) as e:
-        print(f"   > ❌ JSON formatting failed: {e}")
-        return Observation(
-            status="FAILURE",
-            key_finding=f"Server-side observation failed: {type(e).__name__}",
-            full_output=truncated_output
-        ).model_dump()
+        try:
+            response = await llm_gateway.complete(
+                "format",
+                messages=[{"role": "system", "content": "You are a JSON formatting assistant."},
+                          {"role": "user", "content": prompt}],
+                timeout=LLM_REQUEST_TIMEOUT
+            )
+            json_string = _clean_json_response(response.choices[0].message.content)
+            # Validate the JSON before returning
+            observation = Observation.model_validate_json(json_string).model_dump()
+            await _run_blocking(observation_cache.put, command, raw_output, observation)
+            return observation
+        except (APITimeoutError, ValidationError) as e:
+            span["path"] = "error"
+            print(f"   > ❌ JSON formatting failed: {e}")
+            return Observation(
+                status="FAILURE",
+                key_finding=f"Server-side observation failed: {type(e).__name__}",
+                full_output=truncated_output
+            ).model_dump()
+
+
+def _with_output(observation: dict, full_output: str, artifact: Optional[dict]) -> dict:
+    """Puts the real output in the observation: whole if small, else an excerpt and the artifact handle."""
+    if artifact is None:
+        return {**observation, "full_output": full_output}
+    return {**observation, "full_output": artifact["excerpt"], "full_output_truncated": True,
+            "artifact": {"id": artifact["id"], "size_bytes": artifact["size_bytes"], "lines": artifact["lines"]}}
+
+
+async def _attach_output(observation: dict, raw_output: str) -> dict:
+    return _with_output(observation, raw_output, await _run_blocking(artifact_store.spill, raw_output))
+
+
+def _mark_stopped(observation: dict, stopped: Optional[str], timeout: Optional[float]) -> dict:
+    """
+    Flags an observation built from the partial output of a command that hit its deadline or was cancelled.
+    The formatter's status stands: a timed-out scan's partial results are still results.
+    """
+    if not stopped:
+        return observation
+    reason = (f"timed out after {min(timeout or COMMAND_TIMEOUT_SECONDS, COMMAND_TIMEOUT_SECONDS):g}s"
+              if stopped == "timeout" else "was cancelled")
+    return {**observation, "stopped": stopped,
+            "key_finding": f"Command {reason}; partial output only. {observation.get('key_finding', '')}".strip()}
 
 
 # --- API Endpoints (Unchanged from Interactive Model) ---
 class SessionRequest(BaseModel): session_id: str
 
 
-class ExecuteRequest(SessionRequest): command: str
+class ExecuteRequest(SessionRequest):
+    command: str
+    no_cache: bool = False  # Always run the command, ignoring any cached result
+    timeout: Optional[float] = None  # Seconds before the command is killed; capped at COMMAND_TIMEOUT_SECONDS
+
+
+class BatchExecuteRequest(SessionRequest):
+    commands: List[str]
+    no_cache: bool = False
+    timeout: Optional[float] = None  # Applies to each command separately
 
 
 @app.post("/session/start")
-def start_session():
+async def start_session():
     session_id = str(uuid.uuid4())
     print(f"\n--- [START] New session request ---")
-    try:
-        container = kali_manager.create_container()
-        active_sessions[session_id] = container
-        print(f"--- ✅ Session '{session_id}' started ---")
-        return {"session_id": session_id}
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to create container: {e}")
+    async with _admit():
+        try:
+            with metrics.span("session_start", backend=KALI_BACKEND):
+                container = await _run_blocking(container_pool.acquire)
+        except NoHostAvailable as e:
+            raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "30"})
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Failed to create container: {e}")
+    session = Session(container)
+    active_sessions[session_id] = session
+    print(f"--- ✅ Session '{session_id}' started" + (f" on host '{session.host}' ---" if session.host else " ---"))
+    return {"session_id": session_id, "host": session.host}
 
 
 @app.post("/session/execute")
-def execute_in_session(request: ExecuteRequest):
-    container = active_sessions.get(request.session_id)
-    if not container: raise HTTPException(status_code=404, detail="Session not found.")
+async def execute_in_session(request: ExecuteRequest, http_request: Request):
+    session = _get_session(request.session_id)
+    metrics.begin_request()
 
-    print(f"\n--- [EXECUTE] In session '{request.session_id}': '{request.command}' ---")
-    try:
-        raw_output = container.send_command_and_get_output(request.command)
+    print(f"\n--- [EXECUTE] In session '{request.session_id}'{_trace_tag(http_request)}: '{request.command}' ---")
+    cached = result_cache.get(request.command, bypass=request.no_cache)
+    if cached is not None:
+        print(f"--- ⚡ Returning cached result ({cached['cache_age_seconds']:.0f}s old) ---")
+        return response_encoder.encode(http_request, cached)
+    async with _admit(), session.lock:
+        if not _is_active(request.session_id, session):
+            raise HTTPException(status_code=404, detail="Session not found.")
+        try:
+            with metrics.span("ssh_exec"):
+                raw_output, exit_code, stopped = await _run_blocking(
+                    session.container.run_command, request.command, request.timeout)
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Command execution failed: {e}")
         # --- KEY CHANGE: Format the output before returning ---
-        json_observation = _format_output_as_json(request.command, raw_output)
-        print("--- ✅ Command executed and formatted ---")
-        return json_observation  # Return the JSON object directly
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Command execution failed: {e}")
+        json_observation = _mark_stopped(await _attach_output(
+            await _format_output_as_json(request.command, raw_output, exit_code), raw_output), stopped, request.timeout)
+    if not stopped:
+        result_cache.put(request.command, json_observation)
+    print("--- ✅ Command executed and formatted ---")
+    return response_encoder.encode(http_request, json_observation, headers={"Server-Timing": metrics.server_timing()})
+
+
+@app.post("/session/execute/batch")
+async def execute_batch_in_session(request: BatchExecuteRequest, http_request: Request):
+    """Runs independent commands concurrently, one SSH channel each, and returns observations in order."""
+    session = _get_session(request.session_id)
+    if not request.commands:
+        raise HTTPException(status_code=422, detail="Batch contains no commands.")
+    if len(request.commands) > MAX_BATCH_SIZE:
+        raise HTTPException(status_code=422, detail=f"Batch exceeds the limit of {MAX_BATCH_SIZE} commands.")
+
+    metrics.begin_request()
+    print(f"\n--- [BATCH] In session '{request.session_id}'{_trace_tag(http_request)}: {len(request.commands)} commands ---")
+
+    async def run_one(command: str) -> dict:
+        cached = result_cache.get(command, bypass=request.no_cache)
+        if cached is not None:
+            return cached
+        try:
+            with metrics.span("ssh_exec"):
+                raw_output, exit_code, stopped = await _run_blocking(
+                    session.container.run_command, command, request.timeout)
+        except Exception as e:
+            return Observation(status="FAILURE", key_finding=f"Command execution failed: {e}",
+                               full_output="").model_dump()
+        observation = await _attach_output(await _format_output_as_json(command, raw_output, exit_code), raw_output)
+        if stopped:
+            return _mark_stopped(observation, stopped, request.timeout)
+        result_cache.put(command, observation)
+        return observation
+
+    async with _admit(), session.lock:
+        if not _is_active(request.session_id, session):
+            raise HTTPException(status_code=404, detail="Session not found.")
+        observations = await asyncio.gather(*(run_one(command) for command in request.commands))
+    print("--- ✅ Batch executed and formatted ---")
+    return response_encoder.encode(http_request, {"observations": observations},
+                                   headers={"Server-Timing": metrics.server_timing()})
+
+
+def _sse_frame(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+_STREAM_DONE = object()
+
+
+@app.post("/session/execute/stream")
+async def execute_in_session_streaming(request: ExecuteRequest, http_request: Request):
+    """Streams stdout/stderr as SSE frames while the command runs, then a final `observation` frame."""
+    session = _get_session(request.session_id)
+
+    print(f"\n--- [STREAM] In session '{request.session_id}'{_trace_tag(http_request)}: '{request.command}' ---")
+    cached = result_cache.get(request.command, bypass=request.no_cache)
+    if cached is not None:
+        print(f"--- ⚡ Returning cached result ({cached['cache_age_seconds']:.0f}s old) ---")
+        return StreamingResponse(iter([_sse_frame("observation", cached)]), media_type="text/event-stream")
+    # Capacity is checked up front so a full server answers 429 before the stream opens. The slot itself
+    # is only taken once the stream runs, so a response cancelled before its first frame can't leak it.
+    _check_capacity()
+
+    async def event_stream():
+        admission = _admit()
+        try:
+            await admission.__aenter__()
+        except HTTPException as e:
+            # Filled up between the check and the first frame; the 200 is already on its way.
+            yield _sse_frame("error", e.detail)
+            return
+        # Stdout is reduced line by line as it arrives, so the LLM formatter's input for huge outputs stays bounded.
+        reducer = OutputReducer(MAX_SUMMARY_INPUT_LENGTH)
+        # The complete stdout goes to an artifact writer, which spills to disk past the threshold.
+        stdout_writer = artifact_store.writer()
+        stderr_parts, stderr_size = [], 0
+        exit_code = stopped = None
+        try:
+            async with session.lock:
+                if not _is_active(request.session_id, session):
+                    yield _sse_frame("error", "Session not found.")
+                    return
+                chunks = session.container.stream_command(request.command, timeout=request.timeout)
+                exec_started = time.perf_counter()
+                try:
+                    while True:
+                        item = await _run_blocking(next, chunks, _STREAM_DONE)
+                        if item is _STREAM_DONE:
+                            break
+                        stream, text = item
+                        if stream == "exit":
+                            exit_code = text
+                            metrics.stage_seconds.observe(time.perf_counter() - exec_started, stage="ssh_exec_stream")
+                            yield _sse_frame("exit", exit_code)
+                            continue
+                        if stream == "stopped":
+                            stopped = text
+                            yield _sse_frame("stopped", stopped)
+                            continue
+                        if stream == "stdout":
+                            reducer.feed(text)
+                            stdout_writer.write(text)
+                        elif stderr_size < artifact_store.spill_chars:
+                            stderr_parts.append(text)
+                            stderr_size += len(text)
+                        yield _sse_frame(stream, text)
+                except Exception as e:
+                    yield _sse_frame("error", f"Command execution failed: {e}")
+                    return
+                finally:
+                    await _run_blocking(chunks.close)
+
+                stderr_output = "".join(stderr_parts).strip()
+                stderr_section = "\n--- STDERR ---\n" + stderr_output if stderr_output else ""
+                if stdout_writer.spilled:
+                    stdout_writer.write(stderr_section)
+                    artifact = await _run_blocking(stdout_writer.close)
+                    # The reducer's salient lines are for the LLM only: parsers need the output as written
+                    # (an -oX document, every table row), so they read it back from the artifact.
+                    data = await _run_blocking(artifact_store.read_range, artifact["id"], 0, artifact["size_bytes"])
+                    observation = await _format_output_as_json(
+                        request.command, data.decode("utf-8", errors="replace").strip(), exit_code,
+                        reduced_output=reducer.result().strip() + stderr_section[:MAX_SUMMARY_INPUT_LENGTH])
+                    observation = _with_output(observation, "", artifact)
+                else:
+                    full_output = stdout_writer.text().strip() + stderr_section
+                    observation = await _format_output_as_json(request.command, full_output, exit_code)
+                    observation = await _attach_output(observation, full_output)
+                observation = _mark_stopped(observation, stopped, request.timeout)
+                if not stopped:
+                    result_cache.put(request.command, observation)
+                yield _sse_frame("observation", observation)
+                print("--- ✅ Command streamed and formatted ---")
+        finally:
+            # A failed or abandoned stream never closes its writer; don't leave the spill file behind.
+            stdout_writer.discard()
+            await admission.__aexit__(None, None, None)
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
+
+
+@app.post("/session/cancel")
+async def cancel_session_commands(request: SessionRequest):
+    """
+    Kills whatever the session is running, with its whole process group. Each stopped command still
+    returns its observation, built from the output it had produced, to whoever is waiting on it.
+    """
+    session = _get_session(request.session_id)
+    # Deliberately not under the session lock: the command being cancelled holds it.
+    cancelled = await _run_blocking(session.container.cancel)
+    print(f"--- 🛑 Cancelled {cancelled} command(s) in session '{request.session_id}' ---")
+    return {"cancelled": cancelled}
+
+
+@app.post("/session/reset")
+async def reset_session(request: SessionRequest):
+    """Wipes the session's container so the same session can be reused for another mission."""
+    session = _get_session(request.session_id)
+    async with session.lock:
+        if not _is_active(request.session_id, session):
+            raise HTTPException(status_code=404, detail="Session not found.")
+        try:
+            with metrics.span("session_reset"):
+                await _run_blocking(session.container.reset)
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Failed to reset session: {e}")
+    print(f"--- ♻️  Session '{request.session_id}' reset ---")
+    return {"message": "Session reset."}
 
 
 @app.post("/session/end")
-def end_session(request: SessionRequest):
-    container = active_sessions.pop(request.session_id, None)
-    if not container: raise HTTPException(status_code=404, detail="Session not found.")
+async def end_session(request: SessionRequest):
+    # Popped first, so of two concurrent ends only one releases the container.
+    session = active_sessions.pop(request.session_id, None)
+    if not session: raise HTTPException(status_code=404, detail="Session not found.")
     print(f"\n--- [END] Session '{request.session_id}' ---")
-    container.destroy()
+    # Let any command still running in this session finish before recycling the container. Commands
+    # queued behind it see the session is gone once they get the lock, and never touch the container.
+    async with session.lock:
+        with metrics.span("session_release"):
+            await _run_blocking(container_pool.release, session.container)
     return {"message": "Session ended."}
 
 
+@app.get("/hosts")
+async def docker_hosts():
+    """Load, capacity and health of each Docker host, and how many active sessions each one holds."""
+    sessions: Dict[str, int] = {}
+    for session in active_sessions.values():
+        if session.host:
+            sessions[session.host] = sessions.get(session.host, 0) + 1
+    return {name: {**stats, "sessions": sessions.get(name, 0)} for name, stats in kali_manager.host_stats().items()}
+
+
+@app.post("/hosts/{name}/drain")
+async def drain_docker_host(name: str, drained: bool = True):
+    """Stops (or, with drained=false, resumes) placing sessions on a host; its current sessions run to completion."""
+    try:
+        kali_manager.drain_host(name, drained)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Unknown Docker host '{name}'.")
+    # Idle warm containers on a drained host are destroyed on the pool's next pass.
+    container_pool.wake()
+    return kali_manager.host_stats()[name]
+
+
+@app.get("/formatter/stats")
+async def formatter_stats():
+    """Reports how often parsers and the caches handled work instead of the LLM or a container."""
+    return {"parsers": parser_registry.stats(), "cache": observation_cache.stats(),
+            "result_cache": result_cache.stats(),
+            "artifacts": artifact_store.stats(),
+            "transport": response_encoder.stats()}
+
+
+@app.post("/llm/v1/chat/completions")
+async def llm_chat_completions(http_request: Request):
+    """
+    OpenAI-compatible proxy into the gateway, so agents share its queue with the formatter.
+    The X-LLM-Role header (plan, think, format or speculate) picks the route; the requested model is replaced by it.
+    """
+    role = http_request.headers.get("x-llm-role", "think")
+    if role not in ROLES:
+        raise HTTPException(status_code=400, detail=f"Unknown LLM role '{role}'.")
+    body = await http_request.json()
+    messages = body.pop("messages", None)
+    if not messages:
+        raise HTTPException(status_code=400, detail="`messages` is required.")
+    body.pop("model", None)
+    stream = body.pop("stream", False)
+    body.setdefault("timeout", LLM_REQUEST_TIMEOUT)
+
+    if not stream:
+        try:
+            completion = await llm_gateway.complete(role, messages, **body)
+        except APITimeoutError:
+            raise HTTPException(status_code=504, detail="LLM backend timed out.")
+        except APIStatusError as e:
+            raise HTTPException(status_code=e.status_code, detail=str(e))
+        return completion.model_dump(exclude_unset=True)
+
+    async def event_stream():
+        try:
+            async for chunk in llm_gateway.stream(role, messages, **body):
+                yield f"data: {chunk.model_dump_json(exclude_unset=True)}\n\n"
+        except (APITimeoutError, APIStatusError) as e:
+            yield f"data: {json.dumps({'error': {'message': str(e)}})}\n\n"
+        yield "data: [DONE]\n\n"
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
+
+
+@app.get("/llm/stats")
+async def llm_stats():
+    """Routes, per-backend queue depth and per-role request/coalescing counts."""
+    return llm_gateway.stats()
+
+
+def _get_artifact(artifact_id: str) -> dict:
+    try:
+        return artifact_store.info(artifact_id)
+    except ArtifactNotFound:
+        raise HTTPException(status_code=404, detail="Artifact not found.")
+
+
+@app.get("/artifact/{artifact_id}")
+async def artifact_info(artifact_id: str):
+    """Size and line count of a stored output, plus the excerpt the observation carried."""
+    return _get_artifact(artifact_id)
+
+
+@app.get("/artifact/{artifact_id}/range")
+async def artifact_range(artifact_id: str, offset: int = 0, length: int = MAX_ARTIFACT_SLICE_BYTES):
+    """Serves a byte range of a stored output, read through mmap."""
+    info = _get_artifact(artifact_id)
+    length = max(0, min(length, MAX_ARTIFACT_SLICE_BYTES))
+    data = await _run_blocking(artifact_store.read_range, artifact_id, offset, length)
+    start = max(0, min(offset, info["size_bytes"]))
+    end = start + len(data) - 1 if data else start
+    return Response(content=data, media_type="text/plain; charset=utf-8",
+                    headers={"Content-Range": f"bytes {start}-{end}/{info['size_bytes']}"})
+
+
+@app.get("/artifact/{artifact_id}/grep")
+async def artifact_grep(artifact_id: str, pattern: str, max_matches: int = 50, context: int = 0,
+                        ignore_case: bool = False, regex: bool = False):
+    """Lines of a stored output containing a string (or, with regex=true, matching a regex), so the agent never downloads the whole thing."""
+    _get_artifact(artifact_id)
+    try:
+        return await _run_blocking(artifact_store.grep, artifact_id, pattern, max(1, min(max_matches, 500)),
+                                   max(0, min(context, 10)), ignore_case, regex)
+    except (re.error, ValueError) as e:
+        raise HTTPException(status_code=422, detail=f"Invalid pattern: {e}")
+
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    """Prometheus scrape endpoint: per-stage latency histograms plus session and pool gauges."""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
 if __name__ == "__main__":
-    uvicorn.run(app, host="127.0.0.1", port=1611)
\ No newline at end of file
+    uvicorn.run(app, host="127.0.0.1", port=1611)
@@ -0,0 +1,156 @@
+# kali_execution_server/llm/gateway.py
+import json
+import heapq
+import asyncio
+import hashlib
+import itertools
+from typing import AsyncIterator, Dict, List, Optional
+from openai import AsyncOpenAI
+
+# Lower runs first. Planning blocks a user waiting to approve; formatting is bulk work that can wait,
+# and speculative guesses only help if they don't slow anything else down.
+ROLE_PRIORITIES = {"plan": 0, "think": 1, "format": 2, "speculate": 3}
+ROLES = tuple(ROLE_PRIORITIES)
+
+
+class Route:
+    """The model that serves a role, and the OpenAI-compatible endpoint it is served from."""
+
+    def __init__(self, role: str, model: str, base_url: str):
+        self.role = role
+        self.model = model
+        self.base_url = base_url
+
+    def as_dict(self) -> dict:
+        return {"model": self.model, "base_url": self.base_url}
+
+
+def routes_from_env(env: Dict[str, str], default_model: str, default_base_url: str) -> Dict[str, Route]:
+    """Reads LLM_<ROLE>_MODEL and LLM_<ROLE>_BASE_URL for each role, falling back to the defaults."""
+    return {role: Route(role, env.get(f"LLM_{role.upper()}_MODEL") or default_model,
+                        env.get(f"LLM_{role.upper()}_BASE_URL") or default_base_url)
+            for role in ROLES}
+
+
+class PrioritySlots:
+    """An asyncio concurrency limit whose waiters are admitted by priority, then arrival order."""
+
+    def __init__(self, limit: int):
+        if limit < 1:
+            raise ValueError("Concurrency limit must be at least 1.")
+        self.limit = limit
+        self.in_use = 0
+        self._waiters: List[tuple] = []
+        self._order = itertools.count()
+
+    @property
+    def queued(self) -> int:
+        return sum(1 for _, _, waiter in self._waiters if not waiter.done())
+
+    async def acquire(self, priority: int):
+        if self.in_use < self.limit and not self.queued:
+            self.in_use += 1
+            return
+        waiter = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._order), waiter))
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            # The slot may have been handed over just as we were cancelled; pass it on.
+            if waiter.done() and not waiter.cancelled():
+                self.release()
+            raise
+
+    def release(self):
+        while self._waiters:
+            _, _, waiter = heapq.heappop(self._waiters)
+            if not waiter.done():
+                # The slot moves straight to the next waiter, so in_use stays the same.
+                waiter.set_result(None)
+                return
+        self.in_use -= 1
+
+
+class LlmGateway:
+    """
+    Single path for every LLM call the server makes or proxies: each role is routed to its own model,
+    each backend has a priority-ordered concurrency limit, and identical non-streaming requests that
+    are already in flight share one upstream call.
+    """
+
+    def __init__(self, routes: Dict[str, Route], api_key: Optional[str], concurrency: int = 2):
+        self.routes = routes
+        self._clients: Dict[str, AsyncOpenAI] = {}
+        self._slots: Dict[str, PrioritySlots] = {}
+        for route in routes.values():
+            if route.base_url not in self._clients:
+                self._clients[route.base_url] = AsyncOpenAI(base_url=route.base_url, api_key=api_key)
+                self._slots[route.base_url] = PrioritySlots(concurrency)
+        self._in_flight: Dict[str, asyncio.Task] = {}
+        self._counters = {role: {"requests": 0, "coalesced": 0, "streams": 0} for role in routes}
+
+    def route(self, role: str) -> Route:
+        if role not in self.routes:
+            raise ValueError(f"Unknown LLM role '{role}'. Choose from: {', '.join(self.routes)}.")
+        return self.routes[role]
+
+    async def complete(self, role: str, messages: List[dict], **params):
+        """A non-streaming chat completion for `role`; joins an identical request if one is in flight."""
+        route = self.route(role)
+        # The timeout only affects how long a caller waits, not what the model is asked.
+        key = _request_key(route, messages, {k: v for k, v in params.items() if k != "timeout"})
+        self._counters[role]["requests"] += 1
+        task = self._in_flight.get(key)
+        if task is not None:
+            self._counters[role]["coalesced"] += 1
+        else:
+            task = asyncio.ensure_future(self._call(route, messages, params))
+            self._in_flight[key] = task
+            task.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        # Shielded so one caller giving up doesn't cancel the call for everyone sharing it.
+        return await asyncio.shield(task)
+
+    async def _call(self, route: Route, messages: List[dict], params: dict):
+        slots = self._slots[route.base_url]
+        await slots.acquire(ROLE_PRIORITIES[route.role])
+        try:
+            return await self._clients[route.base_url].chat.completions.create(
+                model=route.model, messages=messages, **params)
+        finally:
+            slots.release()
+
+    async def stream(self, role: str, messages: List[dict], **params) -> AsyncIterator:
+        """A streaming chat completion for `role`; the backend slot is held until the stream ends."""
+        route = self.route(role)
+        self._counters[role]["streams"] += 1
+        slots = self._slots[route.base_url]
+        await slots.acquire(ROLE_PRIORITIES[role])
+        try:
+            stream = await self._clients[route.base_url].chat.completions.create(
+                model=route.model, messages=messages, stream=True, **params)
+            try:
+                async for chunk in stream:
+                    yield chunk
+            finally:
+                await stream.close()
+        finally:
+            slots.release()
+
+    def queued(self) -> int:
+        return sum(slots.queued for slots in self._slots.values())
+
+    def in_flight(self) -> int:
+        return sum(slots.in_use for slots in self._slots.values())
+
+    def stats(self) -> dict:
+        return {
+            "routes": {role: route.as_dict() for role, route in self.routes.items()},
+            "backends": {url: {"limit": slots.limit, "in_use": slots.in_use, "queued": slots.queued}
+                         for url, slots in self._slots.items()},
+            "roles": {role: dict(counters) for role, counters in self._counters.items()},
+        }
+
+
+def _request_key(route: Route, messages: List[dict], params: dict) -> str:
+    payload = json.dumps([route.base_url, route.model, messages, params], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
@@ -0,0 +1,114 @@
+# kali_execution_server/telemetry/metrics.py
+import time
+import bisect
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, List, Optional, Tuple
+
+# Seconds; spans range from cache hits (sub-millisecond) to long scans (tens of minutes).
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800)
+
+# Stage timings of the request being served, reported back to the agent as a Server-Timing header.
+_request_timings: ContextVar[Optional[List[Tuple[str, float]]]] = ContextVar("request_timings", default=None)
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    pairs = []
+    for key, value in sorted(labels.items()):
+        value = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        pairs.append(f'{key}="{value}"')
+    return "{" + ",".join(pairs) + "}"
+
+
+class Histogram:
+    """A labelled Prometheus histogram: cumulative buckets, sum and count per label set."""
+
+    def __init__(self, name: str, help_text: str, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[Tuple, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                # [per-bucket counts..., +Inf count, sum]
+                series = self._series[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[bisect.bisect_left(self.buckets, value)] += 1
+            series[-1] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            snapshot = {key: list(series) for key, series in self._series.items()}
+        for key, series in sorted(snapshot.items()):
+            labels = dict(key)
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), series[:-1]):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(float(bound))
+                lines.append(f"{self.name}_bucket{_format_labels({**labels, 'le': le})} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(labels)} {series[-1]:.6f}")
+            lines.append(f"{self.name}_count{_format_labels(labels)} {cumulative}")
+        return lines
+
+
+class Gauge:
+    """A gauge whose value is read from a callback at scrape time, so it can never drift."""
+
+    def __init__(self, name: str, help_text: str, read: Callable[[], float]):
+        self.name = name
+        self.help_text = help_text
+        self.read = read
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} gauge",
+                f"{self.name} {float(self.read())}"]
+
+
+class MetricsRegistry:
+    """Per-stage latency histograms and live gauges, rendered in the Prometheus text format."""
+
+    def __init__(self, prefix: str = "dawnyawn"):
+        self.prefix = prefix
+        self.stage_seconds = Histogram(f"{prefix}_stage_duration_seconds",
+                                       "Time spent in each server stage (ssh_exec, format, ...).")
+        self._gauges: List[Gauge] = []
+
+    def gauge(self, name: str, help_text: str, read: Callable[[], float]):
+        self._gauges.append(Gauge(f"{self.prefix}_{name}", help_text, read))
+
+    @contextmanager
+    def span(self, stage: str, **labels):
+        """Times the block into the stage histogram; `labels` may be amended inside the block."""
+        started = time.perf_counter()
+        try:
+            yield labels
+        finally:
+            elapsed = time.perf_counter() - started
+            self.stage_seconds.observe(elapsed, stage=stage, **labels)
+            timings = _request_timings.get()
+            if timings is not None:
+                timings.append((stage, elapsed))
+
+    @staticmethod
+    def begin_request():
+        """Starts collecting stage timings for the current request (see `server_timing`)."""
+        _request_timings.set([])
+
+    @staticmethod
+    def server_timing() -> str:
+        """The current request's stages as a Server-Timing header value, durations in milliseconds."""
+        return ", ".join(f"{stage};dur={elapsed * 1000:.1f}" for stage, elapsed in _request_timings.get() or [])
+
+    def render(self) -> str:
+        lines = self.stage_seconds.render()
+        for gauge in self._gauges:
+            lines.extend(gauge.render())
+        return "\n".join(lines) + "\n"
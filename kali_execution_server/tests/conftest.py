@@ -0,0 +1,6 @@
+# kali_execution_server/tests/conftest.py
+import os
+import sys
+
+# Server modules import each other from the server directory (`from formatting.parsers import ...`).
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
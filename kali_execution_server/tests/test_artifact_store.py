@@ -0,0 +1,129 @@
+# kali_execution_server/tests/test_artifact_store.py
+import os
+import re
+import time
+
+import pytest
+
+from artifacts import store as store_module
+from artifacts.store import ArtifactNotFound, ArtifactStore
+
+OUTPUT = "".join(f"line {n}: {'80/tcp open http' if n % 100 == 0 else 'closed'}\n" for n in range(1, 1001))
+
+
+@pytest.fixture
+def store(tmp_path):
+    return ArtifactStore(str(tmp_path), spill_chars=1000, excerpt_chars=200)
+
+
+@pytest.fixture
+def artifact(store):
+    return store.spill(OUTPUT)["id"]
+
+
+def test_small_outputs_stay_in_memory(store):
+    writer = store.writer()
+    writer.write("short")
+    assert writer.text() == "short"
+    assert writer.close() is None
+    assert store.spill("x" * 1000) is None
+
+
+def test_large_outputs_spill_with_an_excerpt(store):
+    writer = store.writer()
+    for start in range(0, len(OUTPUT), 500):
+        writer.write(OUTPUT[start:start + 500])
+    assert writer.spilled and writer.text() is None
+    meta = writer.close()
+    assert meta["size_bytes"] == len(OUTPUT.encode("utf-8"))
+    assert meta["excerpt"].startswith("line 1: closed")
+    assert meta["excerpt"].endswith("line 1000: 80/tcp open http\n")
+    assert f"stored in artifact {meta['id']}" in meta["excerpt"]
+    assert store.info(meta["id"])["lines"] == 1001
+
+
+def test_identical_outputs_are_stored_once(store, artifact):
+    assert store.spill(OUTPUT)["id"] == artifact
+    assert store.stats()["deduplicated"] == 1
+
+
+def test_discard_removes_the_spill_file(store):
+    writer = store.writer()
+    writer.write(OUTPUT)
+    writer.discard()
+    assert os.listdir(store.tmp_dir) == []
+
+
+@pytest.mark.parametrize("offset, length, expected", [
+    (0, 15, OUTPUT[:15]),
+    (15, 15, OUTPUT[15:30]),
+    (len(OUTPUT) - 5, 100, OUTPUT[-5:]),
+    (len(OUTPUT) + 10, 10, ""),
+    (-5, 4, OUTPUT[:4]),
+])
+def test_read_range(store, artifact, offset, length, expected):
+    assert store.read_range(artifact, offset, length).decode("utf-8") == expected
+
+
+def test_range_reads_survive_a_trimmed_copy(store, artifact):
+    os.unlink(os.path.join(store.raw_dir, artifact))
+    assert store.read_range(artifact, 0, 6) == b"line 1"
+
+
+@pytest.mark.parametrize("kwargs, lines", [
+    ({"pattern": "open"}, list(range(100, 1001, 100))),
+    ({"pattern": "OPEN", "ignore_case": True}, list(range(100, 1001, 100))),
+    ({"pattern": "line 5: "}, [5]),
+    ({"pattern": "line 5.", "max_matches": 3}, []),
+    ({"pattern": r"line [1-3]00:", "regex": True}, [100, 200, 300]),
+    ({"pattern": "open", "max_matches": 2}, [100, 200]),
+])
+def test_grep(store, artifact, kwargs, lines):
+    result = store.grep(artifact, **kwargs)
+    assert [match["line"] for match in result["matches"]] == lines
+    assert result["truncated"] == (kwargs.get("max_matches", 50) < 10 and kwargs["pattern"] == "open")
+
+
+def test_grep_context_and_offsets(store, artifact):
+    match = store.grep(artifact, "line 500:", context=1)["matches"][0]
+    assert match["text"] == "line 499: closed\nline 500: 80/tcp open http\nline 501: closed"
+    assert OUTPUT.encode("utf-8")[match["offset"]:].startswith(b"line 500:")
+
+
+@pytest.mark.parametrize("pattern, regex, error", [
+    ("", False, ValueError),
+    ("x" * 300, False, ValueError),
+    ("(unclosed", True, re.error),
+])
+def test_grep_rejects_bad_patterns(store, artifact, pattern, regex, error):
+    with pytest.raises(error):
+        store.grep(artifact, pattern, regex=regex)
+
+
+@pytest.mark.parametrize("pattern", [r"(a|a)*b", r"(.*a){20}c", r"(a+)+b"])
+def test_catastrophic_regexes_are_stopped_at_the_time_budget(tmp_path, monkeypatch, pattern):
+    monkeypatch.setattr(store_module, "GREP_TIME_BUDGET_SECONDS", 1.0)
+    store = ArtifactStore(str(tmp_path), spill_chars=10)
+    artifact = store.spill("ok b\n" + "a" * 5000 + "\n")["id"]
+    started = time.monotonic()
+    result = store.grep(artifact, pattern, regex=True)
+    assert time.monotonic() - started < 5
+    assert result["truncated"]
+
+
+def test_unknown_and_malformed_ids(store):
+    with pytest.raises(ArtifactNotFound):
+        store.info("0" * 64)
+    with pytest.raises(ArtifactNotFound):
+        store.read_range("../../etc/passwd", 0, 10)
+
+
+def test_prune_expires_old_artifacts(tmp_path):
+    store = ArtifactStore(str(tmp_path), spill_chars=10, ttl=60)
+    artifact = store.spill(OUTPUT)["id"]
+    old = time.time() - 120
+    os.utime(os.path.join(store.blob_dir, f"{artifact}.json"), (old, old))
+    store.prune()
+    with pytest.raises(ArtifactNotFound):
+        store.info(artifact)
+    assert store.stats()["expired"] == 1
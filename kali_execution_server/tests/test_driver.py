@@ -0,0 +1,104 @@
+# kali_execution_server/tests/test_driver.py
+import socket
+import threading
+import time
+
+import pytest
+
+from kali_driver import driver
+from kali_driver.docker_exec import DockerExecContainer
+from kali_driver.driver import KaliContainer, KaliManager, wait_for_ssh_banner
+from kali_driver.hosts import DockerHost
+
+
+class FakeDockerContainer:
+    short_id = "abc123"
+    id = "abc123full"
+
+    def __init__(self, status="running"):
+        self.status = status
+        self.ports = {"22/tcp": [{"HostPort": "2222"}]}
+        self.removed = False
+
+    def reload(self):
+        pass
+
+    def start(self):
+        pass
+
+    def remove(self, force=False):
+        self.removed = True
+
+
+class FakeContainers:
+    def __init__(self, container):
+        self.container = container
+
+    def create(self, **kwargs):
+        return self.container
+
+
+class FakeClient:
+    def __init__(self, container):
+        self.containers = FakeContainers(container)
+        self.api = None
+
+    def info(self):
+        return {"ContainersRunning": 0, "NCPU": 2, "MemTotal": 8 * 1024 ** 3}
+
+
+def _serve_once(*chunks):
+    """A one-shot TCP server that sends `chunks` with pauses in between; returns its port."""
+    listener = socket.socket()
+    listener.bind(("127.0.0.1", 0))
+    listener.listen(1)
+
+    def serve():
+        connection, _ = listener.accept()
+        with connection, listener:
+            for chunk in chunks:
+                connection.sendall(chunk)
+                time.sleep(0.05)
+            time.sleep(0.5)
+
+    threading.Thread(target=serve, daemon=True).start()
+    return listener.getsockname()[1]
+
+
+def test_banner_split_across_packets_is_accepted():
+    port = _serve_once(b"SS", b"H-2.0-OpenSSH_9.6\r\n")
+    wait_for_ssh_banner(port, timeout=2, address="127.0.0.1")
+
+
+def test_a_non_ssh_listener_times_out():
+    port = _serve_once(b"HTTP/1.1 400 Bad Request\r\n")
+    with pytest.raises(TimeoutError):
+        wait_for_ssh_banner(port, timeout=0.5, address="127.0.0.1")
+
+
+def test_ssh_container_is_removed_when_sshd_never_answers(monkeypatch):
+    container = FakeDockerContainer()
+
+    def never_ready(port, timeout=None, address=None):
+        raise TimeoutError("sshd did not become ready")
+
+    monkeypatch.setattr(driver, "wait_for_ssh_banner", never_ready)
+    with pytest.raises(TimeoutError):
+        KaliContainer(owner=None, host=DockerHost("h1", FakeClient(container)))
+    assert container.removed
+
+
+def test_exec_container_is_removed_when_it_does_not_start():
+    container = FakeDockerContainer(status="exited")
+    with pytest.raises(Exception, match="failed to start"):
+        DockerExecContainer(owner=None, host=DockerHost("h1", FakeClient(container)))
+    assert container.removed
+
+
+def test_failed_creation_releases_the_host_slot():
+    container = FakeDockerContainer(status="exited")
+    host = DockerHost("h1", FakeClient(container), max_containers=2)
+    manager = KaliManager(backend="docker_exec", hosts=[host])
+    with pytest.raises(Exception):
+        manager.create_container()
+    assert host.placed == 0 and container.removed
@@ -0,0 +1,132 @@
+# kali_execution_server/tests/test_hosts.py
+import pytest
+
+from kali_driver.driver import KaliManager
+from kali_driver.hosts import CONTAINER_MEMORY_BYTES, MAX_HEALTH_FAILURES, DockerHost, HostScheduler, NoHostAvailable
+
+GIB = 1024 ** 3
+
+
+class FakeDockerClient:
+    """Answers the health and capacity queries HostScheduler makes; `down` simulates an unreachable daemon."""
+
+    def __init__(self, cpus=8, memory=32 * GIB, running=0):
+        self.cpus = cpus
+        self.memory = memory
+        self.running = running
+        self.down = False
+
+    def info(self) -> dict:
+        if self.down:
+            raise ConnectionError("daemon is down")
+        return {"ContainersRunning": self.running, "NCPU": self.cpus, "MemTotal": self.memory}
+
+    def ping(self) -> bool:
+        return not self.down
+
+
+def _scheduler(*hosts):
+    scheduler = HostScheduler(list(hosts))
+    scheduler.check(force=True)
+    return scheduler
+
+
+@pytest.mark.parametrize("cpus, memory, max_containers, capacity", [
+    (8, 32 * GIB, 0, 32),  # CPU bound: 4 per CPU.
+    (8, 2 * GIB, 0, 2 * GIB // CONTAINER_MEMORY_BYTES),  # Memory bound.
+    (2, 0, 0, 8),  # No memory reported: CPUs alone.
+    (1, 600 * 1024 ** 2, 0, 1),  # Room for a single container.
+    (8, 32 * GIB, 3, 3),  # An explicit limit wins.
+])
+def test_capacity_from_cpus_and_memory(cpus, memory, max_containers, capacity):
+    host = DockerHost("h1", FakeDockerClient(cpus, memory), max_containers=max_containers)
+    host.refresh()
+    assert host.capacity == capacity
+
+
+def test_pick_spreads_over_the_least_loaded_hosts():
+    busy = DockerHost("busy", FakeDockerClient(running=2), max_containers=4)
+    idle = DockerHost("idle", FakeDockerClient(), max_containers=4)
+    scheduler = _scheduler(busy, idle)
+    picks = [scheduler.pick().name for _ in range(4)]
+    assert picks == ["idle", "idle", "busy", "idle"]
+    assert (busy.placed, idle.placed) == (1, 3)
+
+
+def test_full_hosts_raise_until_a_slot_is_released():
+    host = DockerHost("h1", FakeDockerClient(), max_containers=2)
+    scheduler = _scheduler(host)
+    first, _ = scheduler.pick(), scheduler.pick()
+    with pytest.raises(NoHostAvailable):
+        scheduler.pick()
+    scheduler.release(first)
+    assert scheduler.pick() is host
+
+
+def test_release_after_a_refresh_frees_a_running_container():
+    client = FakeDockerClient()
+    host = DockerHost("h1", client, max_containers=2)
+    scheduler = _scheduler(host)
+    scheduler.pick()
+    client.running = 1
+    scheduler.check(force=True)
+    assert host.load() == 0.5
+    scheduler.release(host)
+    assert host.load() == 0.0 and host.placed == 0
+
+
+def test_unhealthy_host_is_skipped_and_recovers():
+    client = FakeDockerClient()
+    flaky = DockerHost("flaky", client, max_containers=4)
+    steady = DockerHost("steady", FakeDockerClient(running=3), max_containers=4)
+    scheduler = _scheduler(flaky, steady)
+    client.down = True
+    for _ in range(MAX_HEALTH_FAILURES - 1):
+        scheduler.check(force=True)
+    assert flaky.healthy and scheduler.pick() is flaky
+    scheduler.check(force=True)
+    assert not flaky.healthy and "ConnectionError" in flaky.last_error
+    assert scheduler.pick() is steady
+
+    client.down = False
+    scheduler.check(force=True)
+    assert flaky.healthy and flaky.failures == 0
+    assert scheduler.pick() is flaky
+
+
+def test_drained_host_gets_no_new_containers():
+    first = DockerHost("first", FakeDockerClient(), max_containers=4)
+    second = DockerHost("second", FakeDockerClient(running=3), max_containers=4)
+    scheduler = _scheduler(first, second)
+    scheduler.drain("first")
+    assert scheduler.pick() is second
+    with pytest.raises(NoHostAvailable):
+        scheduler.pick()
+    # Health checks don't undo a drain.
+    scheduler.check(force=True)
+    assert not first.schedulable
+    scheduler.drain("first", drained=False)
+    assert scheduler.pick() is first
+    with pytest.raises(KeyError):
+        scheduler.drain("missing")
+
+
+def test_checks_are_rate_limited():
+    client = FakeDockerClient()
+    host = DockerHost("h1", client)
+    scheduler = HostScheduler([host], check_interval=60)
+    scheduler.check()
+    client.running = 5
+    scheduler.check()
+    assert host.running == 0
+    scheduler.check(force=True)
+    assert host.running == 5
+
+
+def test_manager_refuses_to_start_when_no_host_answers():
+    client = FakeDockerClient()
+    client.down = True
+    with pytest.raises(NoHostAvailable):
+        KaliManager(backend="docker_exec", hosts=[DockerHost("h1", client)])
+    with pytest.raises(ValueError):
+        HostScheduler([])
@@ -0,0 +1,154 @@
+# kali_execution_server/tests/test_llm_gateway.py
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from llm.gateway import LlmGateway, PrioritySlots, routes_from_env
+
+
+class FakeCompletions:
+    """Records calls and holds each one until `release` is set, so tests can see what is in flight."""
+
+    def __init__(self):
+        self.calls = []
+        self.release = asyncio.Event()
+
+    async def create(self, model, messages, stream=False, **params):
+        self.calls.append({"model": model, "messages": messages, "stream": stream, **params})
+        await self.release.wait()
+        if stream:
+            return FakeStream(["a", "b"])
+        return f"{model}:{messages[-1]['content']}"
+
+
+class FakeStream:
+    def __init__(self, chunks):
+        self.chunks = list(chunks)
+        self.closed = False
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if not self.chunks:
+            raise StopAsyncIteration
+        return self.chunks.pop(0)
+
+    async def close(self):
+        self.closed = True
+
+
+def _gateway(concurrency=1, **env):
+    routes = routes_from_env(env, "base-model", "http://llm:11434/v1")
+    gateway = LlmGateway(routes, api_key="test", concurrency=concurrency)
+    completions = FakeCompletions()
+    for url in gateway._clients:
+        gateway._clients[url] = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+    return gateway, completions
+
+
+def _message(text):
+    return [{"role": "user", "content": text}]
+
+
+def test_routes_fall_back_to_the_defaults():
+    routes = routes_from_env({"LLM_FORMAT_MODEL": "small", "LLM_PLAN_BASE_URL": "http://big/v1"},
+                             "base-model", "http://llm/v1")
+    assert routes["format"].as_dict() == {"model": "small", "base_url": "http://llm/v1"}
+    assert routes["plan"].as_dict() == {"model": "base-model", "base_url": "http://big/v1"}
+    assert routes["think"].as_dict() == {"model": "base-model", "base_url": "http://llm/v1"}
+
+
+def test_unknown_roles_are_refused():
+    gateway, _ = _gateway()
+    with pytest.raises(ValueError):
+        gateway.route("summarize")
+
+
+def test_slots_admit_by_priority_then_arrival():
+    async def scenario():
+        slots = PrioritySlots(1)
+        order = []
+        await slots.acquire(0)
+
+        async def waiter(name, priority):
+            await slots.acquire(priority)
+            order.append(name)
+            slots.release()
+
+        tasks = [asyncio.ensure_future(waiter(name, priority))
+                 for name, priority in (("format", 2), ("speculate", 3), ("think", 1), ("format2", 2))]
+        await asyncio.sleep(0)
+        assert slots.queued == 4
+        slots.release()
+        await asyncio.gather(*tasks)
+        assert (slots.in_use, slots.queued) == (0, 0)
+        return order
+
+    assert asyncio.run(scenario()) == ["think", "format", "format2", "speculate"]
+
+
+def test_a_cancelled_waiter_gives_up_its_place():
+    async def scenario():
+        slots = PrioritySlots(1)
+        await slots.acquire(0)
+        cancelled = asyncio.ensure_future(slots.acquire(0))
+        admitted = asyncio.ensure_future(slots.acquire(1))
+        await asyncio.sleep(0)
+        cancelled.cancel()
+        await asyncio.sleep(0)
+        slots.release()
+        await admitted
+        assert slots.in_use == 1
+        slots.release()
+        assert slots.in_use == 0
+
+    asyncio.run(scenario())
+
+
+def test_identical_requests_in_flight_share_one_call():
+    async def scenario():
+        gateway, completions = _gateway()
+        calls = [asyncio.ensure_future(gateway.complete("format", _message("same"), temperature=0, timeout=timeout))
+                 for timeout in (10, 20, 30)]
+        other = asyncio.ensure_future(gateway.complete("format", _message("different"), temperature=0))
+        await asyncio.sleep(0.01)
+        completions.release.set()
+        results = await asyncio.gather(*calls, other)
+        assert results == ["base-model:same"] * 3 + ["base-model:different"]
+        assert len(completions.calls) == 2
+        assert gateway.stats()["roles"]["format"] == {"requests": 4, "coalesced": 2, "streams": 0}
+        # Once finished, the same request goes upstream again.
+        await gateway.complete("format", _message("same"), temperature=0)
+        assert len(completions.calls) == 3
+
+    asyncio.run(scenario())
+
+
+def test_concurrency_is_limited_per_backend():
+    async def scenario():
+        gateway, completions = _gateway(concurrency=2)
+        calls = [asyncio.ensure_future(gateway.complete("think", _message(str(n)))) for n in range(5)]
+        await asyncio.sleep(0.01)
+        assert (gateway.in_flight(), gateway.queued()) == (2, 3)
+        completions.release.set()
+        await asyncio.gather(*calls)
+        assert (gateway.in_flight(), gateway.queued()) == (0, 0)
+
+    asyncio.run(scenario())
+
+
+def test_streams_hold_a_slot_until_they_end():
+    async def scenario():
+        gateway, completions = _gateway()
+        completions.release.set()
+        chunks = []
+        async for chunk in gateway.stream("plan", _message("plan it")):
+            chunks.append(chunk)
+            assert gateway.in_flight() == 1
+        assert chunks == ["a", "b"]
+        assert gateway.in_flight() == 0
+        assert completions.calls[0]["stream"] is True
+
+    asyncio.run(scenario())
@@ -0,0 +1,75 @@
+# kali_execution_server/tests/test_observation_cache.py
+import pytest
+
+from formatting.cache import ObservationCache, cache_key, normalize_output
+
+OBSERVATION = {"status": "SUCCESS", "key_finding": "Port 22 open", "full_output": "22/tcp open ssh"}
+
+
+@pytest.mark.parametrize("first, second", [
+    ("Starting Nmap at 2024-05-01 10:00 UTC\n22/tcp open", "Starting Nmap at 2025-01-09 23:59 UTC\n22/tcp open"),
+    ("Host is up (0.012s latency).", "Host is up (0.300s latency)."),
+    ("64 bytes: icmp_seq=1 ttl=64 time=0.321 ms", "64 bytes: icmp_seq=7 ttl=64 time=1.5 ms"),
+    (";; Query time: 12 msec", ";; Query time: 80 msec"),
+    ("22/tcp open  \n", "22/tcp open"),
+])
+def test_volatile_output_normalizes_equal(first, second):
+    assert normalize_output(first) == normalize_output(second)
+    assert cache_key("nmap  host", first) == cache_key("nmap host", second)
+
+
+@pytest.mark.parametrize("command, first, second", [
+    ("nmap host", "22/tcp open", "80/tcp open"),
+    ("ping -c 1 host", "1 received, 0% packet loss", "0 received, 100% packet loss"),
+])
+def test_different_results_get_different_keys(command, first, second):
+    assert cache_key(command, first) != cache_key(command, second)
+
+
+def test_memory_round_trip_returns_copies():
+    cache = ObservationCache()
+    assert cache.get("nmap host", "22/tcp open") is None
+    cache.put("nmap host", "22/tcp open", OBSERVATION)
+    hit = cache.get("nmap host", "22/tcp open")
+    assert hit == OBSERVATION
+    hit["status"] = "FAILURE"
+    assert cache.get("nmap host", "22/tcp open")["status"] == "SUCCESS"
+    stats = cache.stats()
+    assert (stats["memory_hits"], stats["misses"], stats["stores"]) == (2, 1, 1)
+
+
+def test_lru_evicts_the_least_recently_used():
+    cache = ObservationCache(max_entries=2)
+    for output in ("a", "b"):
+        cache.put("cmd", output, OBSERVATION)
+    cache.get("cmd", "a")
+    cache.put("cmd", "c", OBSERVATION)
+    assert cache.get("cmd", "b") is None
+    assert cache.get("cmd", "a") is not None
+    assert cache.stats()["evictions"] == 1
+
+
+def test_expired_entries_miss():
+    cache = ObservationCache(ttl=-1)
+    cache.put("cmd", "out", OBSERVATION)
+    assert cache.get("cmd", "out") is None
+
+
+def test_disk_cache_survives_a_restart(tmp_path):
+    db_path = str(tmp_path / "observations.db")
+    first = ObservationCache(db_path=db_path)
+    first.put("whois example.com", "Registrar: X", OBSERVATION)
+    first.close()
+    second = ObservationCache(db_path=db_path)
+    assert second.get("whois example.com", "Registrar: X") == OBSERVATION
+    assert second.stats()["disk_hits"] == 1
+    second.close()
+
+
+def test_disk_cache_is_capped(tmp_path):
+    cache = ObservationCache(max_entries=1, db_path=str(tmp_path / "observations.db"), db_max_entries=2)
+    for output in ("a", "b", "c"):
+        cache.put("cmd", output, OBSERVATION)
+    rows = cache._db.execute("SELECT COUNT(*) FROM observations").fetchone()[0]
+    assert rows == 2
+    cache.close()
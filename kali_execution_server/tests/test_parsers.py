@@ -0,0 +1,140 @@
+# kali_execution_server/tests/test_parsers.py
+import pytest
+
+from formatting.parsers import CommandInvocation, build_default_registry
+
+NMAP_NORMAL = """Starting Nmap 7.94 ( https://nmap.org ) at 2024-05-01 10:00 UTC
+Nmap scan report for scanme.example (10.0.0.5)
+Host is up (0.012s latency).
+PORT   STATE  SERVICE VERSION
+22/tcp open   ssh     OpenSSH 8.9p1 Ubuntu
+80/tcp open   http    Apache httpd 2.4.52
+443/tcp closed https
+Nmap done: 1 IP address (1 host up) scanned in 5.20 seconds"""
+
+NMAP_NO_PORTS = """Nmap scan report for 10.0.0.6
+Host is up (0.001s latency).
+All 1000 scanned ports on 10.0.0.6 are closed
+Nmap done: 1 IP address (1 host up) scanned in 0.50 seconds"""
+
+NMAP_DOWN = "Note: Host seems down. If it is really up, but blocking our ping probes, try -Pn\nNmap done: 1 IP address (0 hosts up)"
+
+NMAP_GREPABLE = """# Nmap 7.94 scan initiated as: nmap -oG - 10.0.0.7
+Host: 10.0.0.7 ()\tStatus: Up
+Host: 10.0.0.7 ()\tPorts: 21/open/tcp//ftp//vsftpd 3.0.3/, 25/closed/tcp//smtp///\tIgnored State: closed (998)
+# Nmap done"""
+
+NMAP_XML = """<?xml version="1.0"?>
+<nmaprun scanner="nmap">
+<host><status state="up"/><address addr="10.0.0.8" addrtype="ipv4"/>
+<ports><port protocol="tcp" portid="3306"><state state="open"/><service name="mysql" product="MySQL" version="8.0.36"/></port>
+<port protocol="tcp" portid="8080"><state state="filtered"/><service name="http-proxy"/></port></ports></host>
+</nmaprun>"""
+
+DIG_ANSWER = """; <<>> DiG 9.18 <<>> example.com A
+;; ->>HEADER<<- opcode: QUERY, status: NOERROR, id: 1234
+;; ANSWER SECTION:
+example.com.\t\t300\tIN\tA\t93.184.216.34
+
+;; Query time: 12 msec"""
+
+DIG_NXDOMAIN = ";; ->>HEADER<<- opcode: QUERY, status: NXDOMAIN, id: 99\n;; AUTHORITY SECTION:\n"
+
+DIG_NO_ANSWER = ";; ->>HEADER<<- opcode: QUERY, status: NOERROR, id: 7\n;; AUTHORITY SECTION:\nexample.com. 60 IN SOA ns. host. 1 2 3 4 5\n"
+
+WHOIS_RECORD = """Domain Name: EXAMPLE.COM
+Registrar: Example Registrar, Inc.
+Creation Date: 1995-08-14T04:00:00Z
+Registry Expiry Date: 2030-08-13T04:00:00Z
+Name Server: A.IANA-SERVERS.NET
+Name Server: b.iana-servers.net"""
+
+CURL_REDIRECTS = """HTTP/1.1 301 Moved Permanently
+Location: https://example.com/
+
+HTTP/2 200
+server: nginx/1.25.3
+x-powered-by: PHP/8.2"""
+
+PING_OK = """PING 10.0.0.5 (10.0.0.5) 56(84) bytes of data.
+64 bytes from 10.0.0.5: icmp_seq=1 ttl=64 time=0.321 ms
+
+--- 10.0.0.5 ping statistics ---
+3 packets transmitted, 3 received, 0% packet loss, time 2003ms
+rtt min/avg/max/mdev = 0.300/0.321/0.350/0.020 ms"""
+
+PING_LOSS = "--- 10.0.0.9 ping statistics ---\n3 packets transmitted, 0 received, 100% packet loss, time 2040ms"
+
+
+# (command, raw output, exit code, expected status or None for the LLM fallback, text expected in key_finding)
+CASES = [
+    ("nmap -sV scanme.example", NMAP_NORMAL, 0, "SUCCESS", "22/tcp ssh (OpenSSH 8.9p1 Ubuntu)"),
+    ("nmap -sV scanme.example", NMAP_NORMAL, 0, "SUCCESS", "80/tcp http (Apache httpd 2.4.52)"),
+    ("nmap 10.0.0.6", NMAP_NO_PORTS, 0, "SUCCESS", "no open ports"),
+    ("nmap 10.0.0.99", NMAP_DOWN, 0, "SUCCESS", "appears to be down"),
+    ("nmap -oG - 10.0.0.7", NMAP_GREPABLE, 0, "SUCCESS", "21/tcp ftp (vsftpd 3.0.3)"),
+    ("nmap -oX - 10.0.0.8", NMAP_XML, 0, "SUCCESS", "3306/tcp mysql (MySQL 8.0.36)"),
+    ("nmap nosuch.invalid", "Failed to resolve \"nosuch.invalid\".", 0, "FAILURE", "could not resolve"),
+    ("timeout -s KILL 60 nmap -sV scanme.example", NMAP_NORMAL, 0, "SUCCESS", "Open ports found"),
+    ("dig example.com A", DIG_ANSWER, 0, "SUCCESS", "A 93.184.216.34"),
+    ("dig nosuch.example", DIG_NXDOMAIN, 0, "FAILURE", "NXDOMAIN"),
+    ("dig example.com MX", DIG_NO_ANSWER, 0, "SUCCESS", "no answer records"),
+    ("dig +short example.com", "93.184.216.34\n", 0, "SUCCESS", "93.184.216.34"),
+    ("dig +short nosuch.example", "", 0, "SUCCESS", "no output"),
+    ("dig example.com", ";; connection timed out; no servers could be reached", 9, "FAILURE", "timed out"),
+    ("whois example.com", WHOIS_RECORD, 0, "SUCCESS", "name servers a.iana-servers.net, b.iana-servers.net"),
+    ("whois nosuch.example", "No match for \"NOSUCH.EXAMPLE\".", 1, "FAILURE", "no registration record"),
+    ("curl -sIL http://example.com", CURL_REDIRECTS, 0, "SUCCESS", "HTTP 200, server: nginx/1.25.3, powered by: PHP/8.2"),
+    ("curl -I http://10.0.0.5", "--- STDERR ---\ncurl: (7) Failed to connect to 10.0.0.5 port 80", 7, "FAILURE",
+     "Failed to connect"),
+    ("ping -c 3 10.0.0.5", PING_OK, 0, "SUCCESS", "3/3 replies, 0% packet loss, average RTT 0.321 ms"),
+    ("ping -c 3 10.0.0.9", PING_LOSS, 1, "FAILURE", "100% packet loss"),
+    ("ping -c 1 nosuch.example", "ping: nosuch.example: Name or service not known", 2, "FAILURE", "could not resolve"),
+    ("gobuster dir -u http://x", "--- STDERR ---\nbash: line 1: gobuster: command not found", 127, "FAILURE",
+     "`gobuster` is not installed"),
+    ("grep secret /etc/hosts", "", 1, "SUCCESS", "code 1 (no match)"),
+    ("grep secret /nope", "--- STDERR ---\ngrep: /nope: No such file or directory", 2, "FAILURE", "exited with code 2"),
+    ("touch /tmp/x", "", 0, "SUCCESS", "no output"),
+    # Output the parsers don't recognise goes to the LLM formatter.
+    ("nikto -h 10.0.0.5", "- Nikto v2.5.0\n+ Target IP: 10.0.0.5", 0, None, None),
+    ("dig example.com | grep A", "example.com. 300 IN A 93.184.216.34", 0, None, None),
+]
+
+
+@pytest.mark.parametrize("command, raw_output, exit_code, status, finding", CASES)
+def test_default_registry(command, raw_output, exit_code, status, finding):
+    observation = build_default_registry().parse(command, raw_output, exit_code)
+    if status is None:
+        assert observation is None
+        return
+    assert observation is not None
+    assert observation.status == status
+    assert finding in observation.key_finding
+    assert observation.full_output == raw_output
+
+
+# (command, program, args, is_compound, has_redirect)
+INVOCATIONS = [
+    ("nmap -sV 10.0.0.5", "nmap", ["-sV", "10.0.0.5"], False, False),
+    ("sudo nmap -F host", "nmap", ["-F", "host"], False, False),
+    ("LANG=C timeout 30 dig x", "dig", ["x"], False, False),
+    ("timeout -s KILL 60 nmap a", "nmap", ["a"], False, False),
+    ("timeout -k 5 --signal=TERM 30 curl -I u", "curl", ["-I", "u"], False, False),
+    ("/usr/bin/whois example.com", "whois", ["example.com"], False, False),
+    ("dig x | grep A", None, [], True, False),
+    ("dig x && whois x", None, [], True, False),
+    ("nmap a > scan.txt", "nmap", ["a", ">", "scan.txt"], False, True),
+    ("nmap a 2>/dev/null", "nmap", ["a", "2", ">", "/dev/null"], False, False),
+    ("nmap a 2>&1", "nmap", ["a", "2", ">&", "1"], False, False),
+    ("grep x < list.txt", "grep", ["x", "<", "list.txt"], False, True),
+    ("echo 'unterminated", None, [], False, False),
+]
+
+
+@pytest.mark.parametrize("command, program, args, is_compound, has_redirect", INVOCATIONS)
+def test_command_invocation(command, program, args, is_compound, has_redirect):
+    invocation = CommandInvocation(command)
+    assert invocation.program == program
+    assert invocation.args == args
+    assert invocation.is_compound == is_compound
+    assert invocation.has_redirect == has_redirect
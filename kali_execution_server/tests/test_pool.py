@@ -0,0 +1,144 @@
+# kali_execution_server/tests/test_pool.py
+import time
+
+import pytest
+
+from kali_driver.pool import ContainerPool
+
+
+class FakeContainer:
+    def __init__(self, host=None):
+        self.host = host
+        self.healthy = True
+        self.reset_fails = False
+        self.resets = 0
+        self.last_used = time.monotonic()
+
+    def warm_up(self):
+        self.last_used = time.monotonic()
+
+    def is_healthy(self) -> bool:
+        return self.healthy
+
+    def reset(self):
+        if self.reset_fails:
+            raise RuntimeError("reset failed")
+        self.resets += 1
+
+
+class FakeManager:
+    def __init__(self):
+        self.created = []
+        self.destroyed = []
+
+    def create_container(self):
+        container = FakeContainer()
+        self.created.append(container)
+        return container
+
+    def destroy_container(self, container):
+        self.destroyed.append(container)
+
+    def check_hosts(self):
+        pass
+
+
+@pytest.fixture
+def manager():
+    return FakeManager()
+
+
+def _pool(manager, idle, **kwargs):
+    pool = ContainerPool(manager, **kwargs)
+    pool._idle.extend(idle)
+    return pool
+
+
+def test_pool_sizes_are_validated(manager):
+    with pytest.raises(ValueError):
+        ContainerPool(manager, min_warm=3, max_warm=2)
+
+
+def test_acquire_hands_out_a_warm_container(manager):
+    warm = FakeContainer()
+    pool = _pool(manager, [warm])
+    assert pool.acquire() is warm
+    assert manager.created == []
+    assert pool.stats()["idle"] == 0
+
+
+def test_acquire_boots_when_the_pool_is_empty(manager):
+    pool = _pool(manager, [])
+    container = pool.acquire()
+    assert manager.created == [container]
+    assert pool.stats()["boot_seconds_avg"] >= 0
+
+
+def test_acquire_discards_dead_containers(manager):
+    dead, alive = FakeContainer(), FakeContainer()
+    dead.healthy = False
+    pool = _pool(manager, [dead, alive])
+    assert pool.acquire() is alive
+    assert manager.destroyed == [dead]
+
+
+def test_release_resets_and_keeps_the_container(manager):
+    container = FakeContainer()
+    pool = _pool(manager, [])
+    pool.release(container)
+    assert container.resets == 1
+    assert list(pool._idle) == [container]
+
+
+@pytest.mark.parametrize("reset_fails, healthy", [(True, True), (False, False)])
+def test_release_destroys_unusable_containers(manager, reset_fails, healthy):
+    container = FakeContainer()
+    container.reset_fails, container.healthy = reset_fails, healthy
+    pool = _pool(manager, [])
+    pool.release(container)
+    assert manager.destroyed == [container]
+    assert not pool._idle
+
+
+def test_release_beyond_max_warm_destroys(manager):
+    pool = _pool(manager, [FakeContainer(), FakeContainer()], min_warm=0, max_warm=2)
+    extra = FakeContainer()
+    pool.release(extra)
+    assert manager.destroyed == [extra]
+
+
+def test_reap_finds_expired_containers_behind_a_fresh_one(manager):
+    now = time.monotonic()
+    fresh, stale_a, stale_b = FakeContainer(), FakeContainer(), FakeContainer()
+    stale_a.last_used, stale_b.last_used = now - 1000, now - 2000
+    pool = _pool(manager, [fresh, stale_a, stale_b], min_warm=1, max_warm=5, idle_ttl=600)
+    pool._reap_idle()
+    assert manager.destroyed == [stale_b, stale_a]
+    assert list(pool._idle) == [fresh]
+
+
+def test_reap_keeps_min_warm_and_the_most_recent(manager):
+    now = time.monotonic()
+    containers = [FakeContainer() for _ in range(3)]
+    for age, container in zip((900, 3000, 700), containers):
+        container.last_used = now - age
+    pool = _pool(manager, containers, min_warm=2, max_warm=5, idle_ttl=600)
+    pool._reap_idle()
+    assert manager.destroyed == [containers[1]]
+    assert list(pool._idle) == [containers[0], containers[2]]
+
+
+def test_refill_boots_up_to_min_warm(manager):
+    pool = _pool(manager, [FakeContainer()], min_warm=3, max_warm=5)
+    pool._refill()
+    assert len(manager.created) == 2
+    assert pool.stats()["idle"] == 3
+    pool._refill()
+    assert len(manager.created) == 2
+
+
+def test_shutdown_destroys_idle_containers(manager):
+    idle = [FakeContainer(), FakeContainer()]
+    pool = _pool(manager, list(idle))
+    pool.shutdown()
+    assert manager.destroyed == idle
@@ -0,0 +1,69 @@
+# kali_execution_server/tests/test_reduction.py
+import pytest
+
+from formatting.reduction import OutputReducer, reduce_output, salience
+
+
+def _scan_output(noise_lines: int) -> str:
+    lines = ["Starting scan of 10.0.0.5"]
+    for index in range(noise_lines):
+        lines.append(f"Progress: {index}/{noise_lines} (0.{index % 10}%)")
+        lines.append(f"checked path /dir{index} size {index * 7}")
+        if index == noise_lines // 2:
+            lines.append("80/tcp open http Apache httpd 2.4.49")
+            lines.append("| VULNERABLE: CVE-2021-41773 path traversal")
+    lines.append("Scan finished: 1 host scanned")
+    return "\n".join(lines)
+
+
+@pytest.mark.parametrize("line, expected", [
+    ("22/tcp open ssh", 5),
+    ("CVE-2021-41773", 5),
+    ("Connection refused", 2),
+    ("just some text", 0),
+    ("Progress: 10%", 0),
+])
+def test_salience(line, expected):
+    assert salience(line) == expected
+
+
+@pytest.mark.parametrize("budget", [300, 800, 2000])
+def test_reduction_respects_budget_and_keeps_findings(budget):
+    raw = _scan_output(2000)
+    reduced = reduce_output(raw, budget)
+    assert len(reduced) <= budget
+    assert "80/tcp open http Apache httpd 2.4.49" in reduced
+    assert "CVE-2021-41773" in reduced
+    assert "Scan finished" in reduced
+    assert "Progress:" not in reduced
+
+
+@pytest.mark.parametrize("raw", [
+    "",
+    "short output",
+    "line one\nline two\n",
+])
+def test_output_within_budget_is_unchanged(raw):
+    assert reduce_output(raw, 100) == raw
+
+
+def test_incremental_feed_matches_single_feed():
+    raw = _scan_output(500)
+    whole = OutputReducer(600)
+    whole.feed(raw)
+    pieces = OutputReducer(600)
+    for start in range(0, len(raw), 37):
+        pieces.feed(raw[start:start + 37])
+    assert pieces.result() == whole.result()
+
+
+def test_repeats_and_redrawn_lines_are_dropped():
+    reducer = OutputReducer(2000)
+    reducer.feed("".join(f"retrying request {index}\n" for index in range(50)))
+    reducer.feed("downloading\r 50%\rdone: 3 files\n")
+    reduced = reducer.result()
+    assert reduced.count("retrying request") == 1
+    assert "done: 3 files" in reduced
+    assert "50%" not in reduced
+    assert reducer.lines_total == 51
+    assert reducer.lines_dropped == 49
@@ -0,0 +1,59 @@
+# kali_execution_server/tests/test_result_cache.py
+import pytest
+
+from formatting.parsers import CommandInvocation
+from formatting.result_cache import ResultCache, writes_files
+
+SUCCESS = {"status": "SUCCESS", "key_finding": "ok", "full_output": "ok"}
+
+
+@pytest.mark.parametrize("command, expected", [
+    ("nmap -sV 10.0.0.5", False),
+    ("nmap -oX - 10.0.0.5", False),
+    ("nmap -oG - 10.0.0.5", False),
+    ("curl -o - http://x", False),
+    ("curl -sI http://x", False),
+    ("dig example.com 2>/dev/null", False),
+    ("nmap -oN scan.txt 10.0.0.5", True),
+    ("nmap -oA base 10.0.0.5", True),
+    ("nmap -F -oN/tmp/x 10.0.0.5", True),
+    ("curl -so /root/x http://x", True),
+    ("curl --output=/tmp/x http://x", True),
+    ("curl -O http://x/file", True),
+    ("curl --remote-name http://x/file", True),
+    ("curl -c jar.txt http://x", True),
+    ("curl -D headers.txt http://x", True),
+    ("whatweb --log-brief=/root/x http://x", True),
+    ("nmap 10.0.0.5 > scan.txt", True),
+])
+def test_writes_files(command, expected):
+    assert writes_files(CommandInvocation(command)) == expected
+
+
+@pytest.mark.parametrize("command, cached", [
+    ("whois example.com", True),
+    ("sudo whois example.com", True),
+    ("nmap -oN scan.txt 10.0.0.5", False),
+    ("dig x | grep A", False),
+    ("rm -rf /tmp/x", False),
+])
+def test_result_cache_round_trip(command, cached):
+    cache = ResultCache()
+    cache.put(command, SUCCESS)
+    hit = cache.get(command)
+    assert (hit is not None) == cached
+    if cached:
+        assert hit["cached"] is True
+        assert cache.get(command, bypass=True) is None
+
+
+def test_failures_are_not_cached():
+    cache = ResultCache()
+    cache.put("whois example.com", {**SUCCESS, "status": "FAILURE"})
+    assert cache.get("whois example.com") is None
+
+
+def test_wrappers_share_a_cache_entry():
+    cache = ResultCache()
+    cache.put("whois example.com", SUCCESS)
+    assert cache.get("sudo  whois   example.com") is not None
@@ -0,0 +1,73 @@
+# kali_execution_server/tests/test_server_stream.py
+import os
+import json
+import importlib
+
+import pytest
+from fastapi.testclient import TestClient
+
+PORTS = range(1, 201)
+NMAP_XML = ('<?xml version="1.0"?>\n<nmaprun scanner="nmap">\n'
+            '<host><status state="up"/><address addr="10.0.0.8" addrtype="ipv4"/>\n<ports>\n'
+            + "".join(f'<port protocol="tcp" portid="{port}"><state state="{"open" if port % 50 == 0 else "closed"}"/>'
+                      f'<service name="svc{port}" product="Daemon" version="1.{port}"/></port>\n' for port in PORTS)
+            + "</ports></host>\n</nmaprun>\n")
+
+
+class ScriptedContainer:
+    """Streams a fixed output in small chunks, like a long-running tool."""
+    host = None
+
+    def __init__(self, output: str):
+        self.output = output
+
+    def stream_command(self, command, timeout=None):
+        for start in range(0, len(self.output), 512):
+            yield "stdout", self.output[start:start + 512]
+        yield "exit", 0
+
+
+@pytest.fixture(scope="module")
+def server(tmp_path_factory):
+    root = tmp_path_factory.mktemp("server")
+    env = {"KALI_BACKEND": "local", "ARTIFACT_DIR": str(root / "artifacts"), "ARTIFACT_SPILL_CHARS": "2000",
+           "KALI_POOL_MIN_WARM": "0", "FORMAT_CACHE_DB": ""}
+    saved = {name: os.environ.get(name) for name in env}
+    os.environ.update(env)
+    try:
+        yield importlib.import_module("kali_server")
+    finally:
+        for name, value in saved.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+
+
+def _stream(server, output: str, command: str) -> dict:
+    server.active_sessions["s1"] = server.Session(ScriptedContainer(output))
+    try:
+        response = TestClient(server.app).post("/session/execute/stream",
+                                               json={"session_id": "s1", "command": command, "no_cache": True})
+    finally:
+        server.active_sessions.pop("s1", None)
+    frames = [frame for frame in response.text.split("\n\n") if frame.startswith("event: observation")]
+    return json.loads(frames[0].split("data: ", 1)[1])
+
+
+def test_spilled_nmap_xml_is_parsed_from_the_whole_output(server):
+    assert len(NMAP_XML) > 2000
+    observation = _stream(server, NMAP_XML, "nmap -oX - 10.0.0.8")
+    assert observation["status"] == "SUCCESS"
+    for port in (50, 100, 150, 200):
+        assert f"{port}/tcp svc{port} (Daemon 1.{port})" in observation["key_finding"]
+    assert observation["full_output_truncated"]
+    assert server.artifact_store.read_range(observation["artifact"]["id"], 0, len(NMAP_XML)).decode() == NMAP_XML
+
+
+def test_small_streamed_output_is_returned_whole(server):
+    output = "PING 10.0.0.5\n\n--- 10.0.0.5 ping statistics ---\n1 packets transmitted, 1 received, 0% packet loss\n"
+    observation = _stream(server, output, "ping -c 1 10.0.0.5")
+    assert observation["status"] == "SUCCESS"
+    assert observation["full_output"] == output.strip()
+    assert "artifact" not in observation
@@ -0,0 +1,84 @@
+# kali_execution_server/transport/encoding.py
+import gzip
+import json
+from typing import Dict, Optional, Set
+
+from fastapi import Request
+from fastapi.responses import Response
+
+# Both are optional: without them the server simply falls back to JSON and gzip.
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+MSGPACK_MEDIA_TYPE = "application/msgpack"
+JSON_MEDIA_TYPE = "application/json"
+
+
+def _accepted(header: str) -> Set[str]:
+    """Tokens from an Accept/Accept-Encoding header, minus any the client refused with q=0."""
+    tokens = set()
+    for part in header.split(","):
+        token, *params = [piece.strip() for piece in part.split(";")]
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if token and quality > 0:
+            tokens.add(token.lower())
+    return tokens
+
+
+class ResponseEncoder:
+    """
+    Negotiates the wire format of observation responses: msgpack for large payloads when the client
+    asks for it, then zstd or gzip compression above a size threshold. SSE streams are not routed
+    through here, since compressing them would buffer the frames the agent is waiting on.
+    """
+
+    def __init__(self, min_compress_bytes: int = 1024, msgpack_min_bytes: int = 4096,
+                 gzip_level: int = 5, zstd_level: int = 3):
+        self.min_compress_bytes = min_compress_bytes
+        self.msgpack_min_bytes = msgpack_min_bytes
+        self.gzip_level = gzip_level
+        self._zstd = zstandard.ZstdCompressor(level=zstd_level) if zstandard else None
+        self._counts: Dict[str, int] = {"json": 0, "msgpack": 0, "gzip": 0, "zstd": 0, "identity": 0}
+        self._bytes = {"raw": 0, "sent": 0}
+
+    def encode(self, request: Request, payload, headers: Optional[Dict[str, str]] = None) -> Response:
+        body = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+        media_type = JSON_MEDIA_TYPE
+        if msgpack and len(body) >= self.msgpack_min_bytes \
+                and MSGPACK_MEDIA_TYPE in _accepted(request.headers.get("accept", "")):
+            body = msgpack.packb(payload, use_bin_type=True)
+            media_type = MSGPACK_MEDIA_TYPE
+        self._counts["msgpack" if media_type == MSGPACK_MEDIA_TYPE else "json"] += 1
+        raw_size = len(body)
+
+        headers = {**(headers or {}), "Vary": "Accept, Accept-Encoding"}
+        coding = "identity"
+        if raw_size >= self.min_compress_bytes:
+            codings = _accepted(request.headers.get("accept-encoding", ""))
+            if self._zstd and "zstd" in codings:
+                body, coding = self._zstd.compress(body), "zstd"
+            elif "gzip" in codings:
+                body, coding = gzip.compress(body, compresslevel=self.gzip_level), "gzip"
+        if coding != "identity":
+            headers["Content-Encoding"] = coding
+        self._counts[coding] += 1
+        self._bytes["raw"] += raw_size
+        self._bytes["sent"] += len(body)
+        return Response(content=body, media_type=media_type, headers=headers)
+
+    def stats(self) -> dict:
+        return {"encodings": dict(self._counts), "raw_bytes": self._bytes["raw"], "sent_bytes": self._bytes["sent"],
+                "msgpack_available": msgpack is not None, "zstd_available": zstandard is not None}
@@ -2,7 +2,6 @@
 import os
 import argparse
 from dotenv import load_dotenv
-from agent.task_manager import TaskManager
 
 
 def main():
@@ -12,16 +11,55 @@ def main():
         return
 
     parser = argparse.ArgumentParser(description="DawnYawn Autonomous Agent")
-    parser.add_argument("goal", type=str, help="The high-level goal for the agent.")
+    parser.add_argument("goal", type=str, nargs="?", help="The high-level goal for the agent.")
+    parser.add_argument("--batch", metavar="GOALS_JSONL",
+                        help="Run every goal in a JSONL file ({\"goal\": ...} per line) with auto-approval.")
+    parser.add_argument("--concurrency", type=int, default=4, help="Missions to run at the same time in batch mode.")
+    parser.add_argument("--max-sessions", type=int, default=None,
+                        help="Execution-server sessions shared by batch missions (defaults to --concurrency).")
+    parser.add_argument("--report-dir", default="reports", help="Where batch mode writes per-mission reports.")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Re-run every command instead of reusing recent results cached by the server.")
+    parser.add_argument("--speculate", action="store_true",
+                        help="Pre-run likely read-only recon commands while the model decides the next step.")
+    parser.add_argument("--max-steps", type=int, default=None,
+                        help="Steps a mission may take before stopping (default: MAX_MISSION_STEPS, else 10).")
+    parser.add_argument("--refresh-plan", action="store_true",
+                        help="Generate a fresh plan even if a cached plan fits the goal, and cache it in its place.")
+    parser.add_argument("--resume", metavar="MISSION_ID",
+                        help="Continue an interrupted mission from its journal without re-running finished commands.")
     args = parser.parse_args()
+    if not args.goal and not args.batch and not args.resume:
+        parser.error("provide a goal, --batch GOALS_JSONL or --resume MISSION_ID")
 
     print("--- DawnYawn Agent Initializing ---")
     print("--- Using Local LLM:", os.getenv("LLM_MODEL"), "---")
     print("⚠️  SECURITY WARNING: This agent executes AI-generated commands on a remote server.")
 
-    task_manager = TaskManager(goal=args.goal)
+    # The agent (openai, pydantic, requests) is only imported once the arguments are known to be valid,
+    # so --help and usage errors return immediately.
+    if args.batch:
+        from agent.batch_runner import BatchRunner
+        BatchRunner(args.batch, concurrency=args.concurrency, report_dir=args.report_dir,
+                    max_sessions=args.max_sessions or args.concurrency, use_result_cache=not args.no_cache,
+                    speculate=args.speculate, max_steps=args.max_steps, refresh_plan=args.refresh_plan).run()
+        return
+
+    from agent.task_manager import TaskManager
+    if args.resume:
+        try:
+            task_manager = TaskManager.resume(args.resume, use_result_cache=not args.no_cache,
+                                               speculate=args.speculate, max_steps=args.max_steps)
+        except (FileNotFoundError, ValueError) as e:
+            print(f"FATAL ERROR: Cannot resume mission: {e}")
+            return
+        task_manager.run()
+        return
+
+    task_manager = TaskManager(goal=args.goal, use_result_cache=not args.no_cache, speculate=args.speculate,
+                               max_steps=args.max_steps, refresh_plan=args.refresh_plan)
     task_manager.run()
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
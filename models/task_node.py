@@ -1,6 +1,6 @@
 # dawnyawn/models/task_node.py
 from pydantic import BaseModel, Field
-from typing import Optional
+from typing import List, Optional
 from enum import Enum
 
 class TaskStatus(str, Enum):
@@ -13,6 +13,7 @@ class TaskNode(BaseModel):
     """Represents a single execution unit or step in a plan."""
     task_id: int
     description: str
+    dependencies: List[int] = Field(default_factory=list, description="task_ids that must finish before this step.")
     status: TaskStatus = TaskStatus.PENDING
     tool_used: Optional[str] = None
     tool_input: Optional[str] = None
@@ -20,4 +21,19 @@ class TaskNode(BaseModel):
     summary: Optional[str] = None
 
     class Config:
-        use_enum_values = True
\ No newline at end of file
+        use_enum_values = True
+
+
+def plan_stages(plan: List[TaskNode]) -> List[List[TaskNode]]:
+    """
+    Orders the plan's DAG into stages: every step sits one stage after its latest prerequisite, so the
+    steps of a stage depend only on earlier stages and can run at the same time.
+    """
+    depth = {}
+    for task in sorted(plan, key=lambda task: task.task_id):
+        # Prerequisites are always earlier steps (see AgentScheduler); unknown IDs are ignored.
+        depth[task.task_id] = 1 + max((depth[dep] for dep in task.dependencies if dep in depth), default=0)
+    stages: List[List[TaskNode]] = [[] for _ in range(max(depth.values(), default=0))]
+    for task in sorted(plan, key=lambda task: task.task_id):
+        stages[depth[task.task_id] - 1].append(task)
+    return stages
\ No newline at end of file
@@ -1,5 +1,6 @@
 # dawnyawn/services/event_manager.py
 from models.task_node import TaskNode
+from services import tracing
 
 
 class EventManager:
@@ -9,6 +10,7 @@ class EventManager:
     def log_event(self, level: str, message: str):
         """Logs a general system event."""
         print(f"[{level}] {message}")
+        tracing.event(level, message)
 
     def log_task_status(self, task: TaskNode):
         """Logs the current status of a specific task."""
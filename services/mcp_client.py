@@ -1,35 +1,192 @@
 # dawnyawn/services/mcp_client.py (Simplified Version)
+import json
+import time
 import requests
-from typing import Dict
-from config import service_config
+from typing import Dict, Iterator, List, Optional, Tuple
+from config import service_config, COMMAND_TIMEOUT_SECONDS
+from services.transport import get_http_session, decode_body
+from services.tracing import traced, trace_headers, record_server_timing
+
+MAX_BACKPRESSURE_RETRIES = 5
+# Time allowed on top of a command's deadline for the server to format and return its observation.
+RESPONSE_GRACE_SECONDS = 180
+
+
+def _read_timeout(timeout: Optional[float]) -> float:
+    return (timeout or COMMAND_TIMEOUT_SECONDS) + RESPONSE_GRACE_SECONDS
+
 
 class McpClient:
     """Handles session-based communication with the smart execution server."""
 
+    def __init__(self):
+        # Every client shares one keep-alive connection pool to the server.
+        self.http = get_http_session()
+
+    def _post(self, path: str, **kwargs) -> requests.Response:
+        """POSTs to the server, backing off while it answers 429 (at capacity)."""
+        kwargs["headers"] = {**kwargs.get("headers", {}), **trace_headers()}
+        for attempt in range(MAX_BACKPRESSURE_RETRIES + 1):
+            response = self.http.post(f"{service_config.KALI_DRIVER_URL}{path}", **kwargs)
+            record_server_timing(response.headers.get("Server-Timing"), parent=path)
+            if response.status_code != 429 or attempt == MAX_BACKPRESSURE_RETRIES:
+                return response
+            delay = float(response.headers.get("Retry-After", 2 ** attempt))
+            print(f"  [!] Execution server busy, retrying in {delay:.0f}s...")
+            response.close()
+            time.sleep(delay)
+
+    @traced("mcp.start_session")
     def start_session(self) -> str:
         try:
-            response = requests.post(f"{service_config.KALI_DRIVER_URL}/session/start", timeout=60)
+            response = self._post("/session/start", timeout=60)
             response.raise_for_status()
             return response.json()["session_id"]
         except requests.exceptions.RequestException as e:
             raise RuntimeError(f"FATAL: Could not start a session. Is the server running? Details: {e}")
 
-    def execute_command(self, session_id: str, command: str) -> Dict:
-        """Executes a command and expects a structured JSON observation in return."""
+    @traced("mcp.execute")
+    def execute_command(self, session_id: str, command: str, use_cache: bool = True,
+                        timeout: Optional[float] = None) -> Dict:
+        """
+        Executes a command and expects a structured JSON observation in return. The server kills the
+        command after `timeout` seconds (COMMAND_TIMEOUT_SECONDS by default) and returns its partial output.
+        """
+        timeout = timeout or COMMAND_TIMEOUT_SECONDS
         try:
-            response = requests.post(
-                f"{service_config.KALI_DRIVER_URL}/session/execute",
-                json={"session_id": session_id, "command": command},
-                timeout=1800
+            response = self._post(
+                "/session/execute",
+                json={"session_id": session_id, "command": command, "no_cache": not use_cache, "timeout": timeout},
+                timeout=(60, _read_timeout(timeout))
             )
             response.raise_for_status()
-            return response.json() # Returns the full JSON observation as a dict
+            return decode_body(response)  # The observation as a dict, whichever encoding was negotiated
         except requests.exceptions.RequestException as e:
             return {"status": "FAILURE", "key_finding": f"Agent-side connection error: {e}", "full_output": ""}
 
+    @traced("mcp.execute_batch")
+    def execute_batch(self, session_id: str, commands: List[str], use_cache: bool = True,
+                      timeout: Optional[float] = None) -> List[Dict]:
+        """Executes independent commands concurrently in one session; observations come back in order."""
+        timeout = timeout or COMMAND_TIMEOUT_SECONDS
+        try:
+            response = self._post(
+                "/session/execute/batch",
+                json={"session_id": session_id, "commands": commands, "no_cache": not use_cache, "timeout": timeout},
+                timeout=(60, _read_timeout(timeout))
+            )
+            response.raise_for_status()
+            return decode_body(response)["observations"]
+        except requests.exceptions.RequestException as e:
+            return [{"status": "FAILURE", "key_finding": f"Agent-side connection error: {e}", "full_output": ""}
+                    for _ in commands]
+
+    def stream_command(self, session_id: str, command: str, use_cache: bool = True,
+                       timeout: Optional[float] = None) -> Iterator[Tuple[str, object]]:
+        """
+        Executes a command over the streaming endpoint. Yields ("stdout" | "stderr", text) chunks
+        while the command runs, ("exit", exit_code) when it finishes, and finally ("observation", dict) once the server has formatted it.
+        A command stopped by its deadline or a cancel also yields ("stopped", "timeout" | "cancelled") before its exit.
+        A cached result arrives as the observation alone.
+        """
+        timeout = timeout or COMMAND_TIMEOUT_SECONDS
+        try:
+            # The read timeout is per chunk, so a quiet command only needs to finish within its deadline.
+            with self._post(
+                "/session/execute/stream",
+                json={"session_id": session_id, "command": command, "no_cache": not use_cache, "timeout": timeout},
+                stream=True,
+                timeout=(60, _read_timeout(timeout))
+            ) as response:
+                response.raise_for_status()
+                event = None
+                for line in response.iter_lines(decode_unicode=True):
+                    if line.startswith("event: "):
+                        event = line[len("event: "):]
+                    elif line.startswith("data: ") and event:
+                        data = json.loads(line[len("data: "):])
+                        if event == "error":
+                            yield "observation", {"status": "FAILURE", "key_finding": data, "full_output": ""}
+                            return
+                        yield event, data
+                        event = None
+        except requests.exceptions.RequestException as e:
+            yield "observation", {"status": "FAILURE", "key_finding": f"Agent-side connection error: {e}", "full_output": ""}
+
+    @traced("mcp.execute_stream")
+    def execute_command_streaming(self, session_id: str, command: str, on_chunk=None, use_cache: bool = True,
+                                  timeout: Optional[float] = None) -> Dict:
+        """Streams a command, passing each chunk to `on_chunk`, and returns the final observation."""
+        stdout_parts, stderr_parts = [], []
+        observation = None
+        for event, data in self.stream_command(session_id, command, use_cache=use_cache, timeout=timeout):
+            if event == "observation":
+                observation = data
+            elif event in ("stdout", "stderr"):
+                (stdout_parts if event == "stdout" else stderr_parts).append(data)
+                if on_chunk: on_chunk(event, data)
+        if observation is None:
+            observation = {"status": "FAILURE", "key_finding": "Stream ended without an observation.", "full_output": ""}
+        if (stdout_parts or stderr_parts) and "artifact" not in observation:
+            # The server only formats a bounded head; the agent already holds the complete output.
+            full_output = "".join(stdout_parts).strip()
+            if stderr_parts:
+                full_output += "\n--- STDERR ---\n" + "".join(stderr_parts).strip()
+            observation["full_output"] = full_output
+        return observation
+
+    @traced("mcp.artifact_range")
+    def read_artifact(self, artifact_id: str, offset: int = 0, length: int = 8192) -> str:
+        """Fetches a byte range of a large output the server spilled to its artifact store."""
+        try:
+            response = self.http.get(f"{service_config.KALI_DRIVER_URL}/artifact/{artifact_id}/range",
+                                     params={"offset": offset, "length": length}, headers=trace_headers(), timeout=60)
+            response.raise_for_status()
+            return response.content.decode("utf-8", errors="replace")
+        except requests.exceptions.RequestException as e:
+            raise RuntimeError(f"Could not read artifact {artifact_id}: {e}")
+
+    @traced("mcp.artifact_grep")
+    def grep_artifact(self, artifact_id: str, pattern: str, max_matches: int = 50, context: int = 0,
+                      regex: bool = False) -> Dict:
+        """Returns only the lines of a spilled output that contain `pattern` (or match it, if `regex`)."""
+        try:
+            response = self.http.get(f"{service_config.KALI_DRIVER_URL}/artifact/{artifact_id}/grep",
+                                     params={"pattern": pattern, "max_matches": max_matches, "context": context,
+                                             "regex": regex},
+                                     headers=trace_headers(), timeout=60)
+            response.raise_for_status()
+            return response.json()
+        except requests.exceptions.RequestException as e:
+            raise RuntimeError(f"Could not grep artifact {artifact_id}: {e}")
+
+    @traced("mcp.cancel")
+    def cancel(self, session_id: str) -> int:
+        """Kills whatever the session is running; the stopped commands still return their partial output."""
+        try:
+            response = self._post("/session/cancel", json={"session_id": session_id}, timeout=60)
+            response.raise_for_status()
+            return response.json()["cancelled"]
+        except requests.exceptions.RequestException as e:
+            print(f"⚠️  Warning: Failed to cancel the running command. {e}")
+            return 0
+
+    @traced("mcp.reset_session")
+    def reset_session(self, session_id: str) -> bool:
+        """Cleans the session's container so it can be handed to another mission."""
+        try:
+            response = self._post("/session/reset", json={"session_id": session_id}, timeout=60)
+            response.raise_for_status()
+            return True
+        except requests.exceptions.RequestException as e:
+            print(f"⚠️  Warning: Failed to reset session. {e}")
+            return False
+
+    @traced("mcp.end_session")
     def end_session(self, session_id: str):
         try:
-            requests.post(f"{service_config.KALI_DRIVER_URL}/session/end", json={"session_id": session_id}, timeout=60)
+            self.http.post(f"{service_config.KALI_DRIVER_URL}/session/end", json={"session_id": session_id},
+                           headers=trace_headers(), timeout=60)
             print("✅ Session terminated successfully on the server.")
         except requests.exceptions.RequestException as e:
             print(f"⚠️  Warning: Failed to terminate session. {e}")
\ No newline at end of file
@@ -0,0 +1,124 @@
+# dawnyawn/services/mission_journal.py
+import os
+import re
+import json
+import time
+import threading
+from typing import Dict, List, Optional
+from config import JOURNAL_DIR
+from models.task_node import TaskNode
+
+# Outcomes after which there is nothing left to resume.
+FINISHED_OUTCOMES = {"COMPLETED", "STEP_LIMIT", "NO_PLAN", "DECLINED"}
+# Mission IDs name the journal, trace and report files, so they can't contain path separators or dots.
+MISSION_ID_PATTERN = re.compile(r'[A-Za-z0-9_-]+')
+
+
+def is_valid_mission_id(mission_id: str) -> bool:
+    return isinstance(mission_id, str) and MISSION_ID_PATTERN.fullmatch(mission_id) is not None
+
+
+class MissionState:
+    """What a journal says about a mission: enough to continue it without re-running finished commands."""
+
+    def __init__(self, mission_id: str):
+        self.mission_id = mission_id
+        self.goal: Optional[str] = None
+        self.plan: List[TaskNode] = []
+        # Whether the recorded plan was approved; a plan interrupted at the prompt was not.
+        self.approved = False
+        self.history: List[Dict] = []
+        self.outcome: Optional[str] = None
+        # Commands of the last action that were chosen but never observed (interrupted mid-action).
+        self.pending_tool: Optional[str] = None
+        self.pending_commands: List[str] = []
+
+    @property
+    def finished(self) -> bool:
+        return self.outcome in FINISHED_OUTCOMES
+
+
+class MissionJournal:
+    """
+    Append-only JSONL journal of one mission: the plan, every ToolSelection and every observation.
+    Each entry is flushed and fsync'd before the mission moves on, so a crash loses at most the
+    command that was running.
+    """
+
+    def __init__(self, mission_id: str, journal_dir: Optional[str] = JOURNAL_DIR):
+        self.mission_id = mission_id
+        self.path = os.path.join(journal_dir, f"{mission_id}.jsonl") if journal_dir else None
+        self._lock = threading.Lock()
+        if self.path:
+            os.makedirs(journal_dir, exist_ok=True)
+
+    def _append(self, entry_type: str, **data):
+        if not self.path:
+            return
+        line = json.dumps({"type": entry_type, "time": round(time.time(), 3), **data}, default=str)
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def record_start(self, goal: str, resumed: bool = False):
+        self._append("resume" if resumed else "mission", mission_id=self.mission_id, goal=goal)
+
+    def record_plan(self, plan: List[TaskNode]):
+        self._append("plan", plan=[task.model_dump() for task in plan])
+
+    def record_approval(self):
+        self._append("approval")
+
+    def record_action(self, tool_name: str, tool_input, commands: List[str]):
+        self._append("action", tool_name=tool_name, tool_input=tool_input, commands=commands)
+
+    def record_observation(self, command: str, observation: Dict, tool_name: Optional[str] = None):
+        self._append("observation", command=command, observation=observation, tool_name=tool_name)
+
+    def record_outcome(self, outcome: str):
+        self._append("outcome", outcome=outcome)
+
+    @classmethod
+    def load(cls, mission_id: str, journal_dir: Optional[str] = JOURNAL_DIR) -> MissionState:
+        """Replays a journal into a MissionState. A torn final line from a crash mid-write is ignored."""
+        if not is_valid_mission_id(mission_id):
+            raise ValueError(f"Invalid mission ID '{mission_id}': use letters, digits, '_' and '-' only.")
+        path = os.path.join(journal_dir or "", f"{mission_id}.jsonl")
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"No journal for mission '{mission_id}' at {path}.")
+        state = MissionState(mission_id)
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    break
+                entry_type = entry.get("type")
+                if entry_type in ("mission", "resume"):
+                    state.goal = state.goal or entry.get("goal")
+                    state.outcome = None
+                elif entry_type == "plan":
+                    state.plan = [TaskNode(**task) for task in entry["plan"]]
+                    state.approved = False
+                elif entry_type == "approval":
+                    state.approved = True
+                elif entry_type == "action":
+                    # Execution only starts after approval (journals from before approval records).
+                    state.approved = True
+                    state.pending_tool = entry["tool_name"]
+                    state.pending_commands = list(entry.get("commands") or [])
+                elif entry_type == "observation":
+                    step = {"command": entry["command"], "observation": entry["observation"]}
+                    if entry.get("tool_name"):
+                        step["tool_name"] = entry["tool_name"]
+                    state.history.append(step)
+                    if entry["command"] in state.pending_commands:
+                        state.pending_commands.remove(entry["command"])
+                elif entry_type == "outcome":
+                    state.outcome = entry["outcome"]
+        if not state.pending_commands:
+            state.pending_tool = None
+        if state.goal is None:
+            raise ValueError(f"Journal {path} does not record the mission goal.")
+        return state
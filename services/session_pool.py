@@ -0,0 +1,47 @@
+# dawnyawn/services/session_pool.py
+import threading
+from typing import List
+from services.mcp_client import McpClient
+
+
+class SessionPool:
+    """Shares a bounded set of execution-server sessions between concurrently running missions."""
+
+    def __init__(self, mcp_client: McpClient, max_sessions: int):
+        self.mcp_client = mcp_client
+        self._slots = threading.BoundedSemaphore(max_sessions)
+        self._idle: List[str] = []
+        self._all: List[str] = []
+        self._lock = threading.Lock()
+
+    def acquire(self) -> str:
+        """Blocks until a session slot is free, then reuses an idle session or starts a new one."""
+        self._slots.acquire()
+        with self._lock:
+            if self._idle:
+                return self._idle.pop()
+        try:
+            session_id = self.mcp_client.start_session()
+        except Exception:
+            self._slots.release()
+            raise
+        with self._lock:
+            self._all.append(session_id)
+        return session_id
+
+    def release(self, session_id: str):
+        """Resets the session and makes it available again; a session that can't be reset is ended."""
+        if self.mcp_client.reset_session(session_id):
+            with self._lock:
+                self._idle.append(session_id)
+        else:
+            with self._lock:
+                self._all.remove(session_id)
+            self.mcp_client.end_session(session_id)
+        self._slots.release()
+
+    def close(self):
+        with self._lock:
+            sessions, self._all, self._idle = self._all, [], []
+        for session_id in sessions:
+            self.mcp_client.end_session(session_id)
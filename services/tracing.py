@@ -0,0 +1,100 @@
+# dawnyawn/services/tracing.py
+import os
+import json
+import time
+import functools
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Optional
+from config import TRACE_DIR
+
+
+class MissionTrace:
+    """Collects timing spans for one mission and appends them, one JSON object per line, to its trace file."""
+
+    def __init__(self, mission_id: str, trace_dir: Optional[str] = TRACE_DIR):
+        self.mission_id = mission_id
+        self.session_id: Optional[str] = None
+        self.step = 0
+        self.path = os.path.join(trace_dir, f"{mission_id}.jsonl") if trace_dir else None
+        self._lock = threading.Lock()
+        if self.path:
+            os.makedirs(trace_dir, exist_ok=True)
+
+    def record(self, kind: str, name: str, **fields):
+        if not self.path:
+            return
+        entry = {"kind": kind, "name": name, "mission_id": self.mission_id,
+                 "session_id": self.session_id, "step": self.step, **fields}
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry, default=str) + "\n")
+
+
+# The trace of the mission running in this thread; each batch mission runs in its own thread.
+_current: ContextVar[Optional[MissionTrace]] = ContextVar("mission_trace", default=None)
+
+
+def start_trace(mission_id: str) -> MissionTrace:
+    trace = MissionTrace(mission_id)
+    _current.set(trace)
+    return trace
+
+
+def current_trace() -> Optional[MissionTrace]:
+    return _current.get()
+
+
+@contextmanager
+def span(name: str, **attrs):
+    """Times the block as a span of the current mission; a no-op outside a mission. Yields mutable attrs."""
+    trace = _current.get()
+    started = time.time()
+    t0 = time.perf_counter()
+    status = "ok"
+    try:
+        yield attrs
+    except BaseException as e:
+        status = f"error:{type(e).__name__}"
+        raise
+    finally:
+        if trace is not None:
+            trace.record("span", name, start=round(started, 6),
+                         duration_ms=round((time.perf_counter() - t0) * 1000, 3), status=status, **attrs)
+
+
+def traced(name: str):
+    """Decorator form of `span` for methods that should always be timed."""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def event(level: str, message: str):
+    trace = _current.get()
+    if trace is not None:
+        trace.record("event", level, time=round(time.time(), 6), message=message)
+
+
+def trace_headers() -> Dict[str, str]:
+    """Headers that let the execution server tag its log lines with our mission and step."""
+    trace = _current.get()
+    if trace is None:
+        return {}
+    return {"X-Mission-Id": trace.mission_id, "X-Step-Id": str(trace.step)}
+
+
+def record_server_timing(header: Optional[str], parent: str):
+    """Records the stages of a Server-Timing header (e.g. "ssh_exec;dur=812.4") as server-side spans."""
+    trace = _current.get()
+    if trace is None or not header:
+        return
+    for entry in header.split(","):
+        stage, *params = [piece.strip() for piece in entry.split(";")]
+        durations = [param[len("dur="):] for param in params if param.startswith("dur=")]
+        if stage and durations:
+            trace.record("span", f"server.{stage}", parent=parent, duration_ms=float(durations[0]), status="ok")
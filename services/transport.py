@@ -0,0 +1,45 @@
+# dawnyawn/services/transport.py
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from config import MCP_POOL_MAXSIZE
+
+# Optional: with msgpack installed the server may send large observations in its compact binary form.
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+MSGPACK_MEDIA_TYPE = "application/msgpack"
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_http_session() -> requests.Session:
+    """
+    Returns the process-wide session for the execution server. Its keep-alive pool is shared by every
+    McpClient, so start/execute/end reuse TCP connections instead of opening one per call.
+    requests already advertises gzip (and zstd when `zstandard` is installed) and decodes it transparently.
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=MCP_POOL_MAXSIZE)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            if msgpack is not None:
+                session.headers["Accept"] = f"{MSGPACK_MEDIA_TYPE}, application/json;q=0.9"
+            _session = session
+        return _session
+
+
+def decode_body(response: requests.Response):
+    """Decodes a JSON or msgpack response body, whichever the server negotiated."""
+    content_type = response.headers.get("Content-Type", "")
+    if content_type.startswith(MSGPACK_MEDIA_TYPE):
+        if msgpack is None:
+            raise requests.exceptions.ContentDecodingError("Server sent msgpack but msgpack is not installed.")
+        return msgpack.unpackb(response.content, raw=False)
+    return response.json()
@@ -0,0 +1,6 @@
+# dawnyawn/tests/conftest.py
+import os
+import sys
+
+# Agent modules import from the repository root (`from models.task_node import TaskNode`).
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
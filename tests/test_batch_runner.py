@@ -0,0 +1,53 @@
+# dawnyawn/tests/test_batch_runner.py
+import json
+
+import pytest
+
+from agent import batch_runner
+from agent.batch_runner import BatchRunner, load_goals
+from agent.plan_cache import PlanCache
+
+
+def _goals_file(tmp_path, *entries) -> str:
+    path = tmp_path / "goals.jsonl"
+    path.write_text("\n".join(json.dumps(entry) for entry in entries) + "\n\n", encoding="utf-8")
+    return str(path)
+
+
+def test_load_goals(tmp_path):
+    path = _goals_file(tmp_path, {"goal": "Ping a.example"}, {"goal": "Whois b.example", "id": "whois_b-1"})
+    assert [entry["goal"] for entry in load_goals(path)] == ["Ping a.example", "Whois b.example"]
+
+
+@pytest.mark.parametrize("entries, message", [
+    ([{"id": "x"}], "needs a 'goal'"),
+    ([{"goal": "g", "id": "../escape"}], "invalid id"),
+    ([{"goal": "g", "id": "a.b"}], "invalid id"),
+    ([{"goal": "g", "id": "same"}, {"goal": "h", "id": "same"}], "duplicate id"),
+])
+def test_load_goals_rejects_bad_entries(tmp_path, entries, message):
+    with pytest.raises(ValueError, match=message):
+        load_goals(_goals_file(tmp_path, *entries))
+
+
+class FailingTaskManager:
+    def __init__(self, goal, **kwargs):
+        if "broken" in goal:
+            raise RuntimeError("could not build the mission")
+        self.goal, self.mission_id = goal, kwargs["mission_id"]
+
+    def run(self):
+        return {"mission_id": self.mission_id, "goal": self.goal, "outcome": "COMPLETED",
+                "duration_seconds": 0.0, "steps": []}
+
+
+def test_a_mission_that_fails_to_start_is_one_error_entry(tmp_path, monkeypatch):
+    monkeypatch.setattr(batch_runner, "TaskManager", FailingTaskManager)
+    monkeypatch.setattr(batch_runner, "get_plan_cache", PlanCache)
+    path = _goals_file(tmp_path, {"goal": "broken goal", "id": "bad"}, {"goal": "fine goal", "id": "good"})
+    runner = BatchRunner(path, concurrency=2, report_dir=str(tmp_path / "reports"), max_sessions=1)
+    summary = runner.run()
+    assert summary["outcomes"] == {"ERROR": 1, "COMPLETED": 1}
+    report = json.loads((tmp_path / "reports" / "bad.json").read_text(encoding="utf-8"))
+    assert report["outcome"] == "ERROR"
+    assert report["error"] == "could not build the mission"
@@ -0,0 +1,80 @@
+# dawnyawn/tests/test_findings.py
+import pytest
+
+from agent.findings import FindingsStore, command_target
+
+NMAP_OUTPUT = """Nmap scan report for target.example (10.0.0.5)
+PORT   STATE SERVICE VERSION
+22/tcp open  ssh     OpenSSH 8.2p1 Ubuntu
+80/tcp open  http    Apache httpd 2.4.49
+| http-vuln-cve2021-41773: VULNERABLE CVE-2021-41773 path traversal
+443/tcp closed https
+"""
+
+
+def _ok(output: str, **extra) -> dict:
+    return {"status": "SUCCESS", "full_output": output, **extra}
+
+
+@pytest.mark.parametrize("command, target", [
+    ("nmap -sV 10.0.0.5", ("10.0.0.5", None)),
+    ("curl -I https://example.com/login", ("example.com", "443/tcp")),
+    ("curl -I http://example.com:8080", ("example.com", "8080/tcp")),
+    ("whatweb -a 1 example.com", ("example.com", None)),
+    ("ls -la", (None, None)),
+    ("dig 'unterminated example.com", ("example.com", None)),
+])
+def test_command_target(command, target):
+    assert command_target(command) == target
+
+
+def test_nmap_output_is_ingested_once():
+    store = FindingsStore()
+    changes = store.ingest(1, "nmap -sV 10.0.0.5", _ok(NMAP_OUTPUT))
+    assert changes == ["target.example 22/tcp open (ssh OpenSSH 8.2p1 Ubuntu)",
+                       "target.example 80/tcp open (http Apache httpd 2.4.49)",
+                       "target.example CVE-2021-41773"]
+    assert store.ingest(2, "nmap -sV 10.0.0.5", _ok(NMAP_OUTPUT)) == []
+    assert store.with_service("SSH") == [("target.example", "22/tcp")]
+    [vuln] = store.vulnerabilities("target.example")
+    assert vuln["id"] == "CVE-2021-41773" and vuln["step"] == 1
+    assert store.render() == ("target.example (10.0.0.5): 22/tcp ssh OpenSSH 8.2p1 Ubuntu; "
+                              "80/tcp http Apache httpd 2.4.49 | CVE-2021-41773")
+
+
+def test_later_details_fill_in_and_are_reported_as_changes():
+    store = FindingsStore()
+    store.ingest(1, "masscan 10.0.0.5", _ok("Discovered open port 80/tcp on 10.0.0.5"))
+    store.ingest(2, "nmap -sV -p80 10.0.0.5", _ok("80/tcp open http Apache httpd 2.4.49"))
+    store.ingest(3, "nmap -p80 10.0.0.5", _ok("80/tcp open http"))
+    assert store.open_ports("10.0.0.5") == {"10.0.0.5": {"80/tcp": {"service": "http",
+                                                                    "version": "Apache httpd 2.4.49", "step": 2}}}
+    assert store.changes_since(0) == ["10.0.0.5 80/tcp open", "10.0.0.5 80/tcp is http Apache httpd 2.4.49"]
+    assert store.changes_since(1) == ["10.0.0.5 80/tcp is http Apache httpd 2.4.49"]
+    assert store.changes_since(2) == []
+
+
+def test_server_header_records_the_url_port():
+    store = FindingsStore()
+    store.ingest(1, "curl -I https://example.com", _ok("HTTP/1.1 200 OK\nServer: nginx/1.18.0\n"))
+    assert store.render() == "example.com: 443/tcp http nginx/1.18.0"
+
+
+@pytest.mark.parametrize("observation, recorded", [
+    ({"status": "FAILURE", "full_output": "22/tcp open ssh"}, False),
+    ({"status": "FAILURE", "stopped": "timeout", "full_output": "22/tcp open ssh"}, True),
+    ("not a dict", False),
+])
+def test_only_successful_or_stopped_observations_count(observation, recorded):
+    store = FindingsStore()
+    store.ingest(1, "nmap 10.0.0.5", observation)
+    assert bool(store) is recorded
+
+
+def test_render_is_bounded():
+    store = FindingsStore()
+    for host in range(50):
+        store.ingest(1, f"nmap 10.0.0.{host}", _ok("22/tcp open ssh"))
+    rendered = store.render(max_chars=200)
+    assert len(rendered) <= 200 and rendered.endswith("...[more hosts omitted]")
+    assert set(store.to_dict()["hosts"]) == set(store.hosts())
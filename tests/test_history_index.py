@@ -0,0 +1,48 @@
+# dawnyawn/tests/test_history_index.py
+import pytest
+
+from agent.history_index import HistoryIndex, tokenize
+
+
+@pytest.mark.parametrize("text, tokens", [
+    ("22/tcp open ssh", ["22/tcp", "open", "ssh"]),
+    ("Found CVE-2021-41773 on 10.0.0.5:8080", ["found", "cve-2021-41773", "10.0.0.5:8080"]),
+    ("GET /admin/login.php.", ["get", "admin/login.php"]),
+    ("The host is up and not filtered", ["host", "up", "filtered"]),
+])
+def test_tokenize_keeps_hosts_ports_and_paths_whole(text, tokens):
+    assert tokenize(text) == tokens
+
+
+def _index(*docs):
+    index = HistoryIndex()
+    for doc_id, text in enumerate(docs, start=1):
+        index.add(doc_id, text)
+    return index
+
+
+def test_search_ranks_by_relevance():
+    index = _index("whois example.com registrar",
+                   "nmap 10.0.0.5 22/tcp open ssh OpenSSH 7.2",
+                   "dig example.com A record",
+                   "ssh-audit 10.0.0.5 weak ssh kex ssh")
+    assert index.search("ssh 10.0.0.5", 2) == [4, 2]
+    assert index.search("registrar", 5) == [1]
+    assert index.search("nothing matches", 5) == []
+    assert len(index) == 4
+
+
+def test_search_is_restricted_to_among():
+    index = _index("ssh open", "ssh open", "ssh open")
+    assert index.search("ssh", 5, among=[1, 2]) == [2, 1]
+    assert index.search("ssh", 5, among=[]) == []
+
+
+def test_ties_favour_recent_docs():
+    index = _index("port 80 open", "port 80 open", "port 80 open")
+    assert index.search("80", 2) == [3, 2]
+
+
+def test_empty_index_and_zero_k():
+    assert HistoryIndex().search("ssh", 3) == []
+    assert _index("ssh").search("ssh", 0) == []
@@ -0,0 +1,75 @@
+# dawnyawn/tests/test_mission_journal.py
+import pytest
+
+from models.task_node import TaskNode
+from services.mission_journal import MissionJournal, is_valid_mission_id
+
+PLAN = [TaskNode(task_id=1, description="Scan"), TaskNode(task_id=2, description="Report", dependencies=[1])]
+OBSERVATION = {"status": "SUCCESS", "key_finding": "22/tcp open", "full_output": "22/tcp open ssh"}
+
+
+def _journal(tmp_path, mission_id="m1") -> MissionJournal:
+    journal = MissionJournal(mission_id, str(tmp_path))
+    journal.record_start("Recon 10.0.0.5")
+    journal.record_plan(PLAN)
+    return journal
+
+
+@pytest.mark.parametrize("mission_id, valid", [
+    ("abc123", True), ("mission_1-b", True), ("", False), ("../x", False), ("a.b", False), ("a/b", False),
+])
+def test_mission_id_validation(mission_id, valid):
+    assert is_valid_mission_id(mission_id) == valid
+
+
+def test_invalid_or_missing_journals_are_refused(tmp_path):
+    with pytest.raises(ValueError):
+        MissionJournal.load("../etc", str(tmp_path))
+    with pytest.raises(FileNotFoundError):
+        MissionJournal.load("missing", str(tmp_path))
+
+
+def test_replay_restores_plan_history_and_pending_commands(tmp_path):
+    journal = _journal(tmp_path)
+    journal.record_approval()
+    journal.record_action("os_command_batch", ["nmap a", "dig a"], ["nmap a", "dig a"])
+    journal.record_observation("nmap a", OBSERVATION)
+    state = MissionJournal.load("m1", str(tmp_path))
+    assert state.goal == "Recon 10.0.0.5"
+    assert [task.model_dump() for task in state.plan] == [task.model_dump() for task in PLAN]
+    assert state.approved
+    assert state.history == [{"command": "nmap a", "observation": OBSERVATION}]
+    assert (state.pending_tool, state.pending_commands) == ("os_command_batch", ["dig a"])
+    assert not state.finished
+
+
+@pytest.mark.parametrize("approve, approved", [(False, False), (True, True)])
+def test_approval_is_journalled(tmp_path, approve, approved):
+    journal = _journal(tmp_path)
+    if approve:
+        journal.record_approval()
+    assert MissionJournal.load("m1", str(tmp_path)).approved == approved
+
+
+def test_a_new_plan_needs_a_new_approval(tmp_path):
+    journal = _journal(tmp_path)
+    journal.record_approval()
+    journal.record_plan(PLAN)
+    assert not MissionJournal.load("m1", str(tmp_path)).approved
+
+
+def test_outcome_and_torn_final_line(tmp_path):
+    journal = _journal(tmp_path)
+    journal.record_outcome("COMPLETED")
+    with open(journal.path, "a", encoding="utf-8") as f:
+        f.write('{"type": "observation", "comm')
+    state = MissionJournal.load("m1", str(tmp_path))
+    assert state.outcome == "COMPLETED" and state.finished
+
+
+def test_a_resume_reopens_an_aborted_mission(tmp_path):
+    journal = _journal(tmp_path)
+    journal.record_outcome("ABORTED")
+    journal.record_start("Recon 10.0.0.5", resumed=True)
+    state = MissionJournal.load("m1", str(tmp_path))
+    assert state.outcome is None and not state.finished
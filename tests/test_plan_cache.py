@@ -0,0 +1,80 @@
+# dawnyawn/tests/test_plan_cache.py
+import pytest
+
+from agent.plan_cache import PlanCache, _abstract, templatize
+from models.task_node import TaskNode
+
+
+@pytest.mark.parametrize("goal, template, targets", [
+    ("Scan 10.0.0.5 for open ports", "scan <IP1> for open ports", {"<IP1>": "10.0.0.5"}),
+    ("Enumerate  subdomains of Example.COM.", "enumerate subdomains of <HOST1>", {"<HOST1>": "Example.COM"}),
+    ("Sweep 10.0.0.0/24 then probe 10.0.0.1", "sweep <CIDR1> then probe <IP1>",
+     {"<CIDR1>": "10.0.0.0/24", "<IP1>": "10.0.0.1"}),
+    ("Check http://example.com/login and example.com", "check <URL1> and <HOST1>",
+     {"<URL1>": "http://example.com/login", "<HOST1>": "example.com"}),
+    ("Compare a.example.com with b.example.com and a.example.com", "compare <HOST1> with <HOST2> and <HOST1>",
+     {"<HOST1>": "a.example.com", "<HOST2>": "b.example.com"}),
+    ("Look for robots.txt on example.org", "look for robots.txt on <HOST1>", {"<HOST1>": "example.org"}),
+    ("Find the web server version", "find the web server version", {}),
+])
+def test_templatize(goal, template, targets):
+    assert templatize(goal) == (template, targets)
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("Run nmap -F 10.0.0.1.", "Run nmap -F <IP1>."),
+    ("Run nmap -F 10.0.0.15", "Run nmap -F 10.0.0.15"),
+    ("Query dev.example.com", "Query dev.example.com"),
+    ("Query EXAMPLE.com and www.example.com", "Query <HOST1> and <HOST2>"),
+    ("Fetch http://example.com/ and example.com", "Fetch http://<HOST1>/ and <HOST1>"),
+])
+def test_abstract(text, expected):
+    targets = {"<IP1>": "10.0.0.1", "<HOST1>": "example.com", "<HOST2>": "www.example.com"}
+    assert _abstract(text, targets) == expected
+
+
+def _plan(*descriptions):
+    return [TaskNode(task_id=index, description=description, dependencies=[index - 1] if index > 1 else [])
+            for index, description in enumerate(descriptions, start=1)]
+
+
+def test_plan_is_reinstantiated_for_another_target():
+    cache = PlanCache()
+    assert cache.put("Scan 10.0.0.5 for open ports", _plan("Run nmap -F 10.0.0.5", "Report on 10.0.0.5"))
+    plan = cache.get("scan 10.0.0.9 for open ports")
+    assert [task.description for task in plan] == ["Run nmap -F 10.0.0.9", "Report on 10.0.0.9"]
+    assert [task.dependencies for task in plan] == [[], [1]]
+    assert cache.get("Scan example.com for open ports") is None
+
+
+@pytest.mark.parametrize("goal, step", [
+    # A step that only contains the goal's target would point other missions at the wrong host.
+    ("Scan 10.0.0.1", "Run nmap -F 10.0.0.15"),
+    # A target the goal never named.
+    ("Probe http://example.com/", "Run nmap -F 93.184.216.34"),
+    ("Recon example.com", "Enumerate dev.example.com"),
+])
+def test_plans_naming_other_targets_are_not_cached(goal, step):
+    cache = PlanCache()
+    assert not cache.put(goal, _plan(step))
+    assert cache.get(goal) is None
+    assert cache.stats()["uncacheable"] == 1
+
+
+def test_refusal_drops_the_plan_being_refreshed(tmp_path):
+    cache = PlanCache(db_path=str(tmp_path / "plans.db"))
+    assert cache.put("Scan 10.0.0.1", _plan("Run nmap -F 10.0.0.1"))
+    assert not cache.put("Scan 10.0.0.1", _plan("Run nmap -F 10.0.0.15"), refresh=True)
+    assert cache.get("Scan 10.0.0.1") is None
+    cache.close()
+
+
+def test_plans_persist_across_instances(tmp_path):
+    db_path = str(tmp_path / "plans.db")
+    first = PlanCache(db_path=db_path)
+    first.put("Whois example.com", _plan("Run whois example.com"))
+    first.close()
+    second = PlanCache(db_path=db_path)
+    assert [task.description for task in second.get("Whois example.org")] == ["Run whois example.org"]
+    assert second.stats()["disk_hits"] == 1
+    second.close()
@@ -0,0 +1,81 @@
+# dawnyawn/tests/test_prompt_history.py
+import json
+
+from agent.prompt_history import NEXT_ACTION_PROMPT, PromptHistory, _compact_output
+from models.task_node import TaskNode
+
+PLAN = [TaskNode(task_id=1, description="Scan ports"),
+        TaskNode(task_id=2, description="Grab banners", dependencies=[1])]
+
+
+def _history(**kwargs):
+    options = {"token_budget": 100000, "max_output_chars": 400, "recent_steps": 4, "recall_k": 0}
+    return PromptHistory("You are a pentester.", "Recon 10.0.0.5", PLAN, **{**options, **kwargs})
+
+
+def _observation(step: int, output: str = "") -> dict:
+    return {"status": "SUCCESS", "key_finding": f"finding {step}", "full_output": output or f"output {step}"}
+
+
+def test_compact_output_keeps_head_and_tail():
+    compacted = _compact_output("A" * 500 + "B" * 500, 100)
+    assert compacted.startswith("A" * 50) and compacted.endswith("B" * 50)
+    assert "[900 characters omitted]" in compacted
+    assert _compact_output("short", 100) == "short"
+
+
+def test_each_step_appends_a_turn_pair_and_keeps_the_prefix():
+    history = _history()
+    before = history.messages()
+    history.record_step("nmap -F 10.0.0.5", _observation(1))
+    after = history.messages()
+    assert len(after) == len(before) + 2
+    assert after[:len(before)] == before
+    assert json.loads(after[-2]["content"]) == {"tool_name": "os_command", "tool_input": "nmap -F 10.0.0.5"}
+    assert after[-1]["content"].startswith("Observation for action 1:")
+    assert after[-1]["content"].endswith(NEXT_ACTION_PROMPT)
+    history.record_step("whois example.com", _observation(2))
+    assert history.messages()[:len(after)] == after
+
+
+def test_long_output_is_compacted_in_the_prompt():
+    history = _history(max_output_chars=100)
+    history.record_step("cat big", _observation(1, "x" * 5000))
+    assert len(history.messages()[-1]["content"]) < 600
+
+
+def test_over_budget_history_is_folded_into_a_ledger():
+    history = _history(token_budget=400, recent_steps=50)
+    for step in range(1, 9):
+        history.record_step(f"cmd{step}", _observation(step, "y" * 300))
+    assert history.estimated_tokens() <= 400
+    header = history.messages()[1]["content"]
+    assert "Ledger of earlier actions" in header
+    assert "1. `cmd1` -> SUCCESS" in header
+
+
+def test_relevant_folded_steps_are_recalled_in_the_last_turn():
+    history = _history(recent_steps=2, recall_k=1)
+    history.record_step("nmap -sV 10.0.0.5", _observation(1, "22/tcp open ssh OpenSSH 7.2"))
+    history.record_step("whois example.com", _observation(2, "Registrar: Example"))
+    history.record_step("dig example.com", _observation(3, "A 93.184.216.34"))
+    history.record_step("curl -I http://example.com", _observation(4, "HTTP/1.1 200 OK"))
+    history.record_step("host example.com", _observation(5, "example.com has address 93.184.216.34"))
+    history.record_step("ssh-audit 10.0.0.5", {"status": "SUCCESS", "key_finding": "weak ssh kex",
+                                                "full_output": "weak ssh kex"})
+    last = history.messages()[-1]["content"]
+    assert "Earlier observation 1 (`nmap -sV 10.0.0.5`)" in last
+    assert "Earlier observation 2" not in last
+    assert last.endswith(NEXT_ACTION_PROMPT)
+    # The recall goes in the last turn only, so the folded prefix is unchanged.
+    assert "Earlier observation" not in history.messages()[1]["content"]
+
+
+def test_oldest_ledger_lines_lose_their_findings_first():
+    history = _history(token_budget=300, recent_steps=1)
+    for step in range(1, 11):
+        history.record_step(f"cmd{step}", {"status": "SUCCESS", "key_finding": f"finding {step} " + "z" * 90,
+                                           "full_output": "ok"})
+    ledger = history.messages()[1]["content"]
+    assert "1. `cmd1` -> SUCCESS\n" in ledger
+    assert "9. `cmd9` -> SUCCESS: finding 9" in ledger
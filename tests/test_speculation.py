@@ -0,0 +1,158 @@
+# dawnyawn/tests/test_speculation.py
+import threading
+import time
+
+import pytest
+
+from agent.speculation import Speculator, is_read_only
+
+
+@pytest.mark.parametrize("command", [
+    "dig example.com",
+    "dig -t MX example.com",
+    "dig -x 10.0.0.5",
+    "host -t ns example.com",
+    "nslookup -type=mx example.com",
+    "whois example.com",
+    "curl -I http://example.com",
+    "curl -sIL --max-time 10 http://example.com",
+    "curl --head -H 'Accept: */*' http://example.com",
+    "nmap -F 10.0.0.5",
+    "nmap -sn 10.0.0.0/24",
+    "nmap -Pn -p 22,80,443 10.0.0.5",
+    "nmap -p22,80 10.0.0.5",
+    "ping -c 3 10.0.0.5",
+    "whatweb -a 1 http://example.com",
+    "traceroute -n 10.0.0.5",
+])
+def test_read_only_commands(command):
+    assert is_read_only(command)
+
+
+@pytest.mark.parametrize("command", [
+    "",
+    "rm -rf /tmp/x",
+    "bash -c 'dig x'",
+    "dig example.com; rm -rf /",
+    "dig example.com | tee out",
+    "dig $(cat /etc/passwd)",
+    "curl http://example.com > page.html",
+    "curl 'unterminated",
+    # curl that isn't a HEAD request, or that writes a file or a cookie jar.
+    "curl http://example.com",
+    "curl -X POST -I http://example.com",
+    "curl -I -so /root/x http://example.com",
+    "curl -I -o /tmp/x http://example.com",
+    "curl -I --output=/tmp/x http://example.com",
+    "curl -I -c jar.txt http://example.com",
+    "curl -I -D headers.txt http://example.com",
+    "curl -I -K /tmp/config http://example.com",
+    # nmap that writes files, scans random hosts, runs scripts or sweeps every port.
+    "nmap -F -oN/tmp/x 10.0.0.5",
+    "nmap -F -oX - 10.0.0.5",
+    "nmap -F -iR 1000",
+    "nmap -F --script vuln 10.0.0.5",
+    "nmap -p- 10.0.0.5",
+    "nmap -p 1-65535 10.0.0.5",
+    "nmap -sV 10.0.0.5",
+    "nmap -p " + ",".join(str(port) for port in range(1, 30)) + " 10.0.0.5",
+    # ping without a small count, or flooding.
+    "ping 10.0.0.5",
+    "ping -c 100000 -f 10.0.0.5",
+    "ping -c 0 10.0.0.5",
+    "ping -c 11 10.0.0.5",
+    "whatweb --log-brief=/root/x http://example.com",
+    "whatweb --input-file=/tmp/targets",
+    "whois -x example.com",
+])
+def test_rejected_commands(command):
+    assert not is_read_only(command)
+
+
+class FakeThoughtEngine:
+    def __init__(self, candidates, release=None):
+        self.candidates = candidates
+        self.release = release
+
+    def propose_candidates(self, messages, k):
+        if self.release is not None:
+            self.release.wait(timeout=5)
+        # Later rounds propose nothing, so each test controls exactly what runs.
+        candidates, self.candidates = self.candidates, []
+        return candidates[:k]
+
+
+class FakeMcpClient:
+    """Runs each command until the session is cancelled or `finish` is set."""
+
+    def __init__(self):
+        self.started = threading.Event()
+        self.finish = threading.Event()
+        self.cancelled = []
+        self.executed = []
+
+    def execute_command(self, session_id, command, use_cache=True, timeout=None):
+        self.executed.append(command)
+        self.started.set()
+        self.finish.wait(timeout=5)
+        stopped = "cancelled" if self.cancelled else None
+        return {"status": "SUCCESS", "full_output": f"output of {command}", "stopped": stopped}
+
+    def cancel(self, session_id):
+        self.cancelled.append(session_id)
+        self.finish.set()
+        return 1
+
+
+def test_take_returns_a_matching_speculative_observation():
+    client = FakeMcpClient()
+    client.finish.set()
+    speculator = Speculator(client, FakeThoughtEngine(["dig example.com", "rm -rf /"]))
+    speculator.start("s1", [])
+    observation = speculator.take("dig   example.com")
+    speculator.close()
+
+    assert observation["full_output"] == "output of dig example.com"
+    assert client.executed == ["dig example.com"]
+    assert speculator.report()["hits"] == 1 and speculator.report()["rejected"] == 1
+
+
+def test_new_round_cancels_the_running_speculative_command():
+    client = FakeMcpClient()
+    speculator = Speculator(client, FakeThoughtEngine(["dig example.com"]))
+    speculator.start("s1", [])
+    assert client.started.wait(timeout=5)
+
+    speculator.start("s1", [])
+    speculator.close()
+
+    assert client.cancelled == ["s1"]
+
+
+def test_close_does_not_wait_for_a_running_command():
+    client = FakeMcpClient()
+    client.cancel = lambda session_id: client.cancelled.append(session_id)  # Cancelling never ends the command.
+    speculator = Speculator(client, FakeThoughtEngine(["dig example.com"]))
+    speculator.start("s1", [])
+    assert client.started.wait(timeout=5)
+
+    started = time.monotonic()
+    speculator.close()
+    assert time.monotonic() - started < 1
+    assert client.cancelled == ["s1"]
+    client.finish.set()
+
+
+def test_close_does_not_wait_for_a_proposal_and_runs_nothing_after_it():
+    client = FakeMcpClient()
+    release = threading.Event()
+    speculator = Speculator(client, FakeThoughtEngine(["dig example.com"], release))
+    speculator.start("s1", [])
+
+    started = time.monotonic()
+    speculator.close()
+    assert time.monotonic() - started < 1
+    release.set()
+    speculator._executor.shutdown(wait=True)
+
+    assert client.executed == [] and client.cancelled == []
@@ -0,0 +1,74 @@
+# dawnyawn/tests/test_stream_parsing.py
+import pytest
+
+from agent.agent_scheduler import AgentScheduler
+from agent.stream_parsing import JsonObjectScanner, NumberedLineScanner
+from models.task_node import TaskNode, plan_stages
+
+
+def _scan(text: str, chunk: int = 7):
+    scanner = NumberedLineScanner()
+    items = []
+    for start in range(0, len(text), chunk):
+        items += scanner.feed(text[start:start + chunk])
+    return [text for _, text in items + scanner.flush()], scanner.finished
+
+
+@pytest.mark.parametrize("text, items, finished", [
+    ("1. Scan ports\n2. Grab banners", ["Scan ports", "Grab banners"], False),
+    ("Here is the plan:\n\n1. Scan\n2. Enumerate\n", ["Scan", "Enumerate"], False),
+    ("**Phase 1**\n1. Scan\n\n**Phase 2**\n2. Exploit\n", ["Scan", "Exploit"], False),
+    ("## Recon\n1. Scan\n\n## Exploitation\n\n2. Exploit\n", ["Scan", "Exploit"], False),
+    ("1. Scan\n\nExploitation:\n2. Exploit\n", ["Scan", "Exploit"], False),
+    ("1. Scan\n   with nmap -F\n2. Report\n", ["Scan", "Report"], False),
+    ("1. Scan\n\nThis plan covers the basics.\n2. Not part of it\n", ["Scan"], True),
+    ("1. Scan\nThen report.\n2. Report\n", ["Scan", "Report"], False),
+])
+def test_numbered_line_scanner(text, items, finished):
+    assert _scan(text) == (items, finished)
+
+
+def test_numbered_line_scanner_keeps_labels():
+    scanner = NumberedLineScanner()
+    assert scanner.feed("## Recon\n1. Scan\n2. Whois\n\n## Exploit\n1. Exploit\n") == [
+        (1, "Scan"), (2, "Whois"), (1, "Exploit")]
+
+
+@pytest.mark.parametrize("text, dependencies", [
+    # Numbered straight through: labels are task IDs.
+    ("1. Scan (after: none)\n2. Whois (after: none)\n3. Exploit (after: 1)", [[], [], [1]]),
+    # Numbered per group: "(after: 2)" in the second group means that group's item 2.
+    ("**Recon**\n1. Scan (after: none)\n2. Whois (after: none)\n\n**Exploit**\n"
+     "1. Probe the web server (after: none)\n2. Exploit it (after: 1)\n3. Report (after: 1, 2)",
+     [[], [], [], [3], [3, 4]]),
+    # A label the group hasn't reached yet refers back to the earlier group.
+    ("1. Scan (after: none)\n2. Whois (after: none)\n\nPhase 2:\n1. Exploit (after: 2)", [[], [], [2]]),
+    # Unannotated items stay sequential; forward and unknown references are dropped.
+    ("1. Scan\n2. Whois\n3. Report (after: 3, 7)", [[], [1], []]),
+])
+def test_plan_labels_map_to_task_ids(text, dependencies):
+    plan = AgentScheduler()._parse_plan_from_text(text)
+    assert [task.task_id for task in plan] == list(range(1, len(dependencies) + 1))
+    assert [task.dependencies for task in plan] == dependencies
+
+
+def test_json_object_scanner_ignores_braces_in_strings():
+    scanner = JsonObjectScanner()
+    text = 'noise {"a": "}{", "b": {"c": "\\"}"}} trailing {"d": 1}'
+    objects = []
+    for char in text:
+        objects += scanner.feed(char)
+    assert objects == ['{"a": "}{", "b": {"c": "\\"}"}}', '{"d": 1}']
+
+
+@pytest.mark.parametrize("dependencies, stages", [
+    ({1: [], 2: [1], 3: [2]}, [[1], [2], [3]]),
+    ({1: [], 2: [], 3: [1, 2]}, [[1, 2], [3]]),
+    ({1: [], 2: [1], 3: [1], 4: [2, 3]}, [[1], [2, 3], [4]]),
+    ({1: [], 2: [9]}, [[1, 2]]),
+    ({}, []),
+])
+def test_plan_stages(dependencies, stages):
+    plan = [TaskNode(task_id=task_id, description=f"step {task_id}", dependencies=deps)
+            for task_id, deps in dependencies.items()]
+    assert [[task.task_id for task in stage] for stage in plan_stages(plan)] == stages
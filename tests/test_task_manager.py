@@ -0,0 +1,129 @@
+# dawnyawn/tests/test_task_manager.py
+import pytest
+
+from agent.task_manager import TaskManager
+from agent.thought_engine import ToolSelection
+from services.mission_journal import MissionJournal
+from models.task_node import TaskNode
+
+PLAN = [TaskNode(task_id=1, description="Scan 10.0.0.5")]
+
+
+class FakeThoughtEngine:
+    """Returns the scripted actions in order, then finishes the mission."""
+
+    def __init__(self, actions):
+        self.actions = list(actions)
+
+    def choose_next_action(self, goal, plan, history):
+        if self.actions:
+            return self.actions.pop(0)
+        return ToolSelection(tool_name="finish_mission", tool_input="done")
+
+
+class FakeScheduler:
+    plan_cached = False
+
+    def __init__(self):
+        self.cached = []
+
+    def create_plan(self, goal, on_step=None, refresh=False):
+        return list(PLAN)
+
+    def cache_plan(self, goal, plan, refresh=False):
+        self.cached.append(goal)
+
+
+class FakeMcpClient:
+    def __init__(self):
+        self.executed = []
+        self.sessions_ended = 0
+
+    def start_session(self):
+        return "session-1"
+
+    def end_session(self, session_id):
+        self.sessions_ended += 1
+
+    def cancel(self, session_id):
+        pass
+
+    def execute_command_streaming(self, session_id, command, **kwargs):
+        self.executed.append(command)
+        return {"status": "SUCCESS", "key_finding": f"ran {command}", "full_output": ""}
+
+    def execute_batch(self, session_id, commands, **kwargs):
+        return [self.execute_command_streaming(session_id, command) for command in commands]
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    # Journals and traces are written relative to the working directory.
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+def _manager(actions, **kwargs) -> TaskManager:
+    manager = TaskManager("Recon 10.0.0.5", auto_approve=True, show_progress=False, **kwargs)
+    manager.thought_engine = FakeThoughtEngine(actions)
+    manager.mcp_client = FakeMcpClient()
+    manager.scheduler = FakeScheduler()
+    return manager
+
+
+def test_batch_is_trimmed_to_the_remaining_steps(workdir):
+    batch = ToolSelection(tool_name="os_command_batch", tool_input=[f"dig host{n}" for n in range(5)])
+    manager = _manager([ToolSelection(tool_name="os_command", tool_input="whois host"), batch], max_steps=3)
+    manager.run()
+    assert manager.mcp_client.executed == ["whois host", "dig host0", "dig host1"]
+    assert len(manager.mission_history) == 3
+    assert manager.outcome == "STEP_LIMIT"
+
+
+def test_empty_actions_count_against_the_step_limit(workdir):
+    empty = ToolSelection(tool_name="os_command", tool_input=" ")
+    manager = _manager([empty] * 5, max_steps=2)
+    manager.run()
+    assert manager.mcp_client.executed == []
+    assert [step["observation"]["status"] for step in manager.mission_history] == ["FAILURE", "FAILURE"]
+    assert manager.outcome == "STEP_LIMIT"
+
+
+def _interrupted_mission(approved: bool) -> str:
+    journal = MissionJournal("interrupted")
+    journal.record_start("Recon 10.0.0.5")
+    journal.record_plan(PLAN)
+    if approved:
+        journal.record_approval()
+        journal.record_action("os_command_batch", ["whois host", "dig host"], ["whois host", "dig host"])
+        journal.record_observation("whois host", {"status": "SUCCESS", "key_finding": "ok", "full_output": ""})
+    return journal.mission_id
+
+
+def _resumed(mission_id: str, actions, **kwargs) -> TaskManager:
+    manager = TaskManager.resume(mission_id, show_progress=False, **kwargs)
+    manager.thought_engine = FakeThoughtEngine(actions)
+    manager.mcp_client = FakeMcpClient()
+    manager.scheduler = FakeScheduler()
+    return manager
+
+
+def test_resume_reruns_only_unfinished_commands(workdir, monkeypatch):
+    monkeypatch.setattr("builtins.input", lambda prompt: pytest.fail("an approved plan was asked about again"))
+    manager = _resumed(_interrupted_mission(approved=True), [])
+    report = manager.run()
+    assert manager.mcp_client.executed == ["dig host"]
+    assert [step["command"] for step in report["steps"]] == ["whois host", "dig host", "finish_mission"]
+    assert report["outcome"] == "COMPLETED"
+    assert MissionJournal.load("interrupted").finished
+
+
+@pytest.mark.parametrize("answer, outcome, executed", [("y", "COMPLETED", ["whois host"]), ("n", "DECLINED", [])])
+def test_resume_asks_again_for_an_unapproved_plan(workdir, monkeypatch, answer, outcome, executed):
+    prompts = []
+    monkeypatch.setattr("builtins.input", lambda prompt: prompts.append(prompt) or answer)
+    manager = _resumed(_interrupted_mission(approved=False),
+                       [ToolSelection(tool_name="os_command", tool_input="whois host")])
+    assert manager.run()["outcome"] == outcome
+    assert len(prompts) == 1
+    assert manager.mcp_client.executed == executed
@@ -0,0 +1,49 @@
+# dawnyawn/tests/test_tool_manager.py
+import pytest
+
+import services.mcp_client
+from tools.artifact_tool import ReadArtifactTool
+from tools.tool_manager import ToolManager
+
+
+class FakeArtifactClient:
+    def __init__(self):
+        self.calls = []
+
+    def grep_artifact(self, artifact_id, pattern, context=0, regex=False):
+        self.calls.append(("grep", artifact_id, pattern, regex))
+        return {"matches": [{"line": 3, "text": "22/tcp open ssh"}], "truncated": True}
+
+    def read_artifact(self, artifact_id, offset=0, length=8192):
+        self.calls.append(("range", artifact_id, offset, length))
+        return "slice"
+
+
+def test_tool_manager_does_not_build_the_transport(monkeypatch):
+    sessions = []
+    monkeypatch.setattr(services.mcp_client, "get_http_session", lambda: sessions.append(1) or object())
+    manager = ToolManager()
+    assert "read_artifact" in manager.get_tool_manifest()
+    assert sessions == []
+
+    manager.get_tool("read_artifact").mcp_client
+    manager.get_tool("os_command").mcp_client
+    assert len(sessions) == 2
+
+
+@pytest.mark.parametrize("tool_input, call, output", [
+    ("a1 grep open", ("grep", "a1", "open", False), "3: 22/tcp open ssh\n...[more matches omitted; narrow the pattern]"),
+    ("a1 regex '\\d+/tcp'", ("grep", "a1", "\\d+/tcp", True), "3: 22/tcp open ssh\n...[more matches omitted; narrow the pattern]"),
+    ("a1 range 100", ("range", "a1", 100, 8192), "slice"),
+    ("a1 range 0 99999", ("range", "a1", 0, 8192), "slice"),
+])
+def test_read_artifact_dispatch(tool_input, call, output):
+    client = FakeArtifactClient()
+    assert ReadArtifactTool(client).execute(tool_input) == output
+    assert client.calls == [call]
+
+
+@pytest.mark.parametrize("tool_input", ["a1", "a1 find x", "a1 grep", "a1 range x", "a1 grep 'open"])
+def test_read_artifact_rejects_bad_input(tool_input):
+    with pytest.raises(ValueError):
+        ReadArtifactTool(FakeArtifactClient()).execute(tool_input)
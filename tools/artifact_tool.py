@@ -0,0 +1,53 @@
+# dawnyawn/tools/artifact_tool.py
+import shlex
+from tools.base_tool import BaseTool
+from services.mcp_client import McpClient
+
+MAX_READ_BYTES = 8192
+
+
+class ReadArtifactTool(BaseTool):
+    """Reads a slice of a large command output that the server stored as an artifact."""
+    name = "read_artifact"
+    description = ("Reads part of a large command output that was stored as an artifact (the observation has an "
+                   "`artifact` id and only an excerpt in `full_output`). The input is either "
+                   "\"<artifact_id> grep <text>\" to get only the lines containing the text, "
+                   "\"<artifact_id> regex <regex>\" for a (simple) regular expression, or "
+                   "\"<artifact_id> range <byte_offset> [length]\" to page through it (at most 8192 bytes). "
+                   "Prefer grep; it never re-runs the command.")
+
+    def __init__(self, mcp_client: McpClient = None):
+        self._mcp_client = mcp_client
+
+    @property
+    def mcp_client(self) -> McpClient:
+        # Created on first use only, like the OS command tool's client.
+        if self._mcp_client is None:
+            self._mcp_client = McpClient()
+        return self._mcp_client
+
+    def execute(self, tool_input: str) -> str:
+        try:
+            parts = shlex.split(tool_input)
+        except ValueError as e:
+            raise ValueError(f"Could not parse read_artifact input: {e}")
+        if len(parts) < 2 or parts[1] not in ("grep", "regex", "range"):
+            raise ValueError("read_artifact input must be '<artifact_id> grep <text>', "
+                             "'<artifact_id> regex <regex>' or '<artifact_id> range <offset> [length]'.")
+        artifact_id, mode, args = parts[0], parts[1], parts[2:]
+
+        if mode in ("grep", "regex"):
+            if not args:
+                raise ValueError(f"read_artifact {mode} needs a pattern.")
+            result = self.mcp_client.grep_artifact(artifact_id, " ".join(args), context=1, regex=mode == "regex")
+            lines = [f"{match['line']}: {match['text']}" for match in result["matches"]]
+            if result.get("truncated"):
+                lines.append("...[more matches omitted; narrow the pattern]")
+            return "\n".join(lines) or "No lines matched."
+
+        try:
+            offset = int(args[0]) if args else 0
+            length = min(int(args[1]) if len(args) > 1 else MAX_READ_BYTES, MAX_READ_BYTES)
+        except ValueError:
+            raise ValueError("read_artifact range needs integer offset and length.")
+        return self.mcp_client.read_artifact(artifact_id, offset, length)
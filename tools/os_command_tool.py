@@ -8,8 +8,14 @@ class OsCommandTool(BaseTool):
     description = "Executes a single, non-interactive shell command (like nmap, whois, curl, dig) in a secure Kali Linux environment. Use this for all system-level commands and reconnaissance."
 
     def __init__(self):
-        # The tool uses the MCP Client to communicate with the external server.
-        self.mcp_client = McpClient()
+        self._mcp_client = None
+
+    @property
+    def mcp_client(self) -> McpClient:
+        # The tool uses the MCP Client to communicate with the external server; created on first use only.
+        if self._mcp_client is None:
+            self._mcp_client = McpClient()
+        return self._mcp_client
 
     def execute(self, tool_input: str) -> str:
         print(f"  > Executing OS Command via Kali Driver: {tool_input}")
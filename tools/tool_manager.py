@@ -1,6 +1,7 @@
 # dawnyawn/tools/tool_manager.py (Interactive Version)
 from tools.base_tool import BaseTool
 from tools.os_command_tool import OsCommandTool
+from tools.artifact_tool import ReadArtifactTool
 
 
 class ToolManager:
@@ -9,18 +10,30 @@ class ToolManager:
     def __init__(self):
         self._tools: dict[str, BaseTool] = {}
         self._register_tool(OsCommandTool())  # This tool is now conceptual
+        # Dispatched by the TaskManager; reads slices of large outputs without re-running commands.
+        self._register_tool(ReadArtifactTool())
 
     def _register_tool(self, tool: BaseTool):
         self._tools[tool.name] = tool
+        self._manifest = None
+
+    def get_tool(self, name: str) -> BaseTool:
+        return self._tools[name]
 
     def get_tool_manifest(self) -> str:
         """
         Returns a formatted string of all available tools, including special commands.
+        Built on first use and reused until another tool is registered.
         """
+        if self._manifest is not None:
+            return self._manifest
         manifest = "Your response must select one of the following available tools:\n"
         # Add the special 'finish' command to the manifest for the LLM
         manifest += "- Tool Name: `finish_mission`\n  Description: Use this tool when you have fully accomplished the user's goal and have all the information you need. Provide a final summary of your findings as the input.\n"
+        # Batches are dispatched by the TaskManager, which runs them concurrently in the session.
+        manifest += "- Tool Name: `os_command_batch`\n  Description: Runs several independent shell commands at the same time in the Kali environment. The input MUST be a JSON list of command strings, e.g. [\"dig example.com\", \"whois example.com\"]. Only batch commands that do not depend on each other's output.\n"
 
         for tool in self._tools.values():
             manifest += f"- Tool Name: `{tool.name}`\n  Description: {tool.description}\n"
+        self._manifest = manifest
         return manifest
\ No newline at end of file